@@ -7,6 +7,10 @@
 #     which register custom PyTorch operators upon being imported.
 #   TORCH_MLIR_EXT_PYTHONPATH: colon-separated list of paths necessary
 #     for importing PyTorch extensions specified in TORCH_MLIR_EXT_MODULES.
+#
+# The results of passing checks of the abstract interpretation functions are
+# cached in `$TORCH_MLIR_BUILD_DIR/abstract_interp_lib_cache`; delete it to
+# re-run all checks.
 # For more information on supporting custom operators, see:
 #   ${TORCH_MLIR}/python/torch_mlir/_torch_mlir_custom_op_example/README.md
 
@@ -44,4 +48,5 @@ fi
 PYTHONPATH="${pypath}" python \
   -m torch_mlir.jit_ir_importer.build_tools.abstract_interp_lib_gen \
   --pytorch_op_extensions=${ext_module:-""} \
-  --torch_transforms_cpp_dir="${torch_transforms_cpp_dir}"
+  --torch_transforms_cpp_dir="${torch_transforms_cpp_dir}" \
+  --cache_dir="${build_dir}/abstract_interp_lib_cache"
@@ -132,6 +132,37 @@ LogicalResult TorchDialect::verifyRegionArgAttribute(Operation *op,
                                 "argument of !torch.tensor/!torch.vtensor type";
     return success();
   }
+  if (namedAttr.getName().getValue() == "torch.symbolic_shape") {
+    auto func = dyn_cast<func::FuncOp>(op);
+    if (!func)
+      return op->emitError()
+             << "'torch.symbolic_shape' must be attached to a func";
+    ArrayAttr attr = namedAttr.getValue().dyn_cast<ArrayAttr>();
+    if (!attr || !llvm::all_of(attr, [](Attribute size) {
+          return size.isa<StringAttr>();
+        }))
+      return op->emitError()
+             << "'torch.symbolic_shape' must be an array of strings";
+    auto type =
+        func.getFunctionType().getInput(argIndex).dyn_cast<BaseTensorType>();
+    if (!type || !type.hasSizes() || type.getSizes().size() != attr.size())
+      return op->emitError() << "'torch.symbolic_shape' must be attached to "
+                                "an argument of !torch.tensor/!torch.vtensor "
+                                "type of the same rank";
+    return success();
+  }
+  if (namedAttr.getName().getValue() == "torch.symbolic_value") {
+    auto func = dyn_cast<func::FuncOp>(op);
+    if (!func)
+      return op->emitError()
+             << "'torch.symbolic_value' must be attached to a func";
+    if (!namedAttr.getValue().isa<StringAttr>())
+      return op->emitError() << "'torch.symbolic_value' must be a string";
+    if (!func.getFunctionType().getInput(argIndex).isa<Torch::IntType>())
+      return op->emitError() << "'torch.symbolic_value' must be attached to "
+                                "an argument of !torch.int type";
+    return success();
+  }
 
   return op->emitError() << "unknown region arg attribute '"
                          << namedAttr.getName().getValue() << "'";
@@ -148,9 +148,12 @@ static Value getScalarIntValue(Value input, Location loc,
     return nullptr;
 
   if (auto valueTensorLiteralOp = input.getDefiningOp<ValueTensorLiteralOp>()) {
-    auto val = valueTensorLiteralOp.getValue()
-                   .cast<DenseElementsAttr>()
-                   .getSplatValue<int64_t>();
+    // The literal may also hold e.g. a DenseResourceElementsAttr.
+    auto elements =
+        valueTensorLiteralOp.getValue().dyn_cast<DenseElementsAttr>();
+    if (!elements)
+      return nullptr;
+    auto val = elements.getSplatValue<int64_t>();
     return rewriter.create<Torch::ConstantIntOp>(
         loc, rewriter.getI64IntegerAttr(val));
   } else if (auto primNumToTensorScalarOp =
@@ -183,10 +186,11 @@ static Value getScalarFloatValue(Value input, Location loc,
     return nullptr;
 
   if (auto valueTensorLiteralOp = input.getDefiningOp<ValueTensorLiteralOp>()) {
-    auto val = valueTensorLiteralOp.getValue()
-                   .cast<DenseFPElementsAttr>()
-                   .getSplatValue<FloatAttr>()
-                   .getValueAsDouble();
+    auto elements =
+        valueTensorLiteralOp.getValue().dyn_cast<DenseFPElementsAttr>();
+    if (!elements)
+      return nullptr;
+    auto val = elements.getSplatValue<FloatAttr>().getValueAsDouble();
     return rewriter.create<Torch::ConstantFloatOp>(
         loc, rewriter.getF64FloatAttr(val));
   } else if (auto primNumToTensorScalarOp =
@@ -38,6 +38,17 @@ struct FuncBackendTypeConversionPass
     auto module = getOperation();
     auto *context = &getContext();
 
+    // The symbolic shape annotations are only defined on `!torch.vtensor`
+    // and `!torch.int` arguments, so drop them along with those types. The
+    // symbolic dimensions remain dynamic in the converted types.
+    module.walk([](func::FuncOp func) {
+      for (unsigned i = 0, e = func.getNumArguments(); i < e; ++i) {
+        func.removeArgAttr(i, "torch.symbolic_shape");
+        func.removeArgAttr(i, "torch.symbolic_value");
+      }
+      func->removeAttr("torch.symbol_ranges");
+    });
+
     TypeConverter typeConverter;
     RewritePatternSet patterns(context);
     ConversionTarget target(*context);
@@ -33,6 +33,17 @@ struct ImportOptions {
   // In that case, the appropriate shape information is provided via the type
   // bound annotations on the function arguments instead.
   bool ignoreExistingTensorShapesAndDtypes = false;
+
+  // If this is set to true, then tensors (e.g. parameters) are imported as
+  // DenseResourceElementsAttr's that reference the storage of the tensor,
+  // instead of as DenseElementsAttr's holding a copy of its data. This avoids
+  // copying the weights of large models into the MLIR context. The tensor is
+  // kept alive until the MLIR context releases the resource, and must not be
+  // modified in place while the module is in use.
+  //
+  // Rank-0 tensors are always imported as DenseElementsAttr's, since various
+  // folders expect to be able to read scalars directly.
+  bool importTensorsAsDenseResources = false;
 };
 } // namespace torch_mlir
 
@@ -379,7 +379,8 @@ MlirValue IValueImporter::importTensor(c10::IValue ivalue) {
 
   // Import the bulk tensor representation.
   at::Tensor tensor = ivalue.toTensor().contiguous();
-  MlirAttribute denseElements = convertTensorToMlirElementsAttr(tensor, loc);
+  MlirAttribute denseElements =
+      convertTensorToMlirElementsAttr(tensor, loc, importOptions);
 
   MlirOperation tensorOp;
 
@@ -196,7 +196,8 @@ void NodeImporter::importNode(Node *node, MlirBlock appendToBlock,
               "value", mlirStringAttrGet(context, toMlirStringRef(node->s(
                                                       c10::attr::value)))));
     } else if (output->type()->cast<c10::TensorType>()) {
-      MlirAttribute attr = importAttribute(loc, node, c10::attr::value);
+      MlirAttribute attr =
+          importAttribute(loc, node, c10::attr::value, importOptions);
       if (importOptions.assumeTensorsHaveValueSemantics) {
         op = createMlirOperation(
             "torch.vtensor.literal", loc,
@@ -292,8 +292,10 @@ torch_mlir::getFunctionTypeFromSchema(MlirContext context,
                              outputTypes.size(), outputTypes.data());
 }
 
-MlirAttribute torch_mlir::convertTensorToMlirElementsAttr(at::Tensor tensor,
-                                                          MlirLocation loc) {
+MlirAttribute
+torch_mlir::convertTensorToMlirElementsAttr(at::Tensor tensor,
+                                            MlirLocation loc,
+                                            const ImportOptions &importOptions) {
   using at::ScalarType;
 
   auto throwUnsupportedTensorError = [&]() {
@@ -326,6 +328,24 @@ MlirAttribute torch_mlir::convertTensorToMlirElementsAttr(at::Tensor tensor,
     throwUnsupportedTensorError();
   }
 
+  // Import the data as a resource that references the tensor's storage.
+  // Booleans are excluded since torch stores them as one byte per element,
+  // while resources of `i1` element type are bit-packed.
+  if (importOptions.importTensorsAsDenseResources && tensor.dim() > 0 &&
+      tensor.numel() > 0 && tensor.scalar_type() != ScalarType::Bool) {
+    // The heap-allocated handle keeps the storage alive until MLIR releases
+    // the resource and calls the deleter.
+    auto *heldTensor = new at::Tensor(tensor.cpu().contiguous());
+    return mlirUnmanagedDenseResourceElementsAttrGet(
+        shapedType, toMlirStringRef("torch_tensor"), heldTensor->data_ptr(),
+        heldTensor->nbytes(), heldTensor->element_size(),
+        /*dataIsMutable=*/false,
+        [](void *userData, const void *data, size_t size, size_t align) {
+          delete static_cast<at::Tensor *>(userData);
+        },
+        heldTensor);
+  }
+
   // Import DenseElementsAttr data.
   // TODO: More import formats in C-API.
   auto numElements = tensor.numel();
@@ -384,7 +404,8 @@ MlirAttribute torch_mlir::convertTensorToMlirElementsAttr(at::Tensor tensor,
 
 MlirAttribute torch_mlir::importAttribute(MlirLocation loc,
                                           torch::jit::Node *node,
-                                          c10::Symbol symbol) {
+                                          c10::Symbol symbol,
+                                          const ImportOptions &importOptions) {
   MlirContext context = mlirLocationGetContext(loc);
   auto kind = node->kindOf(symbol);
   switch (kind) {
@@ -398,7 +419,8 @@ MlirAttribute torch_mlir::importAttribute(MlirLocation loc,
   case torch::jit::AttributeKind::s:
     return mlirStringAttrGet(context, toMlirStringRef(node->s(symbol)));
   case torch::jit::AttributeKind::t:
-    return convertTensorToMlirElementsAttr(node->t(symbol), loc);
+    return convertTensorToMlirElementsAttr(node->t(symbol), loc,
+                                           importOptions);
   default: {
     std::stringstream msg;
     msg << "unhandled: value attribute kind " << toString(kind);
@@ -56,11 +56,16 @@ MlirType getFunctionTypeFromSchema(MlirContext context,
                                    const ImportOptions &importOptions = {});
 
 /// Creates an appropriate MlirAttribute that holds the same values as `tensor`.
-MlirAttribute convertTensorToMlirElementsAttr(at::Tensor tensor,
-                                              MlirLocation loc);
+///
+/// See `ImportOptions::importTensorsAsDenseResources` for how `importOptions`
+/// affects the kind of attribute.
+MlirAttribute
+convertTensorToMlirElementsAttr(at::Tensor tensor, MlirLocation loc,
+                                const ImportOptions &importOptions = {});
 
 MlirAttribute importAttribute(MlirLocation loc, torch::jit::Node *node,
-                              c10::Symbol symbol);
+                              c10::Symbol symbol,
+                              const ImportOptions &importOptions = {});
 
 MlirLocation getMlirLocationFromNode(MlirContext context,
                                      torch::jit::Node *node);
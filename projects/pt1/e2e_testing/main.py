@@ -4,10 +4,26 @@
 # Also available under a BSD-style license. See LICENSE.
 
 import argparse
+import os
 import re
 import sys
+from typing import List, Optional, Set, Tuple
 
-from torch_mlir_e2e_test.framework import run_tests
+from torch_mlir_e2e_test.comparison import (
+    compare_configs,
+    report_comparison,
+    write_comparison_results,
+)
+from torch_mlir_e2e_test.benchmark import (
+    find_regressions,
+    load_benchmark_results,
+    report_benchmark_results,
+    run_benchmarks,
+    write_benchmark_results,
+)
+from torch_mlir_e2e_test.framework import TestConfig, run_tests
+from torch_mlir_e2e_test.golden_trace_cache import GoldenTraceCache
+from torch_mlir_e2e_test.incremental import TestResultStore, run_tests_incrementally
 from torch_mlir_e2e_test.reporting import report_results
 from torch_mlir_e2e_test.registry import GLOBAL_TEST_REGISTRY
 
@@ -42,11 +58,57 @@ from .xfail_sets import (
 from torch_mlir_e2e_test.test_suite import register_all_tests
 register_all_tests()
 
+CONFIG_CHOICES = ["native_torch", "torchscript", "linalg", "make_fx_tosa", "tosa", "lazy_tensor_core", "torchdynamo"]
+
+def create_config(config_name: str,
+                  refbackend_optimization_level: int = 0,
+                  refbackend_shared_libs: Optional[List[str]] = None) -> TestConfig:
+    """Create the TestConfig called `config_name` (one of `CONFIG_CHOICES`)."""
+    def create_refbackend():
+        return RefBackendLinalgOnTensorsBackend(
+            optimization_level=refbackend_optimization_level,
+            shared_libs=refbackend_shared_libs)
+
+    if config_name == "linalg":
+        return LinalgOnTensorsBackendTestConfig(create_refbackend())
+    elif config_name == "tosa":
+        return TosaBackendTestConfig(LinalgOnTensorsTosaBackend())
+    elif config_name == "make_fx_tosa":
+        return TosaBackendTestConfig(LinalgOnTensorsTosaBackend(), use_make_fx=True)
+    elif config_name == "native_torch":
+        return NativeTorchTestConfig()
+    elif config_name == "torchscript":
+        return TorchScriptTestConfig()
+    elif config_name == "lazy_tensor_core":
+        return LazyTensorCoreTestConfig()
+    elif config_name == "torchdynamo":
+        return TorchDynamoTestConfig(create_refbackend())
+    raise ValueError(f"Unknown config: {config_name}")
+
+def get_xfail_and_crashing_sets(config_name: str,
+                                all_test_unique_names: Set[str]) -> Tuple[Set[str], Set[str]]:
+    """Get the tests that are expected to fail and the tests that crash with
+    the config called `config_name`."""
+    if config_name == "linalg":
+        return LINALG_XFAIL_SET, set()
+    elif config_name == "tosa":
+        return all_test_unique_names - TOSA_PASS_SET, set()
+    elif config_name == "make_fx_tosa":
+        return all_test_unique_names - MAKE_FX_TOSA_PASS_SET, set()
+    elif config_name == "native_torch":
+        return set(), set()
+    elif config_name == "torchscript":
+        return set(), set()
+    elif config_name == "lazy_tensor_core":
+        return LTC_XFAIL_SET, LTC_CRASHING_SET
+    elif config_name == "torchdynamo":
+        return TORCHDYNAMO_XFAIL_SET, TORCHDYNAMO_CRASHING_SET
+    raise ValueError(f"Unknown config: {config_name}")
+
 def _get_argparse():
-    config_choices = ["native_torch", "torchscript", "linalg", "make_fx_tosa", "tosa", "lazy_tensor_core", "torchdynamo"]
     parser = argparse.ArgumentParser(description="Run torchscript e2e tests.")
     parser.add_argument("-c", "--config",
-        choices=config_choices,
+        choices=CONFIG_CHOICES,
         default="linalg",
         help=f"""
 Meaning of options:
@@ -70,9 +132,69 @@ Regular expression specifying which tests to include in this run.
                         help="""Run tests sequentially rather than in parallel.
 This can be useful for debugging, since it runs the tests in the same process,
 which make it easier to attach a debugger or get a stack trace.""")
+    parser.add_argument("-j", "--workers",
+                        default=None, type=int,
+                        help="Number of worker processes to run the tests in. Defaults to about the number of CPUs.")
+    parser.add_argument("--test_timeout",
+                        default=None, type=float,
+                        help="Maximum number of seconds a single test may take before it is reported as a failure.")
+    parser.add_argument("--test_durations_file",
+                        metavar="FILE",
+                        help="""A JSON file holding the duration of each test from previous runs.
+Tests are started longest first, and the file is updated after the run.""")
+    parser.add_argument("--golden_trace_cache_dir",
+                        metavar="DIR",
+                        help="""Cache the golden traces in DIR, so that they are only computed
+once across runs and configs.""")
+    parser.add_argument("--incremental_dir",
+                        metavar="DIR",
+                        help="""Store the result of each test in DIR, and reuse it in later runs
+as long as the test, the test framework and the torch-mlir build are unchanged.""")
     parser.add_argument("--crashing_tests_to_not_attempt_to_run_and_a_bug_is_filed",
                         metavar="TEST", type=str, nargs="+",
                         help="A set of tests to not attempt to run, since they crash and cannot be XFAILed.")
+    parser.add_argument("--refbackend_optimization_level",
+                        default=0,
+                        type=int,
+                        choices=[0, 1, 2],
+                        help="""Optimization level of the RefBackend lowering pipeline
+used by the "linalg" and "torchdynamo" configs. Level 0 lowers to scalar loops,
+level 1 additionally tiles and vectorizes, and level 2 also parallelizes loops
+with OpenMP (requires --refbackend_shared_libs).""")
+    parser.add_argument("--refbackend_shared_libs",
+                        metavar="LIB", type=str, nargs="+",
+                        help="Shared libraries to load into the RefBackend ExecutionEngine, such as an OpenMP runtime.")
+    parser.add_argument("--benchmark",
+                        default=False,
+                        action="store_true",
+                        help="""Instead of checking the results, measure the wall time of
+each phase (golden trace generation, compilation and its sub-phases, loading and
+running) for each test. Tests are run sequentially in this process.""")
+    parser.add_argument("--benchmark_iterations",
+                        default=5, type=int,
+                        help="Number of measured iterations per test in --benchmark mode.")
+    parser.add_argument("--benchmark_warmup_iterations",
+                        default=1, type=int,
+                        help="Number of unmeasured warmup iterations per test in --benchmark mode.")
+    parser.add_argument("--benchmark_output",
+                        metavar="FILE",
+                        help="Write the --benchmark results to FILE (CSV if it ends in .csv, JSON otherwise).")
+    parser.add_argument("--benchmark_baseline",
+                        metavar="FILE",
+                        help="A JSON file previously written by --benchmark_output to compare the --benchmark results against.")
+    parser.add_argument("--benchmark_regression_threshold",
+                        default=0.1, type=float,
+                        help="Relative slowdown of a phase compared to --benchmark_baseline that is reported as a regression.")
+    parser.add_argument("--compare_configs",
+                        metavar="CONFIG", nargs="+", choices=CONFIG_CHOICES,
+                        help="""Instead of running the tests with --config, run them with each of the
+given configs in this process, sharing the golden traces, and report the outcome,
+maximum error, compile time and run time of each test with each config.
+Exits with a non-zero code if any test that isn't skipped doesn't pass with
+some config.""")
+    parser.add_argument("--comparison_output",
+                        metavar="FILE",
+                        help="Write the --compare_configs results to FILE (CSV if it ends in .csv, JSON otherwise).")
     parser.add_argument("--ignore_failures", 
                         default=False,
                         action="store_true",
@@ -86,36 +208,14 @@ def main():
         test.unique_name for test in GLOBAL_TEST_REGISTRY)
 
     # Find the selected config.
-    if args.config == "linalg":
-        config = LinalgOnTensorsBackendTestConfig(RefBackendLinalgOnTensorsBackend())
-        xfail_set = LINALG_XFAIL_SET
-        crashing_set = set()
-    elif args.config == "tosa":
-        config = TosaBackendTestConfig(LinalgOnTensorsTosaBackend())
-        xfail_set = all_test_unique_names - TOSA_PASS_SET
-        crashing_set = set()
-    elif args.config == "make_fx_tosa":
-        config = TosaBackendTestConfig(LinalgOnTensorsTosaBackend(), use_make_fx=True)
-        xfail_set = all_test_unique_names - MAKE_FX_TOSA_PASS_SET
-        crashing_set = set()
-    elif args.config == "native_torch":
-        config = NativeTorchTestConfig()
-        xfail_set = set()
-        crashing_set = set()
-    elif args.config == "torchscript":
-        config = TorchScriptTestConfig()
-        xfail_set = set()
-        crashing_set = set()
-    elif args.config == "lazy_tensor_core":
-        config = LazyTensorCoreTestConfig()
-        xfail_set = LTC_XFAIL_SET
-        crashing_set = LTC_CRASHING_SET
-    elif args.config == "torchdynamo":
-        config = TorchDynamoTestConfig(RefBackendLinalgOnTensorsBackend())
-        xfail_set = TORCHDYNAMO_XFAIL_SET
-        crashing_set = TORCHDYNAMO_CRASHING_SET
-
-    do_not_attempt = set(args.crashing_tests_to_not_attempt_to_run_and_a_bug_is_filed or []).union(crashing_set)
+    config = create_config(args.config, args.refbackend_optimization_level,
+                           args.refbackend_shared_libs)
+    xfail_set, crashing_set = get_xfail_and_crashing_sets(
+        args.config, all_test_unique_names)
+
+    do_not_attempt = set(args.crashing_tests_to_not_attempt_to_run_and_a_bug_is_filed or [])
+    if not args.compare_configs:
+        do_not_attempt |= crashing_set
     available_tests = [test for test in GLOBAL_TEST_REGISTRY if test.unique_name not in do_not_attempt]
     if args.crashing_tests_to_not_attempt_to_run_and_a_bug_is_filed is not None:
         for arg in args.crashing_tests_to_not_attempt_to_run_and_a_bug_is_filed:
@@ -137,8 +237,84 @@ def main():
             print(test.unique_name)
         sys.exit(1)
 
+    if args.compare_configs:
+        configs = {
+            config_name: create_config(config_name,
+                                       args.refbackend_optimization_level,
+                                       args.refbackend_shared_libs)
+            for config_name in args.compare_configs
+        }
+        skipped_tests = {
+            config_name: get_xfail_and_crashing_sets(
+                config_name, all_test_unique_names)[1]
+            for config_name in args.compare_configs
+        }
+        golden_trace_cache = None
+        if args.golden_trace_cache_dir:
+            golden_trace_cache = GoldenTraceCache(args.golden_trace_cache_dir)
+        comparison_results = compare_configs(tests, configs, skipped_tests,
+                                             golden_trace_cache, args.verbose)
+        report_comparison(comparison_results)
+        if args.comparison_output:
+            write_comparison_results(comparison_results,
+                                     args.comparison_output)
+        if args.ignore_failures:
+            sys.exit(0)
+        failed = any(r.outcome not in ("PASS", "SKIP")
+                     for r in comparison_results)
+        sys.exit(1 if failed else 0)
+
+    if args.benchmark:
+        benchmark_results = run_benchmarks(tests, config,
+                                           args.benchmark_iterations,
+                                           args.benchmark_warmup_iterations,
+                                           args.verbose)
+        report_benchmark_results(benchmark_results)
+        if args.benchmark_output:
+            write_benchmark_results(benchmark_results, args.benchmark_output)
+        # Without a baseline, every failing test counts as a regression.
+        baseline = {}
+        if args.benchmark_baseline:
+            baseline = load_benchmark_results(args.benchmark_baseline)
+        regressions = find_regressions(benchmark_results, baseline,
+                                       args.benchmark_regression_threshold)
+        if regressions:
+            if args.benchmark_baseline:
+                print(f"\nRegressions compared to {args.benchmark_baseline}:")
+            else:
+                print("\nRegressions:")
+            for regression in regressions:
+                print(f"    {regression}")
+        if args.ignore_failures:
+            sys.exit(0)
+        sys.exit(1 if regressions else 0)
+
     # Run the tests.
-    results = run_tests(tests, config, args.sequential, args.verbose)
+    golden_trace_cache = None
+    if args.golden_trace_cache_dir:
+        golden_trace_cache = GoldenTraceCache(args.golden_trace_cache_dir)
+    run_tests_kwargs = dict(sequential=args.sequential,
+                            verbose=args.verbose,
+                            num_workers=args.workers,
+                            timeout=args.test_timeout,
+                            durations_path=args.test_durations_file,
+                            golden_trace_cache=golden_trace_cache)
+    if args.incremental_dir:
+        # The options that influence the results of the selected config.
+        config_description = (
+            f"{args.config} "
+            f"refbackend_optimization_level={args.refbackend_optimization_level} "
+            f"refbackend_shared_libs={args.refbackend_shared_libs}")
+        store = TestResultStore(os.path.join(args.incremental_dir, args.config))
+        results, reused_tests = run_tests_incrementally(
+            tests, config, config_description, store, **run_tests_kwargs)
+        print(f"Reused the results of {len(reused_tests)} unchanged tests "
+              f"from {args.incremental_dir}, ran {len(results) - len(reused_tests)} tests.")
+        if args.verbose:
+            for unique_name in reused_tests:
+                print(f"    Reused {unique_name}")
+    else:
+        results = run_tests(tests, config, **run_tests_kwargs)
 
     # Report the test results.
     failed = report_results(results, xfail_set, args.verbose, args.config)
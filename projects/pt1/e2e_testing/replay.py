@@ -0,0 +1,109 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+"""Replay a recorded trace (see `torch_mlir_e2e_test.trace_io`) against a
+test config, and report the accuracy and latency of each call.
+
+Example:
+    python -m e2e_testing.replay --trace /tmp/my_trace \
+        --program my_models.resnet:create_model -c linalg
+"""
+
+import argparse
+import importlib
+import statistics
+import sys
+import time
+
+import torch
+
+from torch_mlir_e2e_test.framework import DEFAULT_ATOL, DEFAULT_RTOL
+from torch_mlir_e2e_test.reporting import ErrorContext, ValueReport
+from torch_mlir_e2e_test.trace_io import load_trace
+
+from .main import CONFIG_CHOICES, create_config
+
+
+def _get_argparse():
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded trace against a test config.")
+    parser.add_argument("--trace", required=True,
+                        help="The directory holding the trace.")
+    parser.add_argument("--program", required=True,
+                        help="""The callable creating the torch.nn.Module the trace was
+recorded from, as `module.path:callable`.""")
+    parser.add_argument("-c", "--config",
+                        choices=CONFIG_CHOICES,
+                        default="linalg",
+                        help="The config to replay the trace with.")
+    parser.add_argument("--iterations",
+                        default=1, type=int,
+                        help="Number of timed runs of each call, after an untimed first run. The median latency is reported.")
+    parser.add_argument("--refbackend_optimization_level",
+                        default=0, type=int, choices=[0, 1, 2],
+                        help="See the option of the same name of e2e_testing.main.")
+    parser.add_argument("--refbackend_shared_libs",
+                        metavar="LIB", type=str, nargs="+",
+                        help="See the option of the same name of e2e_testing.main.")
+    parser.add_argument("--rtol", default=DEFAULT_RTOL, type=float,
+                        help="Relative tolerance for comparing output tensors.")
+    parser.add_argument("--atol", default=DEFAULT_ATOL, type=float,
+                        help="Absolute tolerance for comparing output tensors.")
+    return parser
+
+
+def _load_program_factory(spec: str):
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"Expected `module.path:callable`, got '{spec}'")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def main():
+    args = _get_argparse().parse_args()
+    torch.autograd.set_grad_enabled(False)
+    program_factory = _load_program_factory(args.program)
+    config = create_config(args.config, args.refbackend_optimization_level,
+                           args.refbackend_shared_libs)
+    golden_trace = load_trace(args.trace)
+
+    start = time.perf_counter()
+    compiled = config.compile(program_factory())
+    compile_seconds = time.perf_counter() - start
+    print(f"Compiled with config \"{args.config}\" in {compile_seconds:.4f}s")
+    start = time.perf_counter()
+    loaded = config.load(compiled)
+    load_seconds = time.perf_counter() - start
+    print(f"Loaded in {load_seconds:.4f}s")
+
+    failed = False
+    # Run each item separately, so that only one item's tensors need to be
+    # paged in at a time.
+    for i, golden_item in enumerate(golden_trace):
+        # The first call is only checked for accuracy, not timed, since it
+        # may include one-time work (e.g. compiling a program for a new input
+        # signature with TorchDynamo).
+        item, = config.run_loaded(loaded, [golden_item])
+        samples = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            config.run_loaded(loaded, [golden_item])
+            samples.append(time.perf_counter() - start)
+        report = ValueReport(
+            item.output, golden_item.output,
+            ErrorContext.empty().chain(
+                f'trace item #{i} - call to "{golden_item.symbol}"'),
+            args.rtol, args.atol)
+        outcome = "FAIL" if report.failed else "PASS"
+        print(f"{outcome} - trace item #{i} - call to \"{golden_item.symbol}\": "
+              f"{statistics.median(samples):.4f}s")
+        if report.failed:
+            failed = True
+            print(report.error_str())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import tempfile
+
+import torch
+
+import torch_mlir
+from torch_mlir.compiler_utils import PhaseRecorder
+
+
+class TanhModule(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+    def forward(self, x):
+        return torch.ops.aten.tanh(x)
+
+
+class ScaleModule(torch.nn.Module):
+    def __init__(self, scale):
+        super().__init__()
+        self.scale = scale
+    def forward(self, x):
+        return x * self.scale
+
+
+class LinearModule(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.linear = torch.nn.Linear(64, 32)
+    def forward(self, x):
+        return self.linear(x)
+
+
+with tempfile.TemporaryDirectory() as cache_dir:
+    cache = torch_mlir.CompilationCache(cache_dir)
+
+    # The first compilation populates the cache.
+    print(torch_mlir.compile(TanhModule(), torch.ones(2, 3), cache=cache))
+    print(f"hits={cache.hits} misses={cache.misses}")
+    # CHECK-LABEL: @forward
+    # CHECK: torch.aten.tanh %{{.*}} : !torch.vtensor<[2,3],f32> -> !torch.vtensor<[2,3],f32>
+    # CHECK: hits=0 misses=1
+
+    # An identical compilation is served from the cache.
+    print(torch_mlir.compile(TanhModule(), torch.ones(2, 3), cache=cache))
+    print(f"hits={cache.hits} misses={cache.misses}")
+    # CHECK-LABEL: @forward
+    # CHECK: torch.aten.tanh %{{.*}} : !torch.vtensor<[2,3],f32> -> !torch.vtensor<[2,3],f32>
+    # CHECK: hits=1 misses=1
+
+    # Different shapes result in a different cache key.
+    print(torch_mlir.compile(TanhModule(), torch.ones(4, 3), cache=cache))
+    print(f"hits={cache.hits} misses={cache.misses}")
+    # CHECK-LABEL: @forward
+    # CHECK: torch.aten.tanh %{{.*}} : !torch.vtensor<[4,3],f32> -> !torch.vtensor<[4,3],f32>
+    # CHECK: hits=1 misses=2
+
+    # So does a different output type.
+    print(torch_mlir.compile(TanhModule(), torch.ones(2, 3),
+                             output_type="linalg-on-tensors", cache=cache))
+    print(f"hits={cache.hits} misses={cache.misses}")
+    # CHECK-LABEL: @forward
+    # CHECK: math.tanh
+    # CHECK: hits=1 misses=3
+
+    # Compilations importing tensors as dense resources bypass the cache.
+    print(torch_mlir.compile(TanhModule(), torch.ones(2, 3), cache=cache,
+                             import_tensors_as_dense_resources=True))
+    print(f"hits={cache.hits} misses={cache.misses}")
+    # CHECK-LABEL: @forward
+    # CHECK: hits=1 misses=3
+
+    # Modules that only differ in the value of a plain attribute compile to
+    # different modules.
+    print(torch_mlir.compile(ScaleModule(2.0), torch.ones(2, 3), cache=cache))
+    print(torch_mlir.compile(ScaleModule(3.0), torch.ones(2, 3), cache=cache))
+    print(f"hits={cache.hits} misses={cache.misses}")
+    # CHECK-LABEL: @forward
+    # CHECK: torch.constant.float 2.000000e+00
+    # CHECK-LABEL: @forward
+    # CHECK: torch.constant.float 3.000000e+00
+    # CHECK: hits=1 misses=5
+
+    # Weights are externalized on cache hits too, and recorded as a phase
+    # either way.
+    model = LinearModule()
+    for _ in range(2):
+        with tempfile.TemporaryDirectory() as archive_path, \
+                PhaseRecorder() as recorder:
+            torch_mlir.compile(model, torch.ones(4, 64),
+                               output_type="linalg-on-tensors", cache=cache,
+                               weight_archive_path=archive_path)
+        print(f"hits={cache.hits} misses={cache.misses}",
+              "externalize_weights" in recorder.phases)
+    # CHECK: hits=1 misses=6 True
+    # CHECK: hits=2 misses=6 True
@@ -0,0 +1,47 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import json
+import os
+import tempfile
+
+import torch
+
+import torch_mlir
+
+class TanhModule(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+    def forward(self, x):
+        return torch.ops.aten.tanh(x)
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    trace_path = os.path.join(tmp_dir, "trace.json")
+    profile = torch_mlir.profile_compile(TanhModule(), torch.ones(2, 3),
+                                         output_type="linalg-on-tensors",
+                                         chrome_trace_path=trace_path)
+    with open(trace_path) as f:
+        trace = json.load(f)
+
+for p in profile.phases:
+    print(p.phase, p.op_count_before is not None)
+# CHECK: script False
+# CHECK-NEXT: annotate False
+# CHECK-NEXT: import True
+# CHECK-NEXT: torch_backend_pipeline True
+# CHECK-NEXT: backend_lowering True
+
+# Registered pipelines are expanded into their passes.
+print(len(profile.passes) > 2)
+# CHECK-NEXT: True
+print(len(profile.top_passes(3)))
+# CHECK-NEXT: 3
+
+print(sorted(set(e["cat"] for e in trace["traceEvents"])))
+# CHECK-NEXT: ['pass', 'phase']
+print("func.func" in str(profile.module))
+# CHECK-NEXT: True
@@ -0,0 +1,27 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import torch
+import torch_mlir
+
+class LinearModule(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.linear = torch.nn.Linear(3, 2)
+
+    def forward(self, x):
+        return self.linear(x)
+
+module = torch_mlir.compile(LinearModule(), torch.ones(4, 3),
+                            output_type="torch",
+                            import_tensors_as_dense_resources=True)
+print(module)
+
+# The weight and bias reference the storage of the parameters.
+# CHECK-DAG: torch.vtensor.literal(dense_resource<torch_tensor{{.*}}> : tensor<2x3xf32>)
+# CHECK-DAG: torch.vtensor.literal(dense_resource<torch_tensor{{.*}}> : tensor<2xf32>)
+# CHECK: dialect_resources
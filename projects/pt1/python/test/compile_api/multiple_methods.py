@@ -39,3 +39,14 @@ print(torch_mlir.compile(TwoMethodsModule(), example_args))
 # CHECK: module
 # CHECK-DAG: func.func @sin
 # CHECK-DAG: func.func @cos
+
+# Each method can be lowered to the backend in its own context, concurrently.
+print(torch_mlir.compile(TwoMethodsModule(), example_args,
+                         output_type="linalg-on-tensors",
+                         lowering_workers=2, lowering_use_processes=False,
+                         enable_multithreading=False))
+# CHECK: module
+# CHECK-DAG: func.func @sin(%{{.*}}: tensor<2x3xf32>) -> tensor<2x3xf32>
+# CHECK-DAG: math.sin
+# CHECK-DAG: func.func @cos(%{{.*}}: tensor<2x4xf32>) -> tensor<2x4xf32>
+# CHECK-DAG: math.cos
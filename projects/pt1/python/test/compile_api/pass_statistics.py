@@ -0,0 +1,34 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import torch
+
+import torch_mlir
+from torch_mlir.compiler_utils import PassStatistics
+
+class TanhModule(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+    def forward(self, x):
+        return torch.ops.aten.tanh(x)
+
+with PassStatistics() as stats:
+    torch_mlir.compile(TanhModule(), torch.ones(2, 3),
+                       output_type="linalg-on-tensors")
+
+for module_name, pipelines in stats.as_dict().items():
+    print(module_name)
+    for description, aggregate in pipelines.items():
+        print(description, aggregate["runs"])
+        for pass_name, pass_stats in aggregate["passes"].items():
+            print("  ", pass_name, pass_stats["op_count_after"] > 0)
+
+# CHECK: TanhModule
+# CHECK-NEXT: Lowering TorchScript IR -> Torch Backend IR 1
+# CHECK-NEXT: torchscript-module-to-torch-backend-pipeline{{.*}} True
+# CHECK-NEXT: Lowering Torch Backend IR -> Linalg-on-Tensors Backend IR 1
+# CHECK-NEXT: torch-backend-to-linalg-on-tensors-backend-pipeline True
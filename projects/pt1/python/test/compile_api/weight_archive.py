@@ -0,0 +1,109 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import tempfile
+
+import numpy as np
+import torch
+
+import torch_mlir
+from torch_mlir.weight_archive import WeightArchive
+
+class LinearModule(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.linear = torch.nn.Linear(64, 32)
+
+    def forward(self, x):
+        return self.linear(x)
+
+with tempfile.TemporaryDirectory() as archive_path:
+    module = torch_mlir.compile(LinearModule(), torch.ones(4, 64),
+                                output_type="linalg-on-tensors",
+                                weight_archive_path=archive_path)
+    print(module)
+    weights = WeightArchive(archive_path)
+    arguments = weights.get_arguments("forward")
+    print(len(arguments))
+    print(sorted(a.size for a in arguments))
+    print(all(isinstance(a, np.memmap) for a in arguments))
+
+# Only the weight is large enough to be passed as a trailing argument.
+# CHECK: func.func @forward(%{{.*}}: tensor<4x64xf32>, %{{.*}}: tensor<{{.*}}xf32>) -> tensor<4x32xf32>
+# CHECK: 1
+# CHECK-NEXT: [2048]
+# CHECK-NEXT: True
+
+with tempfile.TemporaryDirectory() as archive_path:
+    module = torch_mlir.compile(LinearModule(), torch.ones(4, 64),
+                                output_type="linalg-on-tensors",
+                                weight_archive_path=archive_path,
+                                weight_archive_min_elements=1)
+    weights = WeightArchive(archive_path)
+    print(sorted(a.size for a in weights.get_arguments("forward")))
+
+# With a lower threshold, the bias is externalized too.
+# CHECK: [32, 2048]
+
+
+class StructuralConstantsModule(torch.nn.Module):
+    """Uses integer constants that the backends need to see: the permutation
+    of a transpose and the indices of a gather."""
+
+    def __init__(self):
+        super().__init__()
+        self.linear = torch.nn.Linear(64, 32)
+        self.register_buffer("indices", torch.arange(2048) % 32)
+
+    def forward(self, x):
+        y = self.linear(x).permute(1, 0)
+        return torch.nn.functional.embedding(self.indices, y)
+
+
+for output_type in ["tosa", "stablehlo"]:
+    with tempfile.TemporaryDirectory() as archive_path:
+        module = torch_mlir.compile(StructuralConstantsModule(),
+                                    torch.ones(4, 64),
+                                    output_type=output_type,
+                                    weight_archive_path=archive_path,
+                                    weight_archive_min_elements=1)
+        print(module)
+        weights = WeightArchive(archive_path)
+        arguments = weights.get_arguments("forward")
+        print(output_type, sorted((a.dtype.name, a.size) for a in arguments))
+
+# Only the float constants are lifted, even with the lowest threshold. The
+# permutation and the indices stay in the module.
+# CHECK: func.func @forward(%{{.*}}: tensor<4x64xf32>, %{{.*}}: tensor<{{.*}}xf32>, %{{.*}}: tensor<{{.*}}xf32>) -> tensor<2048x4xf32>
+# CHECK: tosa.const{{.*}}tensor<2xi{{32|64}}>
+# CHECK: tosa.transpose
+# CHECK: tosa [('float32', 32), ('float32', 2048)]
+# CHECK: func.func @forward(%{{.*}}: tensor<4x64xf32>, %{{.*}}: tensor<{{.*}}xf32>, %{{.*}}: tensor<{{.*}}xf32>) -> tensor<2048x4xf32>
+# CHECK: stablehlo.constant{{.*}}tensor<{{.*}}xi64>
+# CHECK: stablehlo [('float32', 32), ('float32', 2048)]
+
+
+# Rewriting an archive doesn't modify the data of an archive that is already
+# mapped at the same path.
+with tempfile.TemporaryDirectory() as archive_path:
+    torch.manual_seed(0)
+    torch_mlir.compile(LinearModule(), torch.ones(4, 64),
+                       output_type="linalg-on-tensors",
+                       weight_archive_path=archive_path)
+    old_weights = WeightArchive(archive_path)
+    old_weight, = old_weights.get_arguments("forward")
+    old_copy = np.array(old_weight)
+    torch.manual_seed(1)
+    torch_mlir.compile(LinearModule(), torch.ones(4, 64),
+                       output_type="linalg-on-tensors",
+                       weight_archive_path=archive_path)
+    new_weight, = WeightArchive(archive_path).get_arguments("forward")
+    print("old mapping unchanged:", np.array_equal(old_weight, old_copy))
+    print("new archive differs:", not np.array_equal(new_weight, old_copy))
+
+# CHECK: old mapping unchanged: True
+# CHECK-NEXT: new archive differs: True
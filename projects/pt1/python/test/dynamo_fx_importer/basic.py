@@ -52,10 +52,10 @@ basic(torch.randn(3, 4))
 # CHECK:           %[[INT4:.*]] = torch.constant.int 4
 # CHECK:           %[[LIST:.*]] = torch.prim.ListConstruct %[[INT3]], %[[INT4]] : (!torch.int, !torch.int) -> !torch.list<int>
 # CHECK:           %[[INT5:.*]] = torch.constant.int 5
-# CHECK:           %[[NONE0:.*]] = torch.constant.none
+# CHECK:           %[[NONE:.*]] = torch.constant.none
 # CHECK:           %[[DEVICE_CPU:.*]] = torch.constant.device "cpu"
-# CHECK:           %[[NONE1:.*]] = torch.constant.none
-# CHECK:           %[[RANDN:.*]] = torch.aten.randn %[[LIST]], %[[INT5]], %[[NONE0]], %[[DEVICE_CPU]], %[[NONE1]] : !torch.list<int>, !torch.int, !torch.none, !torch.Device, !torch.none -> !torch.vtensor<[3,4],f16>
+# CHECK-NOT:       torch.constant.none
+# CHECK:           %[[RANDN:.*]] = torch.aten.randn %[[LIST]], %[[INT5]], %[[NONE]], %[[DEVICE_CPU]], %[[NONE]] : !torch.list<int>, !torch.int, !torch.none, !torch.Device, !torch.none -> !torch.vtensor<[3,4],f16>
 # CHECK:           return %[[RANDN]] : !torch.vtensor<[3,4],f16>
 @dynamo.optimize(my_backend)
 def literals_list_device_int_none_dtype():
@@ -70,12 +70,11 @@ literals_list_device_int_none_dtype()
 
 # CHECK-LABEL:   func.func @literals_bool(
 # CHECK-SAME:                                %[[ARG0:.*]]: !torch.vtensor<[3,4],f32> loc(unknown)) -> !torch.vtensor<[3,4],f32> {
-# CHECK:           %[[NONE0:.*]] = torch.constant.none
-# CHECK:           %[[NONE1:.*]] = torch.constant.none
-# CHECK:           %[[NONE2:.*]] = torch.constant.none
+# CHECK:           %[[NONE:.*]] = torch.constant.none
+# CHECK-NOT:       torch.constant.none
 # CHECK:           %[[BOOL_FALSE:.*]] = torch.constant.bool false
-# CHECK:           %[[NONE3:.*]] = torch.constant.none
-# CHECK:           %[[EMPTY_LIKE:.*]] = torch.aten.empty_like %[[ARG0]], %[[NONE0]], %[[NONE1]], %[[NONE2]], %[[BOOL_FALSE]], %[[NONE3]] : !torch.vtensor<[3,4],f32>, !torch.none, !torch.none, !torch.none, !torch.bool, !torch.none -> !torch.vtensor<[3,4],f32>
+# CHECK-NOT:       torch.constant.none
+# CHECK:           %[[EMPTY_LIKE:.*]] = torch.aten.empty_like %[[ARG0]], %[[NONE]], %[[NONE]], %[[NONE]], %[[BOOL_FALSE]], %[[NONE]] : !torch.vtensor<[3,4],f32>, !torch.none, !torch.none, !torch.none, !torch.bool, !torch.none -> !torch.vtensor<[3,4],f32>
 # CHECK:           return %[[EMPTY_LIKE]] : !torch.vtensor<[3,4],f32>
 @dynamo.optimize(my_backend)
 def literals_bool(x):
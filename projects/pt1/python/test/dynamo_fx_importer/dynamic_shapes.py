@@ -0,0 +1,46 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+from typing import List
+
+import torch
+import torch.fx
+import torch._dynamo as dynamo
+from torch._dynamo.backends.common import aot_autograd
+from torch._functorch.aot_autograd import make_boxed_compiler, get_aot_compilation_context, set_model_name
+
+from torch_mlir._dynamo_fx_importer import import_fx_graph_as_func
+
+
+@make_boxed_compiler
+def my_aot_autograd_backend(gm: torch.fx.GraphModule,
+                            example_inputs: List[torch.Tensor]):
+    *_, model_name, nth_graph = get_aot_compilation_context()
+    mlir_module = import_fx_graph_as_func(gm.graph, model_name)
+    print(mlir_module.operation.get_asm())
+    return gm
+
+
+my_backend = aot_autograd(fw_compiler=my_aot_autograd_backend)
+
+
+# The symbolic dimension is imported as `?`, and the symbolic shape and the
+# range of the symbol are recorded as attributes.
+# CHECK-LABEL:   func.func @dynamic_dim(
+# CHECK-SAME:        !torch.vtensor<[?,4],f32> {torch.symbolic_shape = ["s0", "4"]}
+# CHECK-SAME:        -> !torch.vtensor<[?,4],f32>
+# CHECK-SAME:        attributes {torch.symbol_ranges = {s0 = {min = 2 : i64}}}
+# CHECK:           torch.aten.tanh %{{.*}} : !torch.vtensor<[?,4],f32> -> !torch.vtensor<[?,4],f32>
+@dynamo.optimize(my_backend)
+def dynamic_dim(x):
+    return torch.tanh(x)
+
+
+set_model_name("dynamic_dim")
+x = torch.randn(3, 4)
+dynamo.mark_dynamic(x, 0)
+dynamic_dim(x)
@@ -0,0 +1,51 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import torch
+
+from torch_mlir_e2e_test.configs.torchdynamo import _lift_params_to_attrs, jit
+
+
+class Scale(torch.nn.Module):
+
+    def __init__(self):
+        super().__init__()
+        self.weight = torch.nn.Parameter(
+            torch.tensor([[1.0, 2.0], [3.0, 4.0]]))
+
+    def forward(self, x):
+        return x * self.weight
+
+
+# The parameter is imported as a literal instead of a function argument.
+# CHECK-LABEL:   func.func @Scale(
+# CHECK-SAME:                     %[[ARG0:.*]]: !torch.vtensor<[2,2],f32>) -> !torch.vtensor<[2,2],f32> {
+# CHECK:           %[[WEIGHT:.*]] = torch.vtensor.literal(dense<{{\[}}[1.000000e+00, 2.000000e+00], [3.000000e+00, 4.000000e+00]]> : tensor<2x2xf32>) : !torch.vtensor<[2,2],f32>
+# CHECK:           %[[MUL:.*]] = torch.aten.mul.Tensor %[[ARG0]], %[[WEIGHT]] : !torch.vtensor<[2,2],f32>, !torch.vtensor<[2,2],f32> -> !torch.vtensor<[2,2],f32>
+# CHECK:           return %[[MUL]] : !torch.vtensor<[2,2],f32>
+print(
+    jit(Scale(), [torch.ones(2, 2)],
+        output_type="torch",
+        params_as_constants=True))
+
+
+# Quantized tensors can't be imported as literals, so their placeholders are
+# kept and they remain leading arguments.
+def scale_and_shift(quantized_shift, weight, x):
+    return x * weight + quantized_shift.dequantize()
+
+
+gm = torch.fx.symbolic_trace(scale_and_shift)
+quantized_shift = torch.quantize_per_tensor(torch.ones(2, 2), 0.1, 0,
+                                            torch.qint8)
+lifted = _lift_params_to_attrs(gm, [quantized_shift, torch.ones(2, 2)])
+# CHECK: placeholder quantized_shift
+# CHECK: get_attr _param1
+# CHECK: placeholder x
+for node in lifted.graph.nodes:
+    if node.op in ("placeholder", "get_attr"):
+        print(node.op, node.target)
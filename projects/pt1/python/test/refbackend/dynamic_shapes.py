@@ -0,0 +1,39 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import torch
+
+from torch_mlir_e2e_test.configs.torchdynamo import jit
+from torch_mlir_e2e_test.linalg_on_tensors_backends.refbackend import RefBackendLinalgOnTensorsBackend
+
+
+class DynamicBatchModule(torch.nn.Module):
+
+    def forward(self, x):
+        return torch.tanh(x).sum(dim=1) * 2
+
+
+# A graph traced with a symbolic batch size lowers to linalg, without the
+# symbolic shape annotations of the torch-level arguments.
+# CHECK-LABEL: func.func @DynamicBatchModule(
+# CHECK-SAME:      %{{.*}}: tensor<?x4xf32>) -> tensor<?xf32>
+# CHECK-NOT:   torch.symbolic_shape
+module = jit(DynamicBatchModule(), [torch.rand(3, 4)],
+             output_type="linalg-on-tensors",
+             dynamic=True)
+print(module)
+
+backend = RefBackendLinalgOnTensorsBackend()
+invoker = backend.load(backend.compile(module))
+# The same compiled program runs at several batch sizes.
+# CHECK: batch size 2: shape [2] correct: True
+# CHECK: batch size 7: shape [7] correct: True
+for batch_size in [2, 7]:
+    x = torch.rand(batch_size, 4)
+    result = torch.from_numpy(invoker.DynamicBatchModule(x.numpy()))
+    print(f"batch size {batch_size}: shape {list(result.shape)} correct:",
+          torch.allclose(result, DynamicBatchModule()(x)))
@@ -0,0 +1,69 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import ctypes.util
+
+import numpy as np
+import torch
+
+import torch_mlir
+from torch_mlir_e2e_test.linalg_on_tensors_backends.refbackend import RefBackendLinalgOnTensorsBackend
+
+
+class MatmulModule(torch.nn.Module):
+
+    def forward(self, lhs, rhs):
+        return torch.mm(lhs, rhs)
+
+
+class ConvModule(torch.nn.Module):
+
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.conv = torch.nn.Conv2d(3, 5, kernel_size=3, padding=1)
+
+    def forward(self, x):
+        return self.conv(x)
+
+
+# The sizes are deliberately not multiples of the tile and vector sizes, so
+# that the remainder loops are exercised too.
+torch.manual_seed(0)
+CASES = [
+    ("matmul", MatmulModule, [torch.rand(37, 70), torch.rand(70, 45)]),
+    ("conv", ConvModule, [torch.rand(2, 3, 19, 23)]),
+]
+
+# Level 2 needs the LLVM OpenMP runtime.
+libomp = ctypes.util.find_library("omp")
+
+for level in (0, 1, 2):
+    if level == 2 and libomp is None:
+        for name, _, _ in CASES:
+            print(f"level {level} {name}: skipped (no OpenMP runtime found)")
+        continue
+    backend = RefBackendLinalgOnTensorsBackend(
+        optimization_level=level,
+        shared_libs=[libomp] if level == 2 else None)
+    for name, module_factory, inputs in CASES:
+        module = module_factory()
+        module.train(False)
+        expected = module(*inputs).detach().numpy()
+        compiled = torch_mlir.compile(module, inputs,
+                                      output_type="linalg-on-tensors")
+        invoker = backend.load(backend.compile(compiled))
+        result = invoker.forward(*[x.numpy() for x in inputs])
+        close = np.allclose(result, expected, rtol=1e-4, atol=1e-5)
+        print(f"level {level} {name}: {close}")
+
+# CHECK: level 0 matmul: True
+# CHECK: level 0 conv: True
+# CHECK: level 1 matmul: True
+# CHECK: level 1 conv: True
+# CHECK: level 2 matmul: {{True|skipped \(no OpenMP runtime found\)}}
+# CHECK: level 2 conv: {{True|skipped \(no OpenMP runtime found\)}}
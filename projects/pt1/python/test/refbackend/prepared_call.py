@@ -0,0 +1,75 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import threading
+
+import numpy as np
+import torch
+
+import torch_mlir
+from torch_mlir_e2e_test.linalg_on_tensors_backends.refbackend import RefBackendLinalgOnTensorsBackend
+
+
+class AddModule(torch.nn.Module):
+
+    def forward(self, x, y):
+        return x + y
+
+
+backend = RefBackendLinalgOnTensorsBackend()
+module = torch_mlir.compile(AddModule(), [torch.ones(4, 8), torch.ones(4, 8)],
+                            output_type="linalg-on-tensors")
+invoker = backend.load(backend.compile(module))
+
+x = np.arange(32, dtype=np.float32).reshape(4, 8)
+call = invoker.prepare("forward", [x, ((4, 8), np.float32)])
+
+# CHECK: prepared call: True
+print("prepared call:", np.array_equal(call(x, x), x + x))
+
+# CHECK: prepared call with out: True
+out = np.empty_like(x)
+result = call(x, np.ones_like(x), out=out)
+print("prepared call with out:", result is out and np.array_equal(out, x + 1))
+
+# CHECK: Argument #0 of prepared call to 'forward' has shape (2, 2) and dtype float32, but the call was prepared for shape (4, 8) and dtype float32
+try:
+    call(np.ones((2, 2), dtype=np.float32), x)
+except ValueError as e:
+    print(e)
+
+# CHECK: Argument #1 of prepared call to 'forward' must be C-contiguous
+try:
+    call(x, np.ones((8, 4), dtype=np.float32).T)
+except ValueError as e:
+    print(e)
+
+# Invoke the same prepared call and invoker from many threads at once. Each
+# thread passes different arguments, so sharing calling structures or
+# results between threads would show up as wrong results.
+mismatches = []
+
+
+def invoke_repeatedly(i):
+    a = np.full((4, 8), i, dtype=np.float32)
+    expected = a + x
+    for _ in range(200):
+        if not np.array_equal(call(a, x), expected) or \
+                not np.array_equal(invoker.forward(a, x), expected):
+            mismatches.append(i)
+            return
+
+
+threads = [
+    threading.Thread(target=invoke_repeatedly, args=(i,)) for i in range(8)
+]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+# CHECK: concurrent mismatches: []
+print("concurrent mismatches:", mismatches)
@@ -0,0 +1,49 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import os
+import tempfile
+
+import numpy as np
+import torch
+
+import torch_mlir
+from torch_mlir_e2e_test.linalg_on_tensors_backends.refbackend import RefBackendLinalgOnTensorsBackend
+
+
+class AddModule(torch.nn.Module):
+
+    def forward(self, x, y):
+        return x + y
+
+
+backend = RefBackendLinalgOnTensorsBackend()
+module = torch_mlir.compile(AddModule(), [torch.ones(4, 8), torch.ones(4, 8)],
+                            output_type="linalg-on-tensors")
+artifact = backend.compile(module)
+
+x = np.arange(32, dtype=np.float32).reshape(4, 8)
+with tempfile.TemporaryDirectory() as tmp_dir:
+    path = os.path.join(tmp_dir, "add.mlirbc")
+    object_file_path = os.path.join(tmp_dir, "add.o")
+    backend.save(artifact, path, object_file_path=object_file_path)
+
+    # CHECK: object file written: True
+    print("object file written:",
+          os.path.getsize(object_file_path) > 0)
+
+    # The reloaded module is invoked without re-running the lowering pipeline.
+    # CHECK: reloaded forward: True
+    invoker = backend.load_from_path(path)
+    print("reloaded forward:", np.array_equal(invoker.forward(x, x), x + x))
+
+    # CHECK: reloaded forward without object file: True
+    path = os.path.join(tmp_dir, "add_no_object_file.mlirbc")
+    backend.save(artifact, path)
+    invoker = backend.load_from_path(path)
+    print("reloaded forward without object file:",
+          np.array_equal(invoker.forward(x, x), x + x))
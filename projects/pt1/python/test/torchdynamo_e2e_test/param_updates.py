@@ -0,0 +1,61 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import torch
+
+from torch_mlir_e2e_test.configs.torchdynamo import (
+    ShapeBucketedModule,
+    TorchDynamoTestConfig,
+)
+from torch_mlir_e2e_test.framework import TraceItem
+from torch_mlir_e2e_test.linalg_on_tensors_backends.refbackend import RefBackendLinalgOnTensorsBackend
+
+# The parameters are compiled in as constants, so the compiled programs must
+# not be reused after the parameters change.
+
+
+class ScaleModule(torch.nn.Module):
+
+    def __init__(self):
+        super().__init__()
+        self.weight = torch.nn.Parameter(torch.ones(4))
+
+    def forward(self, x):
+        return x * self.weight
+
+
+x = torch.rand(3, 4)
+trace = [TraceItem(symbol="forward", inputs=[x], output=None)]
+
+model = ScaleModule()
+config = TorchDynamoTestConfig(RefBackendLinalgOnTensorsBackend())
+loaded = config.load(config.compile(model))
+item, = config.run_loaded(loaded, trace)
+# CHECK: before update: True
+print("before update:", torch.allclose(item.output, x))
+with torch.no_grad():
+    model.weight.mul_(2)
+item, = config.run_loaded(loaded, trace)
+# CHECK: after in-place update: True
+print("after in-place update:", torch.allclose(item.output, x * 2))
+model.weight = torch.nn.Parameter(torch.full((4, ), 3.0))
+item, = config.run_loaded(loaded, trace)
+# CHECK: after replacement: True
+print("after replacement:", torch.allclose(item.output, x * 3))
+
+model = ScaleModule()
+bucketed = ShapeBucketedModule(model,
+                               RefBackendLinalgOnTensorsBackend(),
+                               dynamic_axes={0: [0]})
+# CHECK: bucketed before update: True
+print("bucketed before update:",
+      torch.allclose(torch.from_numpy(bucketed(x))[:3], x))
+with torch.no_grad():
+    model.weight.mul_(2)
+# CHECK: bucketed after update: True
+print("bucketed after update:",
+      torch.allclose(torch.from_numpy(bucketed(x))[:3], x * 2))
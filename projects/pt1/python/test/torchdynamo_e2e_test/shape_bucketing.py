@@ -0,0 +1,95 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import torch
+
+from torch_mlir_e2e_test.configs.torchdynamo import (
+    ShapeBucketedModule,
+    _LRUCache,
+    bucket_size,
+)
+from torch_mlir_e2e_test.linalg_on_tensors_backends.refbackend import RefBackendLinalgOnTensorsBackend
+
+# CHECK: power-of-two buckets: [1, 1, 2, 4, 4, 8, 128, 128]
+print("power-of-two buckets:",
+      [bucket_size(size) for size in [0, 1, 2, 3, 4, 5, 65, 128]])
+
+# CHECK: explicit buckets: [16, 16, 64, 64]
+print("explicit buckets:",
+      [bucket_size(size, [16, 64]) for size in [1, 16, 17, 64]])
+
+# CHECK: ValueError: Size 65 is larger than the largest bucket 64
+try:
+    bucket_size(65, [16, 64])
+except ValueError as e:
+    print("ValueError:", e)
+
+cache = _LRUCache(max_size=2)
+cache.put("a", 1)
+cache.put("b", 2)
+# Reading "a" makes "b" the least recently used entry.
+cache.get("a")
+cache.put("c", 3)
+# CHECK: lru: 2 1 None 3
+print("lru:", len(cache), cache.get("a"), cache.get("b"), cache.get("c"))
+# Overwriting an entry doesn't grow the cache.
+cache.put("c", 4)
+# CHECK: lru after overwrite: 2 4
+print("lru after overwrite:", len(cache), cache.get("c"))
+
+
+class CountingBackend(RefBackendLinalgOnTensorsBackend):
+    """Counts the number of programs compiled."""
+
+    def __init__(self):
+        super().__init__()
+        self.num_compiles = 0
+
+    def compile(self, imported_module):
+        self.num_compiles += 1
+        return super().compile(imported_module)
+
+
+class ScaleModule(torch.nn.Module):
+
+    def __init__(self):
+        super().__init__()
+        self.register_buffer("scale", torch.tensor(2.0))
+
+    def forward(self, x):
+        return x * self.scale
+
+
+backend = CountingBackend()
+module = ShapeBucketedModule(ScaleModule(),
+                             backend,
+                             dynamic_axes={0: [1]},
+                             pad_value=1.0,
+                             max_cache_size=1)
+
+
+def run(length):
+    x = torch.rand(2, length)
+    output = torch.from_numpy(module(x))
+    # The output is returned at the padded size; the unpadded positions hold
+    # the result for `x` and the padded ones the result for `pad_value`.
+    print(f"length {length}: output shape {list(output.shape)},",
+          "unpadded correct:", torch.allclose(output[:, :length], x * 2),
+          "padding:", output[:, length:].flatten().tolist(),
+          "compiles:", backend.num_compiles)
+
+
+# CHECK: length 3: output shape [2, 4], unpadded correct: True padding: [2.0, 2.0] compiles: 1
+run(3)
+# Same bucket: the compiled program is reused.
+# CHECK: length 4: output shape [2, 4], unpadded correct: True padding: [] compiles: 1
+run(4)
+# CHECK: length 5: output shape [2, 8], unpadded correct: True padding: [2.0, 2.0, 2.0, 2.0, 2.0, 2.0] compiles: 2
+run(5)
+# The cache only holds one program, so the 4-bucket was evicted.
+# CHECK: length 3: output shape [2, 4], unpadded correct: True padding: [2.0, 2.0] compiles: 3
+run(3)
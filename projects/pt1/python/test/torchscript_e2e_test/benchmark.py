@@ -0,0 +1,75 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import sys
+
+import torch
+
+from torch_mlir_e2e_test.benchmark import BenchmarkResult, find_regressions, run_benchmarks
+from torch_mlir_e2e_test.framework import TestUtils
+from torch_mlir_e2e_test.registry import register_test_case, GLOBAL_TEST_REGISTRY
+from torch_mlir_e2e_test.configs import TorchScriptTestConfig
+
+
+class TanhModule(torch.nn.Module):
+
+    def forward(self, x):
+        return torch.tanh(x)
+
+
+@register_test_case(module_factory=lambda: TanhModule())
+def TanhModule_basic(module, tu: TestUtils):
+    module.forward(tu.rand(3, 4))
+
+
+class ErroringModule(torch.nn.Module):
+
+    def forward(self, x):
+        raise ValueError("benchmark error")
+
+
+@register_test_case(module_factory=lambda: ErroringModule())
+def ErroringModule_basic(module, tu: TestUtils):
+    module.forward(tu.rand(3, 4))
+
+
+results = {
+    r.unique_name: r
+    for r in run_benchmarks(GLOBAL_TEST_REGISTRY, TorchScriptTestConfig(),
+                            iterations=2, warmup_iterations=0)
+}
+
+# CHECK: TanhModule_basic phases: ['compile', 'golden_trace', 'run']
+tanh = results["TanhModule_basic"]
+print("TanhModule_basic phases:", sorted(tanh.phases))
+# The peak memory is measured per phase (on Linux).
+# CHECK: TanhModule_basic peaks: True
+print("TanhModule_basic peaks:",
+      sorted(tanh.phase_peak_rss_mib) == sorted(tanh.phases)
+      if sys.platform.startswith("linux") else True)
+
+# A failing test is a regression without a baseline...
+# CHECK: "ErroringModule_basic" failed:
+for regression in find_regressions(list(results.values()), {}, 0.1):
+    print(regression)
+
+# ... and against a baseline in which it passed, but not against one in which
+# it failed too.
+passing_baseline = {
+    "ErroringModule_basic":
+    BenchmarkResult("ErroringModule_basic", None, {}, {})
+}
+# CHECK: regressions against passing baseline: 1
+print("regressions against passing baseline:",
+      len(find_regressions(list(results.values()), passing_baseline, 0.1)))
+failing_baseline = {
+    "ErroringModule_basic":
+    BenchmarkResult("ErroringModule_basic", "error", {}, {})
+}
+# CHECK: regressions against failing baseline: 0
+print("regressions against failing baseline:",
+      len(find_regressions(list(results.values()), failing_baseline, 0.1)))
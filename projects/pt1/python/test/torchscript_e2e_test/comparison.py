@@ -0,0 +1,78 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import json
+import math
+import os
+import tempfile
+
+import torch
+
+from torch_mlir_e2e_test.comparison import (
+    ComparisonResult,
+    compare_configs,
+    report_comparison,
+    write_comparison_results,
+)
+from torch_mlir_e2e_test.framework import TestUtils
+from torch_mlir_e2e_test.registry import register_test_case, GLOBAL_TEST_REGISTRY
+from torch_mlir_e2e_test.configs import NativeTorchTestConfig, TorchScriptTestConfig
+
+
+class MmModule(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+
+    def forward(self, lhs, rhs):
+        return torch.mm(lhs, rhs)
+
+
+@register_test_case(module_factory=lambda: MmModule())
+def MmModule_basic(module, tu: TestUtils):
+    module.forward(tu.rand(4, 4), tu.rand(4, 4))
+
+
+@register_test_case(module_factory=lambda: MmModule())
+def MmModule_badGoldenTrace(module, tu: TestUtils):
+    module.forward(tu.rand(4, 3), tu.rand(4, 3))
+
+
+# A test whose golden trace can't be generated isn't reported as a failure
+# of the configs.
+# CHECK:      "MmModule_badGoldenTrace":
+# CHECK-NEXT:     native_torch: GOLDEN_TRACE_ERROR
+# CHECK-NEXT:     torchscript: GOLDEN_TRACE_ERROR
+# CHECK:      "MmModule_basic":
+# CHECK-NEXT:     native_torch: PASS err=
+# CHECK-NEXT:     torchscript: PASS err=
+results = compare_configs(GLOBAL_TEST_REGISTRY, {
+    "native_torch": NativeTorchTestConfig(),
+    "torchscript": TorchScriptTestConfig(),
+})
+report_comparison(results)
+
+# An output that doesn't match the structure of the golden output has an
+# infinite error, which is written as a string to keep the JSON valid.
+results.append(
+    ComparisonResult("MmModule_mismatch", "torchscript", "FAIL", math.inf,
+                     0.1, 0.01))
+with tempfile.TemporaryDirectory() as tmp_dir:
+    path = os.path.join(tmp_dir, "comparison.json")
+    write_comparison_results(results, path)
+    with open(path) as f:
+        text = f.read()
+    # CHECK: Infinity in JSON: False
+    print("Infinity in JSON:", "Infinity" in text)
+    written = json.loads(text)
+    # CHECK: mismatch error: inf inf
+    print("mismatch error:", written[-1]["max_abs_error"],
+          float(written[-1]["max_abs_error"]))
+    # Finite errors are still written as numbers.
+    # CHECK: basic error is a number: True
+    print("basic error is a number:", all(
+        isinstance(r["max_abs_error"], float) for r in written
+        if r["unique_name"] == "MmModule_basic"))
@@ -0,0 +1,94 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import ctypes
+import time
+
+import torch
+
+from torch_mlir_e2e_test.framework import run_tests, TestUtils
+from torch_mlir_e2e_test.reporting import report_results
+from torch_mlir_e2e_test.registry import register_test_case, GLOBAL_TEST_REGISTRY
+from torch_mlir_e2e_test.configs import TorchScriptTestConfig
+
+
+class CrashModule(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+
+    def forward(self, x):
+        return x
+
+
+# The golden trace is generated by running the module eagerly, so the crash
+# and the hang happen in the worker process before anything is compiled.
+@register_test_case(module_factory=lambda: CrashModule())
+def CrashModule_basic(module, tu: TestUtils):
+    ctypes.string_at(0)
+    module.forward(tu.rand(4))
+
+
+class HangModule(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+
+    def forward(self, x):
+        return x
+
+
+@register_test_case(module_factory=lambda: HangModule())
+def HangModule_basic(module, tu: TestUtils):
+    time.sleep(3600)
+    module.forward(tu.rand(4))
+
+
+class MmModule(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+
+    def forward(self, lhs, rhs):
+        return torch.mm(lhs, rhs)
+
+
+@register_test_case(module_factory=lambda: MmModule())
+def MmModule_basic(module, tu: TestUtils):
+    module.forward(tu.rand(4, 4), tu.rand(4, 4))
+
+
+@register_test_case(module_factory=lambda: MmModule())
+def MmModule_basic2(module, tu: TestUtils):
+    module.forward(tu.rand(4, 4), tu.rand(4, 4))
+
+
+# CHECK: FAIL - "CrashModule_basic"
+# CHECK: FAIL - "HangModule_basic"
+# CHECK: PASS - "MmModule_basic"
+# CHECK: PASS - "MmModule_basic2"
+
+# CHECK:     FAIL - "CrashModule_basic"
+# CHECK-NEXT:    Runtime error: Testing process terminated with exit code -11.
+# The worker enables faulthandler, so the stack at the crash is captured.
+# CHECK:         Captured stderr:
+# CHECK:         Fatal Python error: Segmentation fault
+# CHECK:         CrashModule_basic
+# CHECK:     FAIL - "HangModule_basic"
+# CHECK-NEXT:    Runtime error: Test timed out after 5 seconds.
+
+# CHECK:      Summary:
+# CHECK-NEXT:     Passed: 2
+# CHECK-NEXT:     Failed: 2
+def main():
+    config = TorchScriptTestConfig()
+    # With a single worker, the remaining tests can only pass if the crashed
+    # and the hung worker are replaced.
+    results = run_tests(GLOBAL_TEST_REGISTRY, config, num_workers=1,
+                        timeout=5)
+    report_results(results, set(), verbose=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -119,6 +119,7 @@ class ErroneousModule(torch.nn.Module):
     # CHECK-NEXT: @ trace item #8 - call to "test_tensor_value_mismatch"
     # CHECK-NEXT: @ output of call to "test_tensor_value_mismatch"
     # CHECK-NEXT: ERROR: value (Tensor with shape=[3], dtype=torch.float32, min=+1.0, max=+3.0, mean=+2.0) is not close to golden value (Tensor with shape=[3], dtype=torch.float32, min=+1.5, max=+3.5, mean=+2.5)
+    # CHECK-NEXT: 3 of 3 elements are not close (rtol=0.001, atol=1e-07), max abs error=0.5, max rel error=0.3333, first mismatch at index [0]
     @torch.jit.export
     def test_tensor_value_mismatch(self):
         if torch.jit.is_scripting():
@@ -136,6 +137,19 @@ class ErroneousModule(torch.nn.Module):
         else:
             return torch.tensor([1., 2., 3.])
 
+    # A finite value is not close to an infinite golden value, even though
+    # the relative tolerance is infinite.
+    # CHECK-NEXT: @ trace item #10 - call to "test_tensor_inf_mismatch"
+    # CHECK-NEXT: @ output of call to "test_tensor_inf_mismatch"
+    # CHECK-NEXT: ERROR: value (Tensor with shape=[3], dtype=torch.float32, min=+1.0, max=+3.0, mean=+2.0) is not close to golden value (Tensor with shape=[3], dtype=torch.float32, min=+1.0, max=+inf, mean=+inf)
+    # CHECK-NEXT: 1 of 3 elements are not close (rtol=0.001, atol=1e-07), max abs error=inf, max rel error=inf, first mismatch at index [1]
+    @torch.jit.export
+    def test_tensor_inf_mismatch(self):
+        if torch.jit.is_scripting():
+            return torch.tensor([1., 2., 3.])
+        else:
+            return torch.tensor([1., float("inf"), 3.])
+
 
 @register_test_case(module_factory=lambda: ErroneousModule())
 def ErroneousModule_basic(module, tu: TestUtils):
@@ -149,6 +163,7 @@ def ErroneousModule_basic(module, tu: TestUtils):
     module.test_recursive()
     module.test_tensor_value_mismatch()
     module.test_tensor_shape_mismatch()
+    module.test_tensor_inf_mismatch()
 
 
 def main():
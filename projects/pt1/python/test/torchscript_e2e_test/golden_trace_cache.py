@@ -0,0 +1,81 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import importlib.util
+import os
+import tempfile
+
+import torch
+
+from torch_mlir_e2e_test.framework import Test, TraceItem
+from torch_mlir_e2e_test.golden_trace_cache import (GoldenTraceCache,
+                                                    compute_golden_trace_key,
+                                                    hash_source_file)
+
+TEST_SOURCE = """
+import torch
+
+
+class ScaleModule(torch.nn.Module):
+
+    def forward(self, x):
+        return x * {scale}
+
+
+def ScaleModule_basic(module, tu):
+    module.forward(torch.ones(2))
+"""
+
+
+def load_test(tmp_dir, scale):
+    path = os.path.join(tmp_dir, "scale_test.py")
+    with open(path, "w") as f:
+        f.write(TEST_SOURCE.format(scale=scale))
+    # The source file hashes are memoized, so forget them when the source
+    # changes.
+    hash_source_file.cache_clear()
+    spec = importlib.util.spec_from_file_location("scale_test", path)
+    test_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(test_module)
+    return Test(unique_name="ScaleModule_basic",
+                program_factory=test_module.ScaleModule,
+                program_invoker=test_module.ScaleModule_basic)
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    cache = GoldenTraceCache(os.path.join(tmp_dir, "cache"))
+    test = load_test(tmp_dir, 2.0)
+    key = compute_golden_trace_key(test)
+
+    # CHECK: first lookup hit: False
+    print("first lookup hit:", cache.lookup(key) is not None)
+    # CHECK: generated output: [2.0, 2.0]
+    trace = cache.get_golden_trace(test)
+    print("generated output:", trace[0].output.tolist())
+
+    # Replace the stored entry, so that a hit is distinguishable from
+    # regenerating the golden trace.
+    cache.store(key, [
+        TraceItem(symbol="forward",
+                  inputs=[torch.ones(2)],
+                  output=torch.zeros(2))
+    ])
+    # CHECK: cached output: [0.0, 0.0]
+    trace = cache.get_golden_trace(test)
+    print("cached output:", trace[0].output.tolist())
+
+    # Changing the source of the test changes the key, so the golden trace is
+    # regenerated.
+    test = load_test(tmp_dir, 3.0)
+    new_key = compute_golden_trace_key(test)
+    # CHECK: key changed: True
+    print("key changed:", new_key != key)
+    # CHECK: lookup after source change hit: False
+    print("lookup after source change hit:", cache.lookup(new_key) is not None)
+    # CHECK: regenerated output: [3.0, 3.0]
+    trace = cache.get_golden_trace(test)
+    print("regenerated output:", trace[0].output.tolist())
@@ -0,0 +1,61 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import ctypes
+import tempfile
+
+import torch
+
+from torch_mlir_e2e_test.framework import TestUtils
+from torch_mlir_e2e_test.incremental import TestResultStore, run_tests_incrementally
+from torch_mlir_e2e_test.registry import register_test_case, GLOBAL_TEST_REGISTRY
+from torch_mlir_e2e_test.configs import TorchScriptTestConfig
+
+
+class MmModule(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+
+    def forward(self, lhs, rhs):
+        return torch.mm(lhs, rhs)
+
+
+@register_test_case(module_factory=lambda: MmModule())
+def MmModule_basic(module, tu: TestUtils):
+    module.forward(tu.rand(4, 4), tu.rand(4, 4))
+
+
+@register_test_case(module_factory=lambda: MmModule())
+def MmModule_crash(module, tu: TestUtils):
+    ctypes.string_at(0)
+    module.forward(tu.rand(4, 4), tu.rand(4, 4))
+
+
+def run(store):
+    results, reused = run_tests_incrementally(GLOBAL_TEST_REGISTRY,
+                                              TorchScriptTestConfig(),
+                                              "torchscript", store,
+                                              num_workers=1)
+    for result in results:
+        print(result.unique_name,
+              "passed:", result.compilation_error is None and
+              result.runtime_error is None,
+              "aborted:", result.aborted)
+    print("reused:", reused)
+
+
+with tempfile.TemporaryDirectory() as store_dir:
+    store = TestResultStore(store_dir)
+    # CHECK: MmModule_basic passed: True aborted: False
+    # CHECK: MmModule_crash passed: False aborted: True
+    # CHECK: reused: []
+    run(store)
+    # The result of the crashed test isn't stored, so it runs again.
+    # CHECK: MmModule_basic passed: True aborted: False
+    # CHECK: MmModule_crash passed: False aborted: True
+    # CHECK: reused: ['MmModule_basic']
+    run(store)
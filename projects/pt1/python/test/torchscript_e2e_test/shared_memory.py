@@ -0,0 +1,112 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import os
+from multiprocessing import resource_tracker, shared_memory
+
+import multiprocess as mp
+import torch
+
+from torch_mlir_e2e_test.framework import (
+    TestResult,
+    TraceItem,
+    _move_result_to_shared_memory,
+    _take_result_from_shared_memory,
+)
+
+torch.manual_seed(0)
+matrix = torch.rand(5, 7)
+TENSORS = {
+    "contiguous": torch.rand(3, 4),
+    "transposed": matrix.t(),
+    "strided": matrix[::2, 1::3],
+    "expanded": torch.rand(3, 1).expand(3, 4),
+    "0-d": torch.tensor(3.5),
+    "0-d int": torch.tensor(7),
+    "bool": torch.rand(3, 5) > 0.5,
+    "float16": torch.rand(9).half(),
+    "empty": torch.empty(0, 4),
+    "quantized": torch.quantize_per_tensor(torch.rand(4), 0.1, 0, torch.qint8),
+}
+
+
+def make_result():
+    items = [
+        TraceItem(symbol="forward",
+                  inputs=[t, (t, [t]), 3],
+                  output={"out": t, "scale": 0.5})
+        for t in TENSORS.values()
+    ]
+    return TestResult(unique_name="SharedMemory_basic",
+                      compilation_error=None,
+                      runtime_error=None,
+                      trace=items,
+                      golden_trace=items)
+
+
+def worker(conn):
+    # Send the result and exit right away, before the receiver has taken it.
+    conn.send(_move_result_to_shared_memory(make_result()))
+    conn.close()
+
+
+def same(a, b):
+    if isinstance(a, torch.Tensor):
+        if a.is_quantized:
+            return b.is_quantized and torch.equal(a.dequantize(),
+                                                  b.dequantize())
+        return a.dtype == b.dtype and a.shape == b.shape and torch.equal(a, b)
+    if isinstance(a, (tuple, list)):
+        return type(a) == type(b) and len(a) == len(b) and all(
+            same(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    return a == b
+
+
+# As in `run_tests`, the resource tracker is started before forking, so that
+# the worker shares it.
+if os.name == "posix":
+    resource_tracker.ensure_running()
+parent_conn, child_conn = mp.Pipe()
+process = mp.Process(target=worker, args=(child_conn,))
+process.start()
+child_conn.close()
+moved, shm_name = parent_conn.recv()
+process.join()
+
+# The worker has exited, but the segment is still there until it is taken.
+# CHECK: segment exists after worker exit: True
+segment = shared_memory.SharedMemory(name=shm_name)
+segment.close()
+print("segment exists after worker exit:", segment.size > 0)
+
+result = _take_result_from_shared_memory(moved, shm_name)
+expected = make_result()
+# CHECK: contiguous: True
+# CHECK: transposed: True
+# CHECK: strided: True
+# CHECK: expanded: True
+# CHECK: 0-d: True
+# CHECK: 0-d int: True
+# CHECK: bool: True
+# CHECK: float16: True
+# CHECK: empty: True
+# CHECK: quantized: True
+for name, item, expected_item, golden_item in zip(TENSORS, result.trace,
+                                                  expected.trace,
+                                                  result.golden_trace):
+    print(f"{name}:",
+          same(item, expected_item) and same(golden_item, expected_item))
+
+# Taking the result releases the segment.
+# CHECK: segment released: True
+try:
+    shared_memory.SharedMemory(name=shm_name).close()
+    print("segment released:", False)
+except FileNotFoundError:
+    print("segment released:", True)
@@ -0,0 +1,42 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+# RUN: %PYTHON %s | FileCheck %s
+
+import tempfile
+
+import torch
+
+from torch_mlir_e2e_test.trace_io import load_trace, record_trace
+
+
+class MyModule(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+
+    def forward(self, x, n: int):
+        return x * n, [x.to(torch.bfloat16), x.new_empty(0, 3)]
+
+
+with tempfile.TemporaryDirectory() as trace_dir:
+    with record_trace(MyModule(), trace_dir) as traced:
+        traced.forward(torch.arange(6, dtype=torch.float32).reshape(2, 3), 2)
+        traced.forward(torch.ones(1, 3), 3)
+
+    trace = load_trace(trace_dir)
+    for item in trace:
+        x, n = item.inputs
+        product, (bf16, empty) = item.output
+        print(item.symbol, x.tolist(), n)
+        print(product.tolist(), bf16.dtype, list(empty.shape))
+
+# CHECK: forward [
+# CHECK-SAME: [0.0, 1.0, 2.0], [3.0, 4.0, 5.0]] 2
+# CHECK-NEXT: [
+# CHECK-SAME: [0.0, 2.0, 4.0], [6.0, 8.0, 10.0]] torch.bfloat16 [0, 3]
+# CHECK-NEXT: forward [
+# CHECK-SAME: [1.0, 1.0, 1.0]] 3
+# CHECK-NEXT: [
+# CHECK-SAME: [3.0, 3.0, 3.0]] torch.bfloat16 [0, 3]
@@ -6,6 +6,9 @@
 from typing import Optional, Sequence, Union, List, Dict, Tuple, Callable, Iterable
 from enum import Enum
 
+import concurrent.futures
+import io
+import multiprocessing
 import sys
 from io import StringIO
 import tempfile
@@ -16,7 +19,11 @@ import torch.fx
 from torch_mlir.dynamo import _get_decomposition_table
 from torch.fx.experimental.proxy_tensor import make_fx
 
-from .compiler_utils import run_pipeline_with_repro_report
+from .compiler_utils import record_phase, run_pipeline_with_repro_report
+from .compile_cache import CompilationCache, compute_cache_key
+from .compile_profiler import profile_compile
+from .weight_archive import DEFAULT_MIN_WEIGHT_ELEMENTS, externalize_weights
+from torch_mlir.ir import Module, StringAttr
 from torch_mlir.jit_ir_importer import ClassAnnotator, ImportOptions, ModuleBuilder
 from torch_mlir.jit_ir_importer.build_tools.library_generator import generate_library
 
@@ -311,6 +318,89 @@ def _lower_mlir_module(verbose, output_type, module):
     raise Exception(f"Unknown OutputType: {output_type}")
 
 
+def _get_public_func_names(module) -> List[str]:
+    names = []
+    for op in module.body.operations:
+        op = op.operation
+        if op.name != "func.func" or "sym_visibility" in op.attributes:
+            continue
+        names.append(StringAttr(op.attributes["sym_name"]).value)
+    return names
+
+
+def _module_to_bytecode(module) -> bytes:
+    f = io.BytesIO()
+    module.operation.write_bytecode(f)
+    return f.getvalue()
+
+
+def _lower_method_in_new_context(module_bytecode: bytes, func_name: str,
+                                 verbose: bool, output_type: "OutputType",
+                                 enable_multithreading: Optional[bool]) -> bytes:
+    """Lowers the public function `func_name` of a Torch Backend IR module.
+
+    The module is parsed into a fresh context, so this can run concurrently
+    with the lowering of other functions, in this or in another process. All
+    other public functions are removed before lowering; private functions
+    they call are left for the lowering pipeline to clean up.
+    """
+    context = ModuleBuilder().context
+    if enable_multithreading is not None:
+        context.enable_multithreading(enable_multithreading)
+    module = Module.parse(module_bytecode, context=context)
+    for op in list(module.body.operations):
+        op = op.operation
+        if op.name == "func.func" and \
+                "sym_visibility" not in op.attributes and \
+                StringAttr(op.attributes["sym_name"]).value != func_name:
+            op.erase()
+    module = _lower_mlir_module(verbose, output_type, module)
+    return _module_to_bytecode(module)
+
+
+def _lower_mlir_module_per_method(verbose, output_type, module,
+                                  max_workers: int, use_processes: bool,
+                                  enable_multithreading: Optional[bool]):
+    """Like `_lower_mlir_module`, but lowers each public function of `module`
+    independently and merges the results back into `module`.
+
+    Symbols that end up in more than one of the lowered modules (e.g. shared
+    private helpers or globals) are assumed to be identical and are kept once.
+    """
+    func_names = _get_public_func_names(module)
+    module_bytecode = _module_to_bytecode(module)
+    if use_processes:
+        # Forking a process that has live MLIR contexts (and their thread
+        # pools) is not safe, so start the workers from scratch.
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"))
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers)
+    with executor:
+        lowered = list(executor.map(
+            _lower_method_in_new_context,
+            [module_bytecode] * len(func_names), func_names,
+            [verbose] * len(func_names), [output_type] * len(func_names),
+            [enable_multithreading] * len(func_names)))
+
+    for op in list(module.body.operations):
+        op.operation.erase()
+    seen_symbols = set()
+    for lowered_bytecode in lowered:
+        lowered_module = Module.parse(lowered_bytecode,
+                                      context=module.context)
+        for op in list(lowered_module.body.operations):
+            if "sym_name" in op.operation.attributes:
+                sym_name = StringAttr(op.operation.attributes["sym_name"]).value
+                if sym_name in seen_symbols:
+                    continue
+                seen_symbols.add(sym_name)
+            module.body.append(op.operation)
+    return module
+
+
 def compile(model: torch.nn.Module,
             example_args: _example_args,
             output_type: Union[str, "OutputType"] = OutputType.TORCH,
@@ -319,7 +409,14 @@ def compile(model: torch.nn.Module,
             backend_legal_ops: Optional[Sequence[str]] = None,
             extra_library: Iterable[Callable] = [],
             verbose: bool = False,
-            use_make_fx: bool = False):
+            use_make_fx: bool = False,
+            cache: Optional[CompilationCache] = None,
+            lowering_workers: int = 1,
+            lowering_use_processes: bool = True,
+            enable_multithreading: Optional[bool] = None,
+            import_tensors_as_dense_resources: bool = False,
+            weight_archive_path: Optional[str] = None,
+            weight_archive_min_elements: int = DEFAULT_MIN_WEIGHT_ELEMENTS):
     """Convert a PyTorch model to MLIR.
 
     Args:
@@ -349,6 +446,39 @@ def compile(model: torch.nn.Module,
             `docs/adding_abstract_interpretation_functions.md` for more info
             on the format the functions should have.
         verbose: If true, print extra information about the conversion.
+        cache: A `CompilationCache` to look up the result in before importing
+            the model, and to store the result in after a successful
+            compilation. On a hit, the module is parsed from the cache and no
+            lowering passes are run. The cache is not used with
+            `import_tensors_as_dense_resources`, since a module parsed from
+            the cache holds its own copy of the tensors.
+        lowering_workers: The number of public functions (i.e. exported
+            methods) to lower to the backend concurrently. If greater than 1
+            and the module has more than one public function, each function
+            is lowered in its own MLIR context and the results are merged.
+            The TorchScript IR -> Torch Backend IR lowering always runs on
+            the whole module.
+        lowering_use_processes: If True, the per-method lowering runs in
+            worker processes, otherwise in threads of the current process.
+            Only used when `lowering_workers` is greater than 1.
+        enable_multithreading: If not None, enables or disables the
+            multithreading of the MLIR pass manager for all contexts used by
+            the compilation. If None, the MLIR default (enabled) is used.
+        import_tensors_as_dense_resources: If True, the parameters and other
+            tensors of the model are imported as `dense_resource` attributes
+            that reference the storage of the tensors, rather than being
+            copied into the MLIR context. This reduces the peak memory use of
+            compiling large models. The tensors must not be modified in place
+            while the returned module is in use.
+        weight_archive_path: If not None, the floating-point tensor
+            constants (i.e. the weights) of the public functions of the
+            returned module are lifted into trailing function arguments, and
+            their data is written to a weight archive in this directory. Load
+            it with `torch_mlir.weight_archive.WeightArchive` to get the
+            arguments. See `torch_mlir.weight_archive` for details.
+        weight_archive_min_elements: The minimum number of elements of a
+            constant for it to be lifted into the weight archive. Smaller
+            constants stay in the module.
 
     Returns:
         An MLIR module that contains the converted model in the specified
@@ -359,6 +489,9 @@ def compile(model: torch.nn.Module,
     example_args = ExampleArgs.get(example_args)
     if ignore_traced_shapes and not use_tracing:
         raise Exception("`ignore_traced_shapes` requires `use_tracing`")
+    if weight_archive_path is not None and output_type == OutputType.RAW:
+        raise Exception("`weight_archive_path` is not supported with the "
+                        "`raw` output type")
 
     # We only allow `backend_legal_ops` to be specified for the `"torch"`
     # output type because the other output types actually invoke their
@@ -375,9 +508,10 @@ def compile(model: torch.nn.Module,
 
     if use_make_fx:
         args = example_args._get_for_tracing(use_tracing=True, ignore_traced_shapes=True)["forward"]
-        model = make_fx(
-           model,
-           decomposition_table=_get_decomposition_table())(*args)
+        with record_phase("make_fx"):
+            model = make_fx(
+               model,
+               decomposition_table=_get_decomposition_table())(*args)
 
 
     # For FX-based models, automatically strip overloads.
@@ -404,35 +538,65 @@ def compile(model: torch.nn.Module,
                     f"`@torch.jit.export` to the method definition.")
         scripted = model
     elif use_tracing:
-        scripted = torch.jit.trace_module(
-            model,
-            example_args._get_for_tracing(use_tracing, ignore_traced_shapes)
-        )
+        with record_phase("trace"):
+            scripted = torch.jit.trace_module(
+                model,
+                example_args._get_for_tracing(use_tracing, ignore_traced_shapes)
+            )
     else:
         # Make sure that all the methods that the user requested get scripted.
         # By default, PyTorch only scripts the `forward` method and transitive
         # callees.
         for method_name in example_args._get_methods():
             torch.jit.export(getattr(model, method_name).__func__)
-        scripted = torch.jit.script(model)
-    class_annotator = ClassAnnotator()
-    class_annotator.exportNone(scripted._c._type())
-    for method_name, example_args in example_args._get_for_annotation().items():
-        class_annotator.exportPath(scripted._c._type(), [method_name])
-        annotation = [None]  # `None` is always the annotation for "self".
-        for arg in example_args:
-            annotation.append((arg.shape, arg.dtype, True))
-        class_annotator.annotateArgs(
-            scripted._c._type(), [method_name], annotation)
+        with record_phase("script"):
+            scripted = torch.jit.script(model)
+    placeholders = example_args._get_for_annotation()
+    with record_phase("annotate"):
+        class_annotator = ClassAnnotator()
+        class_annotator.exportNone(scripted._c._type())
+        for method_name, example_args in placeholders.items():
+            class_annotator.exportPath(scripted._c._type(), [method_name])
+            annotation = [None]  # `None` is always the annotation for "self".
+            for arg in example_args:
+                annotation.append((arg.shape, arg.dtype, True))
+            class_annotator.annotateArgs(
+                scripted._c._type(), [method_name], annotation)
+
+    # A module parsed from the cache holds a copy of the tensor data, which
+    # would defeat the purpose of referencing the storage of the tensors.
+    if import_tensors_as_dense_resources:
+        cache = None
+    cache_key = None
+    if cache is not None:
+        # `weight_archive_path` is not part of the key: the cache holds the
+        # module before the weights are externalized, and they are
+        # externalized on hits and misses alike.
+        cache_key = compute_cache_key(scripted, placeholders,
+                                      output_type.value, backend_legal_ops,
+                                      extra_library_file_name,
+                                      ignore_traced_shapes)
+        cached_module = cache.lookup(cache_key)
+        if cached_module is not None:
+            if weight_archive_path is not None:
+                with record_phase("externalize_weights", cached_module):
+                    externalize_weights(cached_module, weight_archive_path,
+                                        weight_archive_min_elements)
+            return cached_module
 
     mb = ModuleBuilder()
+    if enable_multithreading is not None:
+        mb.module.context.enable_multithreading(enable_multithreading)
     import_options = ImportOptions()
     import_options.ignoreExistingTensorShapesAndDtypes = ignore_traced_shapes
+    import_options.importTensorsAsDenseResources = \
+        import_tensors_as_dense_resources
     try:
         original_stderr = sys.stderr
         sys.stderr = StringIO()
         # Import the TorchScript module to MLIR
-        mb.import_module(scripted._c, class_annotator, import_options)
+        with record_phase("import", mb.module):
+            mb.import_module(scripted._c, class_annotator, import_options)
     except Exception as e:
         raise Exception(f"""
 PyTorch TorchScript module -> torch-mlir Object Graph IR import failed with:
@@ -444,14 +608,40 @@ PyTorch TorchScript module -> torch-mlir Object Graph IR import failed with:
     finally:
         sys.stderr = original_stderr
     if output_type == OutputType.RAW:
+        if cache is not None:
+            cache.store(cache_key, mb.module)
         return mb.module
 
     option_string = "{backend-legal-ops=" + ",".join(backend_legal_ops) + \
         " extra-library=" + extra_library_file_name + "}"
-    run_pipeline_with_repro_report(
-        mb.module,
-        f"builtin.module(torchscript-module-to-torch-backend-pipeline{option_string})",
-        "Lowering TorchScript IR -> Torch Backend IR",
-    )
+    with record_phase("torch_backend_pipeline", mb.module):
+        run_pipeline_with_repro_report(
+            mb.module,
+            f"builtin.module(torchscript-module-to-torch-backend-pipeline{option_string})",
+            "Lowering TorchScript IR -> Torch Backend IR",
+        )
+
+    with record_phase("backend_lowering", mb.module):
+        if lowering_workers > 1 and output_type != OutputType.TORCH and \
+                len(_get_public_func_names(mb.module)) > 1:
+            if verbose:
+                print("\n====================")
+                print("Torch Backend IR")
+                print(mb.module)
+            module = _lower_mlir_module_per_method(
+                False, output_type, mb.module, lowering_workers,
+                lowering_use_processes, enable_multithreading)
+            if verbose:
+                print("\n====================")
+                print(f"{output_type.name} Backend IR")
+                print(module)
+        else:
+            module = _lower_mlir_module(verbose, output_type, mb.module)
+    if cache is not None:
+        cache.store(cache_key, module)
+    if weight_archive_path is not None:
+        with record_phase("externalize_weights", module):
+            externalize_weights(module, weight_archive_path,
+                                weight_archive_min_elements)
+    return module
 
-    return _lower_mlir_module(verbose, output_type, mb.module)
@@ -21,30 +21,51 @@ import pdb
 # FX -> MLIR use cases should be done carefully, and likely will involve
 # introducing new concepts or abstractions into the import process.
 
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import operator
 import re
 
 import torch
+from torch.fx.experimental.symbolic_shapes import is_concrete_int
 
 import torch_mlir.ir as ir
 import torch_mlir.dialects.func as func_dialect
 import torch_mlir.dialects.torch as torch_dialect
 
 
+# The Python operators on SymInt's that appear in graphs traced with dynamic
+# shapes (e.g. to compute the size of a `view`), and the `torch` dialect ops
+# they are imported as.
+_SYM_INT_OPERATORS = {
+    operator.add: "torch.aten.add.int",
+    operator.sub: "torch.aten.sub.int",
+    operator.mul: "torch.aten.mul.int",
+    operator.floordiv: "torch.aten.floordiv.int",
+}
+
+
 def _is_valid_meta_val(val):
-    # We currently allow only FakeTensor's or lists of FakeTensor's
-    # as meta['val']. However, this can potentially change also hold a SymInt
-    # in the future. See:
+    # We currently allow only FakeTensor's, lists of FakeTensor's and SymInt's
+    # as meta['val']. See:
     # https://github.com/pytorch/pytorch/issues/90839#issuecomment-1352856661
-    if isinstance(val, torch._subclasses.FakeTensor):
+    if isinstance(val, (torch._subclasses.FakeTensor, torch.SymInt)):
         return True
     if isinstance(val, (tuple, list)):
         return all(isinstance(x, torch._subclasses.FakeTensor) for x in val)
     return False
 
 
+def _fetch_attr(module: torch.nn.Module, target: str):
+    """Returns the (possibly nested) attribute `target` of `module`."""
+    attr = module
+    for atom in target.split("."):
+        if not hasattr(attr, atom):
+            raise Exception(f"Unsupported: get_attr of nonexistent attribute: {target}")
+        attr = getattr(attr, atom)
+    return attr
+
+
 def _verify_fx_graph_conforms_to_subset(g: torch.fx.Graph):
     # TODO: Report errors with source locations if possible.
     def _check_meta_val(node):
@@ -52,23 +73,36 @@ def _verify_fx_graph_conforms_to_subset(g: torch.fx.Graph):
             raise Exception(f"Unsupported: missing node.meta['val']: {node}")
         if not _is_valid_meta_val(node.meta["val"]):
             raise Exception(
-                f"Unsupported: node.meta['val'] is not a FakeTensor or list of FakeTensor's: {node}; {node.meta['val']}"
+                f"Unsupported: node.meta['val'] is not a FakeTensor, list of FakeTensor's or SymInt: {node}; {node.meta['val']}"
             )
 
     for node in g.nodes:
-        if node.op not in ("placeholder", "call_function", "output"):
+        if node.op not in ("placeholder", "get_attr", "call_function",
+                           "output"):
             raise Exception(f"Unsupported op: {node.op}")
         if node.op == "placeholder":
             _check_meta_val(node)
+        if node.op == "get_attr":
+            if g.owning_module is None:
+                raise Exception(
+                    f"Unsupported: get_attr in a graph without an owning module: {node}"
+                )
+            if not isinstance(_fetch_attr(g.owning_module, node.target),
+                              torch.Tensor):
+                raise Exception(
+                    f"Unsupported: get_attr of a non-tensor attribute: {node}")
         if node.op == "call_function":
             _check_meta_val(node)
             # We only support OpOverload for computations because the `torch`
             # dialect ops model the full qualified op name, including overload.
             # We also support operator.getitem because that is how multiple
-            # results are modeled.
+            # results are modeled, and the arithmetic operators on SymInt's.
             if isinstance(node.target, torch._ops.OpOverload):
                 for type_ in (r.type for r in node.target._schema.returns):
-                    if isinstance(type_, torch.TensorType):
+                    # Ops returning ints (such as `aten.sym_size`) compute the
+                    # symbolic sizes of tensors.
+                    if isinstance(type_, (torch.TensorType, torch.IntType,
+                                          torch.SymIntType)):
                         continue
                     raise Exception(
                         f"Unsupported: return type {type_} in schema for {node.target}"
@@ -84,6 +118,9 @@ def _verify_fx_graph_conforms_to_subset(g: torch.fx.Graph):
                 continue
             if node.target is operator.getitem:
                 continue
+            if node.target in _SYM_INT_OPERATORS and isinstance(
+                    node.meta["val"], torch.SymInt):
+                continue
             raise Exception(f"Unsupported call_function target: {node.target}")
 
 
@@ -155,29 +192,86 @@ def _convert_dtype_to_mlir_type(dtype: torch.dtype) -> str:
     raise Exception(f"Unsupported dtype: {dtype}")
 
 
+def _get_static_shape(tensor: torch.Tensor) -> Tuple[int, ...]:
+    """Returns the shape of `tensor`, with -1 for the dimensions that are
+    symbolic (with TorchDynamo's dynamic shapes)."""
+    return tuple(
+        int(d) if is_concrete_int(d) else -1 for d in tensor.shape)
+
+
 def _import_fake_tensor_as_mlir_type(
         fake_tensor: torch._subclasses.FakeTensor) -> ir.Type:
-    # TODO: Find story for how to get dynamically shaped tensors here.
-    shape = ",".join(str(d) for d in fake_tensor.shape)
+    shape = ",".join("?" if d == -1 else str(d)
+                     for d in _get_static_shape(fake_tensor))
     dtype = _convert_dtype_to_mlir_type(fake_tensor.dtype)
     return ir.Type.parse(f"!torch.vtensor<[{shape}],{dtype}>")
 
 
-def _mlir_types_for_node(node: torch.fx.Node) -> ir.Type:
-    if isinstance(node.meta["val"], (tuple, list)):
-        return [_import_fake_tensor_as_mlir_type(v) for v in node.meta["val"]]
-    return [_import_fake_tensor_as_mlir_type(node.meta["val"])]
-
+def _import_tensor_as_elements_attr(tensor: torch.Tensor) -> ir.Attribute:
+    tensor = tensor.detach().cpu().contiguous()
+    if tensor.dtype == torch.bool:
+        # Booleans are bit-packed in the attribute, which is only done when
+        # the element type is inferred.
+        return ir.DenseElementsAttr.get(tensor.numpy())
+    if tensor.dtype in (torch.qint8, torch.quint8):
+        raise Exception(f"Unsupported: tensor constant of dtype {tensor.dtype}")
+    element_type = ir.Type.parse(_convert_dtype_to_mlir_type(tensor.dtype))
+    if tensor.dtype == torch.bfloat16:
+        # numpy has no bfloat16, so pass the raw bits.
+        array = tensor.view(torch.int16).numpy()
+    else:
+        array = tensor.numpy()
+    return ir.DenseElementsAttr.get(array,
+                                    type=element_type,
+                                    shape=list(tensor.shape))
+
+
+class _TypeCache:
+    """Interns the MLIR types of an import.
+
+    Large graphs use few distinct types, so parsing each type once instead of
+    once per node saves most of the time spent on types.
+    """
 
-def _extract_function_type_from_graph(g: torch.fx.Graph) -> ir.FunctionType:
+    def __init__(self):
+        self._tensor_types: Dict[Tuple[Tuple[int, ...], torch.dtype],
+                                 ir.Type] = {}
+        self._torch_types: Dict[str, ir.Type] = {}
+
+    def get_tensor_type(self, fake_tensor: torch.Tensor) -> ir.Type:
+        key = (_get_static_shape(fake_tensor), fake_tensor.dtype)
+        mlir_type = self._tensor_types.get(key)
+        if mlir_type is None:
+            mlir_type = _import_fake_tensor_as_mlir_type(fake_tensor)
+            self._tensor_types[key] = mlir_type
+        return mlir_type
+
+    def get_torch_type(self, t: torch.Type) -> ir.Type:
+        key = str(t)
+        mlir_type = self._torch_types.get(key)
+        if mlir_type is None:
+            mlir_type = _torch_type_to_mlir_type(t)
+            self._torch_types[key] = mlir_type
+        return mlir_type
+
+    def get_types_for_node(self, node: torch.fx.Node) -> List[ir.Type]:
+        if isinstance(node.meta["val"], (tuple, list)):
+            return [self.get_tensor_type(v) for v in node.meta["val"]]
+        if isinstance(node.meta["val"], torch.SymInt):
+            return [self.get_torch_type(torch.IntType.get())]
+        return [self.get_tensor_type(node.meta["val"])]
+
+
+def _extract_function_type_from_graph(
+        g: torch.fx.Graph, type_cache: _TypeCache) -> ir.FunctionType:
     input_types = []
     for node in g.nodes:
         if node.op == "placeholder":
-            input_types.append(_mlir_types_for_node(node)[0])
+            input_types.append(type_cache.get_types_for_node(node)[0])
         if node.op == "output":
             # TODO(DNS): Test this or add verifier that it can't happen.
             result_types = torch.fx.map_arg(
-                node.args[0], lambda n: _mlir_types_for_node(n)[0])
+                node.args[0], lambda n: type_cache.get_types_for_node(n)[0])
     # Note: We import directly to the backend contract -- multiple results
     # are modeled with func.func native multiple results rather than as a
     # singleton value / tuple.
@@ -251,15 +345,37 @@ LAYOUT_TO_INT = {
 }
 
 
-def _mlir_location_for_node(node: torch.fx.Node) -> ir.Location:
-    stack_trace = node.stack_trace
-    if stack_trace is None:
-        return ir.Location.unknown()
-    # TODO: Avoid needing to regex match this.
-    # https://github.com/pytorch/pytorch/issues/91000
-    m = re.search(r"""File "([^"]+)", line ([0-9]+),""", node.stack_trace)
-    filename, line = m.group(1), int(m.group(2))
-    return ir.Location.file(filename, line, col=0)
+_STACK_TRACE_LOCATION_RE = re.compile(r"""File "([^"]+)", line ([0-9]+),""")
+
+
+class _LocationCache:
+    """Memoizes the MLIR locations of nodes.
+
+    Nodes created from the same source line share their stack trace, so the
+    stack trace is only parsed once per distinct trace, and the location is
+    only created once per distinct file and line.
+    """
+
+    def __init__(self):
+        self._file_lines: Dict[str, Tuple[str, int]] = {}
+        self._locations: Dict[Tuple[str, int], ir.Location] = {}
+
+    def get_location(self, node: torch.fx.Node) -> ir.Location:
+        stack_trace = node.stack_trace
+        if stack_trace is None:
+            return ir.Location.unknown()
+        file_line = self._file_lines.get(stack_trace)
+        if file_line is None:
+            # TODO: Avoid needing to regex match this.
+            # https://github.com/pytorch/pytorch/issues/91000
+            m = _STACK_TRACE_LOCATION_RE.search(stack_trace)
+            file_line = (m.group(1), int(m.group(2)))
+            self._file_lines[stack_trace] = file_line
+        location = self._locations.get(file_line)
+        if location is None:
+            location = ir.Location.file(file_line[0], file_line[1], col=0)
+            self._locations[file_line] = location
+        return location
 
 
 class _FXGraphImporter:
@@ -274,10 +390,18 @@ class _FXGraphImporter:
         # node.meta['val'] is set up, since it contains a list with multiple
         # FakeTensor's in case of a tuple return with multiple elements.
         self._env: Dict[Tuple[torch.fx.Node, int], ir.Value] = {}
+        self._types = _TypeCache()
+        self._locations = _LocationCache()
+        # The `torch` dialect op name for each op overload.
+        self._mlir_op_names: Dict[torch._ops.OpOverload, str] = {}
+        # The constant ops for literals, by literal. The function body is a
+        # single block and the constants are created at their first use, so
+        # they dominate all later uses.
+        self._literals: Dict[Tuple[type, str], ir.Value] = {}
         self._module = ir.Module.create(ir.Location.unknown())
         self._module.operation.attributes[
             "torch.debug_module_name"] = ir.StringAttr.get(func_name)
-        function_type = _extract_function_type_from_graph(g)
+        function_type = _extract_function_type_from_graph(g, self._types)
         func = func_dialect.FuncOp(
             func_name,
             function_type,
@@ -286,21 +410,78 @@ class _FXGraphImporter:
         )
         self._body_block = ir.Block.create_at_start(func.body,
                                                     function_type.inputs)
+        self._import_symbolic_shapes(func)
+
+    def _import_symbolic_shapes(self, func: func_dialect.FuncOp):
+        """Annotates the arguments of `func` with the symbolic shapes (or
+        values) of the corresponding placeholders, and `func` with the value
+        ranges of the symbols, if the graph was traced with dynamic shapes.
+
+        The symbolic dimensions themselves are imported as `?` in the
+        argument types, so that the function can be called with any sizes in
+        the ranges.
+        """
+        arg_attrs = []
+        # The shape env and sympy symbol of each symbol, by name.
+        symbols = {}
+
+        def add_symbols(sym_int: torch.SymInt):
+            for symbol in sym_int.node.expr.free_symbols:
+                symbols[str(symbol)] = (sym_int.node.shape_env, symbol)
+
+        for node in self._g.nodes:
+            if node.op != "placeholder":
+                continue
+            val = node.meta["val"]
+            attrs = {}
+            if isinstance(val, torch.SymInt):
+                attrs["torch.symbolic_value"] = ir.StringAttr.get(str(val))
+                add_symbols(val)
+            elif not all(is_concrete_int(d) for d in val.shape):
+                attrs["torch.symbolic_shape"] = ir.ArrayAttr.get(
+                    [ir.StringAttr.get(str(d)) for d in val.shape])
+                for d in val.shape:
+                    if not is_concrete_int(d):
+                        add_symbols(d)
+            arg_attrs.append(ir.DictAttr.get(attrs))
+        if not symbols:
+            return
+        func.attributes["arg_attrs"] = ir.ArrayAttr.get(arg_attrs)
+
+        i64 = ir.IntegerType.get_signless(64)
+        ranges = {}
+        for name, (shape_env, symbol) in sorted(symbols.items()):
+            value_range = shape_env.var_to_range.get(symbol)
+            if value_range is None:
+                continue
+            bounds = {}
+            # Unbounded ends of the range (e.g. the maximum size of a
+            # dimension) are omitted.
+            for bound_name, bound in (("min", value_range.lower),
+                                      ("max", value_range.upper)):
+                if bound.is_finite:
+                    bounds[bound_name] = ir.IntegerAttr.get(i64, int(bound))
+            ranges[name] = ir.DictAttr.get(bounds)
+        func.attributes["torch.symbol_ranges"] = ir.DictAttr.get(ranges)
 
     def import_graph(self) -> ir.Module:
         with ir.InsertionPoint(self._body_block):
             num_placeholders_seen = 0
             for node in self._g.nodes:
-                with _mlir_location_for_node(node):
+                with self._locations.get_location(node):
                     if node.op == "placeholder":
                         self._env[(
                             node, 0
                         )] = self._body_block.arguments[num_placeholders_seen]
                         num_placeholders_seen += 1
+                    if node.op == "get_attr":
+                        self._import_get_attr(node)
                     if node.op == "call_function":
                         if node.target is operator.getitem:
                             self._env[(node, 0)] = self._env[(node.args[0],
                                                               node.args[1])]
+                        elif node.target in _SYM_INT_OPERATORS:
+                            self._import_sym_int_operator(node)
                         else:
                             self._import_op_overload_call(node)
                     if node.op == "output":
@@ -314,10 +495,33 @@ class _FXGraphImporter:
                         func_dialect.ReturnOp(operands)
         return self._module
 
-    def _import_op_overload_call(self, node: torch.fx.Node):
+    def _import_get_attr(self, node: torch.fx.Node):
+        assert node.op == "get_attr"
+        # The attributes are imported as literals, so that they are constants
+        # of the function rather than arguments.
+        tensor = _fetch_attr(self._g.owning_module, node.target)
+        operation = ir.Operation.create(
+            "torch.vtensor.literal",
+            results=[self._types.get_tensor_type(tensor)],
+            attributes={"value": _import_tensor_as_elements_attr(tensor)},
+        )
+        self._env[(node, 0)] = operation.result
+
+    def _import_sym_int_operator(self, node: torch.fx.Node):
         assert node.op == "call_function"
-        assert isinstance(node.target, torch._ops.OpOverload)
-        schema = node.target._schema
+        int_type = torch.IntType.get()
+        operation = ir.Operation.create(
+            _SYM_INT_OPERATORS[node.target],
+            results=[self._types.get_torch_type(int_type)],
+            operands=[self._import_argument(a, int_type) for a in node.args],
+        )
+        self._env[(node, 0)] = operation.result
+
+    def _get_mlir_op_name(self, target: torch._ops.OpOverload) -> str:
+        mlir_op_name = self._mlir_op_names.get(target)
+        if mlir_op_name is not None:
+            return mlir_op_name
+        schema = target._schema
 
         # Extract the `torch` dialect op name.
         namespace, _, unqualified_name = schema.name.partition("::")
@@ -328,9 +532,16 @@ class _FXGraphImporter:
         # DNS: Unregistered ops
         assert ir.Context.current.is_registered_operation(
             mlir_op_name), f"Unregistered operation: {mlir_op_name}"
+        self._mlir_op_names[target] = mlir_op_name
+        return mlir_op_name
+
+    def _import_op_overload_call(self, node: torch.fx.Node):
+        assert node.op == "call_function"
+        assert isinstance(node.target, torch._ops.OpOverload)
+        mlir_op_name = self._get_mlir_op_name(node.target)
 
         # Construct the Operation.
-        result_types = _mlir_types_for_node(node)
+        result_types = self._types.get_types_for_node(node)
         operands = []
         # `schema.arguments` is a bit confusing in this context, since
         # `Argument` is the term that FX uses analogous to mlir "Value". It is
@@ -372,10 +583,24 @@ class _FXGraphImporter:
 
     def _import_literal(self, arg: torch.fx.node.Argument,
                         expected_type) -> ir.Value:
+        if isinstance(expected_type, torch.OptionalType) and arg is not None:
+            return self._import_argument(arg, expected_type.getElementType())
+        if arg is None or isinstance(
+                arg, (bool, int, float, str, torch.device)):
+            # Scalar literals are imported once per distinct value. The key
+            # includes the type since e.g. `True == 1`, and uses `repr` so that
+            # e.g. `0.0` and `-0.0` are distinct.
+            key = (type(arg), repr(arg))
+            value = self._literals.get(key)
+            if value is None:
+                value = self._import_scalar_literal(arg)
+                self._literals[key] = value
+            return value
+        return self._import_non_scalar_literal(arg, expected_type)
+
+    def _import_scalar_literal(self, arg) -> ir.Value:
         if arg is None:
             return torch_dialect.ConstantNoneOp().result
-        if isinstance(expected_type, torch.OptionalType):
-            return self._import_argument(arg, expected_type.getElementType())
         if isinstance(arg, bool):
             return torch_dialect.ConstantBoolOp(
                 ir.IntegerAttr.get(ir.IntegerType.get_signless(1), arg)).result
@@ -388,13 +613,17 @@ class _FXGraphImporter:
                 ir.FloatAttr.get_f64(arg)).result
         if isinstance(arg, str):
             return torch_dialect.ConstantStrOp(ir.StringAttr.get(arg)).result
-        if isinstance(arg, torch.dtype):
-            assert isinstance(expected_type, torch.IntType)
-            return self._import_argument(DTYPE_TO_INT[arg], expected_type)
         if isinstance(arg, torch.device):
             # TODO(DNS): Device index? arg.index
             return torch_dialect.ConstantDeviceOp(ir.StringAttr.get(
                 arg.type)).result
+        raise Exception(f"Unsupported literal: {arg}")
+
+    def _import_non_scalar_literal(self, arg: torch.fx.node.Argument,
+                                   expected_type) -> ir.Value:
+        if isinstance(arg, torch.dtype):
+            assert isinstance(expected_type, torch.IntType)
+            return self._import_argument(DTYPE_TO_INT[arg], expected_type)
         if isinstance(arg, torch.memory_format):
             assert isinstance(expected_type, torch.IntType)
             return self._import_argument(MEMORY_FORMAT_TO_INT[arg],
@@ -412,7 +641,7 @@ class _FXGraphImporter:
                 els = [self._env[e, 0] for e in arg]
 
             else:
-                element_type = _torch_type_to_mlir_type(element_type)
+                element_type = self._types.get_torch_type(element_type)
                 els = [
                     self._import_argument(e, element_type) for e in arg
                 ]
@@ -420,7 +649,7 @@ class _FXGraphImporter:
             # import pydevd_pycharm
             # pydevd_pycharm.settrace('localhost', port=8888, stdoutToServer=True, stderrToServer=True)
             return torch_dialect.PrimListConstructOp(
-                _torch_type_to_mlir_type(expected_type),
+                self._types.get_torch_type(expected_type),
                 els,
             ).result
         raise Exception(f"Unsupported literal: {arg}")
@@ -429,6 +658,11 @@ class _FXGraphImporter:
 def import_fx_graph_as_func(g: torch.fx.Graph, func_name: str) -> ir.Module:
     """Imports the given FX graph as a function in a new MLIR module.
 
+    `get_attr` nodes are imported as `torch.vtensor.literal`s holding the
+    value of the attribute on `g.owning_module` at the time of import, so
+    that e.g. the parameters of a model can be baked into the function
+    instead of being passed as arguments on every call.
+
     Args:
         g: The FX graph to import.
         func_name: The sym_name of the `func.func` to import the graph into.
@@ -437,7 +671,8 @@ def import_fx_graph_as_func(g: torch.fx.Graph, func_name: str) -> ir.Module:
     """
     # Note that this function imports a fx.Graph instead of an fx.GraphModule.
     # The reason is that the supported subset only involves stateless
-    # fx.Graph's, so the state held on the fx.GraphModule is not necessary.
+    # fx.Graph's, so apart from the tensors referenced by `get_attr` nodes,
+    # the state held on the fx.GraphModule is not necessary.
     _verify_fx_graph_conforms_to_subset(g)
     with ir.Context() as context, ir.Location.unknown(context=context):
         torch_dialect.register_dialect(context)
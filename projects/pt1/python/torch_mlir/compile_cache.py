@@ -0,0 +1,223 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+"""A persistent, content-addressed cache for `torch_mlir.compile` results.
+
+Every call to `torch_mlir.compile` imports the model into MLIR and runs the
+full lowering pipeline, which can take tens of seconds for large models. When
+the model, the example argument shapes and the compilation options are
+unchanged, the result is the same, so we store the lowered module as MLIR
+bytecode on disk and parse it back on subsequent calls.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import functools
+import hashlib
+import os
+import tempfile
+
+import torch
+
+from torch_mlir.ir import Module
+from torch_mlir.jit_ir_importer import ModuleBuilder
+
+# Bump this whenever the layout of the cache key or of the cache entries
+# changes, so that stale entries are never picked up.
+_CACHE_FORMAT_VERSION = "2"
+
+_CACHE_ENTRY_SUFFIX = ".mlirbc"
+
+
+def _update_hash_with_tensor(h, t: torch.Tensor):
+    t = t.detach()
+    h.update(f"{t.dtype}{list(t.shape)}".encode())
+    if t.is_quantized:
+        t = t.int_repr()
+    # Hash the raw bytes of the tensor. Viewing the data as bytes avoids
+    # any dtype-specific conversion (e.g. bfloat16 has no numpy equivalent).
+    h.update(t.cpu().contiguous().reshape(-1).view(torch.uint8).numpy())
+
+
+@functools.lru_cache(maxsize=None)
+def compute_build_fingerprint() -> str:
+    """Computes a fingerprint of the installed torch-mlir build.
+
+    The fingerprint covers the PyTorch version and the name, size and
+    modification time of every file in the `torch_mlir` Python package
+    (including the native libraries), so that rebuilding the compiler
+    invalidates anything derived from the previous build.
+    """
+    h = hashlib.sha256()
+    h.update(torch.__version__.encode())
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for root, dirs, files in os.walk(package_dir):
+        dirs.sort()
+        for file_name in sorted(files):
+            if file_name.endswith(".pyc"):
+                continue
+            path = os.path.join(root, file_name)
+            stat = os.stat(path)
+            h.update(os.path.relpath(path, package_dir).encode())
+            h.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def compute_cache_key(scripted: torch.jit.ScriptModule,
+                      placeholders: Dict[str, List["TensorPlaceholder"]],
+                      output_type: str,
+                      backend_legal_ops: Sequence[str],
+                      extra_library_file_name: str,
+                      ignore_traced_shapes: bool) -> str:
+    """Computes the cache key for a `torch_mlir.compile` invocation.
+
+    Args:
+        scripted: The TorchScript module that is about to be imported.
+        placeholders: The per-method placeholders used to annotate the
+            arguments of the exported methods.
+        output_type: The value of the requested `OutputType`.
+        backend_legal_ops: The ops that are considered legal for the backend.
+        extra_library_file_name: The file holding the extra abstract
+            interpretation library, or the empty string if there is none.
+        ignore_traced_shapes: The `ignore_traced_shapes` compile option.
+    Returns:
+        A hex digest uniquely identifying the compilation result.
+    """
+    h = hashlib.sha256()
+    h.update(_CACHE_FORMAT_VERSION.encode())
+    h.update(compute_build_fingerprint().encode())
+    # The code of all methods of the module and its submodules, which
+    # includes the TorchScript graphs of the exported methods and their
+    # callees, and the values of all attributes. The importer bakes the
+    # attributes (e.g. float or bool flags, lists, and tensors that are not
+    # parameters or buffers) into the imported module, so they must be part
+    # of the key. Parameters are only hashed below, since their printed form
+    # is lossy.
+    h.update(scripted._c.dump_to_str(True, True, False).encode())
+    for name, submodule in scripted.named_modules():
+        h.update(f"{name}:{submodule.training}".encode())
+    for name, tensor in scripted.state_dict(keep_vars=True).items():
+        h.update(name.encode())
+        _update_hash_with_tensor(h, tensor)
+    for method_name in sorted(placeholders.keys()):
+        h.update(method_name.encode())
+        for placeholder in placeholders[method_name]:
+            h.update(f"{list(placeholder.shape)}{placeholder.dtype}".encode())
+    h.update(output_type.encode())
+    h.update(",".join(backend_legal_ops).encode())
+    if extra_library_file_name:
+        with open(extra_library_file_name, "rb") as f:
+            h.update(f.read())
+    h.update(str(ignore_traced_shapes).encode())
+    return h.hexdigest()
+
+
+class CompilationCache:
+    """An on-disk cache of compiled MLIR modules.
+
+    Entries are stored as MLIR bytecode files named after their cache key
+    (see `compute_cache_key`). The least recently used entries are evicted
+    once the total size of the cache exceeds `max_size_bytes`.
+
+    ```python
+    cache = torch_mlir.CompilationCache("/var/cache/torch_mlir")
+    module = torch_mlir.compile(model, example_args,
+                                output_type="linalg-on-tensors",
+                                cache=cache)
+    ```
+    """
+
+    def __init__(self,
+                 cache_dir: Optional[str] = None,
+                 max_size_bytes: int = 4 * 1024**3):
+        """Create a cache rooted at `cache_dir`.
+
+        Args:
+            cache_dir: The directory holding the cache entries. Defaults to
+                `$TORCH_MLIR_COMPILE_CACHE_DIR`, or to
+                `~/.cache/torch_mlir/compile` if that is not set.
+            max_size_bytes: The size budget of the cache. Entries are evicted
+                in least-recently-used order once it is exceeded.
+        """
+        if cache_dir is None:
+            cache_dir = os.environ.get(
+                "TORCH_MLIR_COMPILE_CACHE_DIR",
+                os.path.join(os.path.expanduser("~"), ".cache", "torch_mlir",
+                             "compile"))
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path_for_key(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + _CACHE_ENTRY_SUFFIX)
+
+    def lookup(self, key: str) -> Optional[Module]:
+        """Returns the module stored under `key`, or None on a miss.
+
+        The module is parsed into a fresh context with all of the torch-mlir
+        dialects registered.
+        """
+        path = self._path_for_key(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        # Mark the entry as recently used for the purposes of eviction.
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted concurrently by another process. We already have the
+            # data, so this is harmless.
+            pass
+        self.hits += 1
+        context = ModuleBuilder().context
+        return Module.parse(data, context=context)
+
+    def store(self, key: str, module: Module):
+        """Stores `module` under `key`, evicting old entries if needed."""
+        # Write to a temporary file and atomically move it into place so that
+        # concurrent readers never observe a partially written entry.
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                module.operation.write_bytecode(f)
+            os.replace(tmp_path, self._path_for_key(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._evict()
+
+    def clear(self):
+        """Removes all entries from the cache."""
+        for entry in self._entries():
+            os.unlink(entry.path)
+
+    def _entries(self) -> List[os.DirEntry]:
+        return [
+            entry for entry in os.scandir(self.cache_dir)
+            if entry.name.endswith(_CACHE_ENTRY_SUFFIX)
+        ]
+
+    def _evict(self):
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        # Oldest first.
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
@@ -0,0 +1,264 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+"""
+A profiler for `torch_mlir.compile`.
+
+`profile_compile` compiles a model and reports, for each phase of the
+compilation (scripting or tracing, class annotation, import, the
+TorchScript -> Torch Backend IR pipeline and the backend lowering), the wall
+time, the peak resident memory and the number of ops in the module before
+and after the phase, as well as the slowest individual passes. The profile
+can be written as a Chrome trace (viewable in `chrome://tracing` or
+Perfetto).
+
+It can also be used from the command line:
+```shell
+python -m torch_mlir.compile_profiler --model torchvision.models:resnet18 \\
+    --input_shape 1,3,224,224 --output_type linalg-on-tensors \\
+    --chrome_trace /tmp/resnet18_compile.json
+```
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+import torch
+
+from .compiler_utils import (PassStatistics, PeakMemoryPhaseRecorder,
+                             count_ops)
+
+
+class PhaseProfile(NamedTuple):
+    # The name of the phase, as passed to `compiler_utils.record_phase`.
+    phase: str
+    # The `time.perf_counter()` value at the start of the phase.
+    start: float
+    # The wall time of the phase.
+    seconds: float
+    # The peak resident set size of the process during the phase, in bytes.
+    # Only available on Linux; None elsewhere.
+    peak_rss_bytes: Optional[int]
+    # The number of ops in the module before and after the phase, for phases
+    # operating on an MLIR module.
+    op_count_before: Optional[int]
+    op_count_after: Optional[int]
+
+
+class PassProfile(NamedTuple):
+    # The pass (or nested pipeline) as it appears in the pass pipeline.
+    pass_name: str
+    # The description of the pipeline the pass ran in.
+    pipeline_description: str
+    # The `time.perf_counter()` value at the start of the pass.
+    start: float
+    seconds: float
+    op_count_after: int
+
+
+class _CompileProfileRecorder(PeakMemoryPhaseRecorder):
+    """A `PeakMemoryPhaseRecorder` that also records the start time and the
+    op counts of each occurrence of a phase."""
+
+    def __init__(self):
+        super().__init__()
+        self.profiles: List[PhaseProfile] = []
+        # One (start, op_count_before) entry per currently entered phase.
+        self._starts: List[Tuple[float, Optional[int]]] = []
+
+    def enter_phase(self, phase: str, module):
+        super().enter_phase(phase, module)
+        op_count = None if module is None else count_ops(module.operation)
+        self._starts.append((time.perf_counter(), op_count))
+
+    def exit_phase(self, phase: str, module, seconds: float):
+        peak = super().exit_phase(phase, module, seconds)
+        start, op_count_before = self._starts.pop()
+        op_count_after = None if module is None else count_ops(
+            module.operation)
+        self.profiles.append(
+            PhaseProfile(phase, start, seconds, peak, op_count_before,
+                         op_count_after))
+
+
+class CompileProfile:
+    """The result of `profile_compile`."""
+
+    def __init__(self, module, total_seconds: float,
+                 phases: List[PhaseProfile], passes: List[PassProfile],
+                 start: float):
+        # The compiled module.
+        self.module = module
+        self.total_seconds = total_seconds
+        # The phases in the order they were entered.
+        self.phases = sorted(phases, key=lambda p: p.start)
+        # The passes in the order they ran.
+        self.passes = passes
+        self._start = start
+
+    def top_passes(self, n: int) -> List[PassProfile]:
+        """Returns the `n` slowest passes, slowest first."""
+        return sorted(self.passes, key=lambda p: p.seconds, reverse=True)[:n]
+
+    def report(self, top_n: int = 10) -> str:
+        """Returns a human-readable summary of the profile."""
+        lines = [f"Total: {self.total_seconds:.3f}s", "", "Phases:"]
+        for p in self.phases:
+            line = f"  {p.phase:<24} {p.seconds:9.3f}s"
+            if p.peak_rss_bytes is not None:
+                line += f"  peak {p.peak_rss_bytes / 1024**2:9.1f} MiB"
+            if p.op_count_before is not None:
+                line += f"  ops {p.op_count_before} -> {p.op_count_after}"
+            lines.append(line)
+        lines += ["", f"Top {top_n} passes:"]
+        for p in self.top_passes(top_n):
+            lines.append(f"  {p.seconds:9.3f}s  {p.pass_name}  "
+                         f"(ops after: {p.op_count_after})")
+        return "\n".join(lines)
+
+    def as_chrome_trace(self) -> Dict[str, Any]:
+        """Returns the profile in the Chrome trace event format."""
+
+        def to_us(t):
+            return (t - self._start) * 1e6
+
+        pid = os.getpid()
+        events = []
+        for p in self.phases:
+            args = {}
+            if p.peak_rss_bytes is not None:
+                args["peak_rss_bytes"] = p.peak_rss_bytes
+            if p.op_count_before is not None:
+                args["op_count_before"] = p.op_count_before
+                args["op_count_after"] = p.op_count_after
+            events.append({
+                "name": p.phase,
+                "cat": "phase",
+                "ph": "X",
+                "ts": to_us(p.start),
+                "dur": p.seconds * 1e6,
+                "pid": pid,
+                "tid": 0,
+                "args": args,
+            })
+        for p in self.passes:
+            events.append({
+                "name": p.pass_name,
+                "cat": "pass",
+                "ph": "X",
+                "ts": to_us(p.start),
+                "dur": p.seconds * 1e6,
+                "pid": pid,
+                # Put passes on their own track below the phases.
+                "tid": 1,
+                "args": {
+                    "pipeline": p.pipeline_description,
+                    "op_count_after": p.op_count_after,
+                },
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.as_chrome_trace(), f)
+
+
+def profile_compile(model: torch.nn.Module,
+                    example_args,
+                    output_type: Union[str, "torch_mlir.OutputType"] = "torch",
+                    chrome_trace_path: Optional[str] = None,
+                    **kwargs) -> CompileProfile:
+    """Compiles `model` with `torch_mlir.compile` and profiles the
+    compilation.
+
+    Pass pipelines are run one pass at a time (see
+    `compiler_utils.PassStatistics`), which adds a little overhead compared
+    to an unprofiled compilation.
+
+    Args:
+        model: See `torch_mlir.compile`.
+        example_args: See `torch_mlir.compile`.
+        output_type: See `torch_mlir.compile`.
+        chrome_trace_path: If not None, the path to write the profile to as
+            a Chrome trace.
+        **kwargs: Forwarded to `torch_mlir.compile`. Passing a `cache` is
+            not useful, since a cache hit skips all phases after annotation.
+    Returns:
+        The profile, which also holds the compiled module.
+    """
+    # Imported here since `torch_mlir` imports this module.
+    from . import compile as torch_mlir_compile
+
+    with PassStatistics(expand_pipelines=True) as stats, \
+            _CompileProfileRecorder() as recorder:
+        start = time.perf_counter()
+        module = torch_mlir_compile(model, example_args, output_type,
+                                    **kwargs)
+        total_seconds = time.perf_counter() - start
+    passes = [
+        PassProfile(p["pass"], run["description"], p["start"], p["seconds"],
+                    p["op_count_after"]) for run in stats.pipeline_runs
+        for p in run["passes"]
+    ]
+    profile = CompileProfile(module, total_seconds, recorder.profiles, passes,
+                             start)
+    if chrome_trace_path is not None:
+        profile.write_chrome_trace(chrome_trace_path)
+    return profile
+
+
+def _get_argparse():
+    parser = argparse.ArgumentParser(
+        description="Profile the phases and passes of torch_mlir.compile.")
+    parser.add_argument("--model", required=True,
+                        help="""The callable creating the torch.nn.Module to compile, as
+`module.path:callable`.""")
+    parser.add_argument("--input_shape",
+                        metavar="SHAPE", required=True, action="append",
+                        help="""The comma-separated shape of an example input to `forward`,
+e.g. `1,3,224,224`. Repeat for multiple inputs. Inputs are random float32
+tensors.""")
+    parser.add_argument("--output_type",
+                        default="linalg-on-tensors",
+                        help="The output type to compile to.")
+    parser.add_argument("--use_tracing",
+                        default=False, action="store_true",
+                        help="Trace the model instead of scripting it.")
+    parser.add_argument("--top",
+                        default=10, type=int,
+                        help="The number of slowest passes to report.")
+    parser.add_argument("--chrome_trace",
+                        metavar="FILE",
+                        help="Write the profile to FILE as a Chrome trace.")
+    return parser
+
+
+def main():
+    args = _get_argparse().parse_args()
+    module_name, _, attr = args.model.partition(":")
+    if not attr:
+        print(f"ERROR: expected `module.path:callable`, got '{args.model}'")
+        sys.exit(1)
+    model = getattr(importlib.import_module(module_name), attr)()
+    model.train(False)
+    example_args = [
+        torch.rand(*[int(size) for size in shape.split(",")])
+        for shape in args.input_shape
+    ]
+    profile = profile_compile(model,
+                              example_args,
+                              args.output_type,
+                              chrome_trace_path=args.chrome_trace,
+                              use_tracing=args.use_tracing)
+    print(profile.report(args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,16 @@
 # SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
 # Also available under a BSD-style license. See LICENSE.
 
+from contextlib import contextmanager
 from io import StringIO
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import collections
+import json
 import os
 import sys
 import tempfile
+import time
 
 from torch_mlir.passmanager import PassManager
 from torch_mlir.ir import StringAttr
@@ -22,9 +28,345 @@ def get_module_name_for_debug_dump(module):
     return StringAttr(module.operation.attributes["torch.debug_module_name"]).value
 
 
+class PhaseRecorder:
+    """Collects the wall time spent in phases marked with `record_phase`.
+
+    Recording is enabled while the recorder is active as a context manager:
+    ```python
+    with PhaseRecorder() as recorder:
+        torch_mlir.compile(model, example_args, output_type="linalg-on-tensors")
+    print(recorder.phases)  # {"import": 0.1, "torch_backend_pipeline": 2.3, ...}
+    ```
+    Phases may nest, and a phase that is entered multiple times accumulates
+    its time.
+
+    Subclasses can override `enter_phase` and `exit_phase` to collect more
+    than the wall time of each phase.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = collections.defaultdict(float)
+
+    def __enter__(self):
+        _active_phase_recorders.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_phase_recorders.remove(self)
+
+    def record(self, phase: str, seconds: float):
+        self.phases[phase] += seconds
+
+    def enter_phase(self, phase: str, module):
+        """Called when `phase` is entered.
+
+        `module` is the MLIR module the phase operates on, if any.
+        """
+        pass
+
+    def exit_phase(self, phase: str, module, seconds: float):
+        """Called when `phase` is exited after `seconds` of wall time."""
+        self.record(phase, seconds)
+
+
+_active_phase_recorders: List[PhaseRecorder] = []
+
+
+def read_peak_rss_bytes() -> Optional[int]:
+    """Returns the peak resident set size of the process, in bytes, or None
+    if it is not available (i.e. not on Linux)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """Resets the peak resident set size of the process to the current
+    resident set size. Returns False if this is not supported."""
+    try:
+        # See `man 5 proc`, /proc/[pid]/clear_refs.
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class PeakMemoryPhaseRecorder(PhaseRecorder):
+    """A `PhaseRecorder` that also records the peak resident memory of each
+    phase.
+
+    The peak is measured by resetting the kernel's high-water mark of the
+    resident set size when a phase is entered, which also covers memory
+    allocated by MLIR and PyTorch in C++. Nested phases fold their peak into
+    the enclosing phases. A phase that is entered multiple times records the
+    maximum of its peaks. Only supported on Linux; elsewhere no peaks are
+    recorded.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # The peak resident set size of each phase, in bytes.
+        self.peak_rss_bytes: Dict[str, int] = {}
+        self._can_measure_memory = reset_peak_rss()
+        # One [phase, peak_rss_bytes] entry per currently entered phase.
+        self._stack: List[List[Any]] = []
+
+    def _fold_peak_into_stack(self):
+        peak = read_peak_rss_bytes()
+        for entry in self._stack:
+            entry[1] = max(entry[1], peak)
+
+    def enter_phase(self, phase: str, module):
+        if not self._can_measure_memory:
+            return
+        self._fold_peak_into_stack()
+        reset_peak_rss()
+        self._stack.append([phase, read_peak_rss_bytes()])
+
+    def exit_phase(self, phase: str, module,
+                   seconds: float) -> Optional[int]:
+        """Records the peak of `phase`, and returns the peak of this
+        occurrence of it for subclasses (None if memory can't be measured).
+        """
+        super().exit_phase(phase, module, seconds)
+        if not self._can_measure_memory:
+            return None
+        self._fold_peak_into_stack()
+        _, peak = self._stack.pop()
+        self.peak_rss_bytes[phase] = max(self.peak_rss_bytes.get(phase, 0),
+                                         peak)
+        return peak
+
+
+@contextmanager
+def record_phase(phase: str, module=None):
+    """Attributes the time spent in the enclosed code to `phase`.
+
+    If the phase operates on an MLIR module in place, it should be passed as
+    `module`, so that recorders can inspect it before and after the phase.
+
+    This is a no-op unless a `PhaseRecorder` is active.
+    """
+    if not _active_phase_recorders:
+        yield
+        return
+    recorders = list(_active_phase_recorders)
+    for recorder in recorders:
+        recorder.enter_phase(phase, module)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        for recorder in reversed(recorders):
+            recorder.exit_phase(phase, module, seconds)
+
+
+def count_ops(operation) -> int:
+    """Counts `operation` and all operations nested in it."""
+    count = 1
+    for region in operation.regions:
+        for block in region.blocks:
+            for op in block.operations:
+                count += count_ops(op.operation)
+    return count
+
+
+def split_pass_pipeline(pipeline: str) -> Optional[Tuple[str, List[str]]]:
+    """Splits a textual pass pipeline into its anchor and top-level elements.
+
+    For example, `builtin.module(a,func.func(b,c),d{x=1,y=2})` is split into
+    `("builtin.module", ["a", "func.func(b,c)", "d{x=1,y=2}"])`.
+
+    Returns None if the pipeline is not of the form `anchor(elements)`.
+    """
+    pipeline = pipeline.strip()
+    open_paren = pipeline.find("(")
+    if open_paren == -1 or not pipeline.endswith(")"):
+        return None
+    anchor = pipeline[:open_paren]
+    elements = []
+    depth = 0
+    start = open_paren + 1
+    for i in range(open_paren + 1, len(pipeline) - 1):
+        c = pipeline[i]
+        if c in "({":
+            depth += 1
+        elif c in ")}":
+            depth -= 1
+        elif c == "," and depth == 0:
+            elements.append(pipeline[start:i].strip())
+            start = i + 1
+    elements.append(pipeline[start:len(pipeline) - 1].strip())
+    return anchor, [e for e in elements if e]
+
+
+class PassStatistics:
+    """Collects per-pass statistics of `run_pipeline_with_repro_report`.
+
+    While active (as a context manager, or process-wide via the
+    `TORCH_MLIR_PASS_STATISTICS` environment variable), each pipeline is run
+    one top-level pass at a time, recording the wall time of the pass and
+    the number of ops in the module after it. Nested pipelines (such as
+    `torchscript-module-to-torch-backend-pipeline`) are measured as a single
+    pass, unless `expand_pipelines` is True, in which case they are
+    expanded into the passes they consist of and each pass is measured.
+    Passes that run pipelines dynamically (such as
+    `torch-lower-to-backend-contract`) are always measured as a single pass;
+    use `torch-mlir-opt -mlir-timing` for a finer breakdown of those.
+
+    ```python
+    with PassStatistics() as stats:
+        torch_mlir.compile(model, example_args, output_type="linalg-on-tensors")
+    stats.write_json("stats.json")
+    ```
+    """
+
+    def __init__(self, expand_pipelines: bool = False):
+        self.expand_pipelines = expand_pipelines
+        # A list of (module_name, description, pipeline, passes) records,
+        # where `passes` is a list of per-pass dicts.
+        self.pipeline_runs: List[Dict[str, Any]] = []
+
+    def __enter__(self):
+        _active_pass_statistics.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_pass_statistics.remove(self)
+
+    def record_pipeline_run(self, module_name: str, description: str,
+                            pipeline: str, op_count_before: int,
+                            passes: List[Dict[str, Any]]):
+        self.pipeline_runs.append({
+            "module_name": module_name,
+            "description": description,
+            "pipeline": pipeline,
+            "op_count_before": op_count_before,
+            "passes": passes,
+        })
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Returns the statistics aggregated per module and per pipeline.
+
+        The result maps module names to pipeline descriptions to a dict with
+        the total number of runs and seconds, and the per-pass seconds
+        (summed over runs) and op counts (of the last run).
+        """
+        result = {}
+        for run in self.pipeline_runs:
+            per_module = result.setdefault(run["module_name"], {})
+            aggregate = per_module.setdefault(
+                run["description"], {
+                    "pipeline": run["pipeline"],
+                    "runs": 0,
+                    "total_seconds": 0.0,
+                    "op_count_before": run["op_count_before"],
+                    "passes": {},
+                })
+            aggregate["runs"] += 1
+            for p in run["passes"]:
+                aggregate["total_seconds"] += p["seconds"]
+                pass_aggregate = aggregate["passes"].setdefault(
+                    p["pass"], {"seconds": 0.0})
+                pass_aggregate["seconds"] += p["seconds"]
+                pass_aggregate["op_count_after"] = p["op_count_after"]
+        return result
+
+    def write_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+
+_active_pass_statistics: List[PassStatistics] = []
+
+
+def _enable_pass_statistics_from_environment():
+    # If set, the path of a JSON file to write the statistics of all pipeline
+    # runs in this process to at exit. A `{pid}` in the path is replaced with
+    # the process id, which is useful when compiling in multiple processes.
+    path = os.environ.get("TORCH_MLIR_PASS_STATISTICS")
+    if not path:
+        return
+    stats = PassStatistics()
+    stats.__enter__()
+    atexit.register(lambda: stats.write_json(path.format(pid=os.getpid())))
+
+
+_enable_pass_statistics_from_environment()
+
+
+def _expand_pass_pipeline(pipeline: str) -> str:
+    """Expands the registered pipelines in `pipeline` into their passes."""
+    # Parsing a pipeline adds the passes of any registered pipeline it
+    # mentions to the pass manager, and printing it prints those passes.
+    expanded = str(PassManager.parse(pipeline))
+    if split_pass_pipeline(expanded) is None:
+        return pipeline
+    return expanded
+
+
+def _run_pipeline_with_pass_statistics(module, pipeline: str,
+                                       description: str):
+    module_name = get_module_name_for_debug_dump(module)
+    op_count_before = count_ops(module.operation)
+    if any(stats.expand_pipelines for stats in _active_pass_statistics):
+        pipeline = _expand_pass_pipeline(pipeline)
+    split = split_pass_pipeline(pipeline)
+    if split is None:
+        anchor, elements = None, [pipeline]
+    else:
+        anchor, elements = split
+    passes = []
+    for element in elements:
+        pass_pipeline = element if anchor is None else f"{anchor}({element})"
+        start = time.perf_counter()
+        pm = PassManager.parse(pass_pipeline)
+        pm.run(module.operation)
+        seconds = time.perf_counter() - start
+        passes.append({
+            "pass": element,
+            "start": start,
+            "seconds": seconds,
+            "op_count_after": count_ops(module.operation),
+        })
+    for stats in _active_pass_statistics:
+        stats.record_pipeline_run(module_name, description, pipeline,
+                                  op_count_before, passes)
+
+
 class TorchMlirCompilerError(Exception):
     pass
 
+
+def _get_repro_dir() -> str:
+    """Returns the directory that repro files of failed pipelines go to.
+
+    This is `$TORCH_MLIR_REPRO_DIR` if set, and the system temporary
+    directory otherwise.
+    """
+    repro_dir = os.environ.get("TORCH_MLIR_REPRO_DIR", tempfile.gettempdir())
+    os.makedirs(repro_dir, exist_ok=True)
+    return repro_dir
+
+
+def _write_repro_file(module_name: str, asm: str) -> str:
+    # `mkstemp` atomically creates a file with a unique name, so concurrent
+    # failures of modules with the same name don't clobber each other.
+    fd, filename = tempfile.mkstemp(prefix=module_name + "-",
+                                    suffix=".mlir",
+                                    dir=_get_repro_dir())
+    with os.fdopen(fd, "w") as f:
+        f.write(asm)
+    return filename
+
+
 def run_pipeline_with_repro_report(module,
                                    pipeline: str,
                                    description: str):
@@ -33,24 +375,24 @@ def run_pipeline_with_repro_report(module,
     try:
         original_stderr = sys.stderr
         sys.stderr = StringIO()
-        asm_for_error_report = module.operation.get_asm(
-            large_elements_limit=10, enable_debug_info=True)
+        # Snapshot the module in case the pipeline fails. Cloning is cheap
+        # compared to printing the module: attributes (in particular large
+        # weights) are uniqued in the context and thus shared with the clone.
+        # The snapshot is only printed if it is actually needed.
+        snapshot_for_error_report = module.operation.clone()
         # Lower module in place to make it ready for compiler backends.
         with module.context:
-            pm = PassManager.parse(pipeline)
-            pm.run(module.operation)
+            if _active_pass_statistics:
+                _run_pipeline_with_pass_statistics(module, pipeline,
+                                                   description)
+            else:
+                pm = PassManager.parse(pipeline)
+                pm.run(module.operation)
     except Exception as e:
-        # TODO: More robust.
-        # - don't arbitrarily clutter up /tmp. When a test suite has many
-        #   tests, this can be a big disk cost (also, /tmp/ is frequently a
-        #   RAM fs, which increases worries about capacity).
-        # - don't have colliding filenames (hard to do without cluttering
-        #   up /tmp)
-        # - if we do have have colliding filenames, writes should at least
-        #   avoid being racy.
-        filename = os.path.join(tempfile.gettempdir(), module_name + ".mlir")
-        with open(filename, 'w') as f:
-            f.write(asm_for_error_report)
+        filename = _write_repro_file(
+            module_name,
+            snapshot_for_error_report.get_asm(large_elements_limit=10,
+                                              enable_debug_info=True))
         debug_options="-mlir-print-ir-after-all -mlir-disable-threading"
         # Put something descriptive here even if description is empty.
         description = description or f"{module_name} compile"
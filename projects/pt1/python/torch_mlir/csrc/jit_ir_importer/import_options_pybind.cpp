@@ -22,5 +22,8 @@ void torch_mlir::initImportOptionsBindings(py::module& m) {
           &ImportOptions::assumeTensorsHaveValueSemantics)
       .def_readwrite(
           "ignoreExistingTensorShapesAndDtypes",
-          &ImportOptions::ignoreExistingTensorShapesAndDtypes);
+          &ImportOptions::ignoreExistingTensorShapesAndDtypes)
+      .def_readwrite(
+          "importTensorsAsDenseResources",
+          &ImportOptions::importTensorsAsDenseResources);
 }
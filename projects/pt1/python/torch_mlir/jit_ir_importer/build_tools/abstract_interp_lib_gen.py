@@ -5,15 +5,21 @@
 
 from typing import List, Optional, Any, Tuple, Union
 import argparse
+import importlib
 import os
 
 import torch
 from torch import device
 import torch.jit._shape_functions as upstream_shape_functions
 
-from .testing_framework import Invocation, ErrorInvocation, TensorOfShape, LongTensorOfShape, NonZeroDTensorWithDtype, ZeroDTensorWithDtype, check_shape_function, check_dtype_function
+from .testing_framework import Invocation, ErrorInvocation, TensorOfShape, LongTensorOfShape, NonZeroDTensorWithDtype, ZeroDTensorWithDtype, check_shape_function, check_dtype_function, defer_checks, run_deferred_checks
 from .library_generator import generate_library, not_present_in_registry, promote_dtypes, get_dtype_of_scalar, is_integer_dtype, is_float_dtype, is_complex_dtype, get_priority_of_dtype, all_integer_dtypes, all_float_dtypes, all_complex_dtypes
 
+if __name__ == "__main__":
+    # Run the checks of the functions below in parallel in `main`, instead of
+    # one after the other as they are defined.
+    defer_checks()
+
 # ==============================================================================
 # Shape Functions
 # ==============================================================================
@@ -3775,18 +3781,29 @@ def prims〇collapse〡dtype(a_rank_dtype: Tuple[int, int], start: int, end: int
 # Main
 # ==============================================================================
 
-def _maybe_import_op_extensions(args: argparse.Namespace):
+def _get_op_extensions(args: argparse.Namespace) -> List[str]:
     extension_string = str.strip(args.pytorch_op_extensions)
     if len(extension_string) > 0:
-        extension_names = extension_string.split(",")
-        for name in extension_names:
-            # Registration of new PyTorch ops should be a side-effect of
-            # importing these modules, so we don't need the return value.
-            importlib.import_module(name)
+        return extension_string.split(",")
+    return []
+
+def _maybe_import_op_extensions(args: argparse.Namespace):
+    for name in _get_op_extensions(args):
+        # Registration of new PyTorch ops should be a side-effect of
+        # importing these modules, so we don't need the return value.
+        importlib.import_module(name)
 
 def main(args):
     _maybe_import_op_extensions(args)
-    asm = generate_library(globals())
+    check_cache_dir = None
+    library_cache_dir = None
+    if args.cache_dir:
+        check_cache_dir = os.path.join(args.cache_dir, "checks")
+        library_cache_dir = os.path.join(args.cache_dir, "library")
+    run_deferred_checks(max_workers=args.jobs,
+                        cache_dir=check_cache_dir,
+                        extension_modules=_get_op_extensions(args))
+    asm = generate_library(globals(), cache_dir=library_cache_dir)
     # We're about to put quotes around the string, so escape the `"` characters.
     asm = asm.replace("\"", "\\\"")
 
@@ -3846,6 +3863,15 @@ def _create_argparse() -> argparse.ArgumentParser:
         type=str,
         default="",
         help="An optional, comma-separated list of Python modules which register additional PyTorch operators upon being imported. These modules can be used to build a torch-mlir which supports PyTorch extensions.")
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=None,
+        help="The number of processes to run the checks of the abstract interpretation functions in. Defaults to the number of CPUs.")
+    parser.add_argument(
+        "--cache_dir",
+        default=None,
+        help="An optional directory to cache the results of passing checks and the generated library in, so that regenerating the library after editing a function only re-checks that function.")
     return parser
 
 if __name__ == "__main__":
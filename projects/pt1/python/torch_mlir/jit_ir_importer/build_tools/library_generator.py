@@ -3,13 +3,17 @@
 # SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
 # Also available under a BSD-style license. See LICENSE.
 
+import hashlib
 import inspect
+import os
 import re
+import tempfile
 from typing import List, Optional, Union, Any, Dict
 import codecs
 
 import torch
 
+from torch_mlir.compile_cache import compute_build_fingerprint
 from torch_mlir.jit_ir_importer import ModuleBuilder
 from torch_mlir.passmanager import PassManager
 
@@ -205,8 +209,43 @@ def _verify_signature_matches_registry(f, registry: Registry):
     if signature != expected_signature:
         raise ValueError(f"Signature mismatch for {f.__name__!r}: expected {expected_signature!r}, got {signature!r}")
 
-def generate_library(functions: Dict[str, Any]) -> str:
-    """Convert all op functions in `functions` into MLIR."""
+def _compute_library_cache_key(functions: Dict[str, Any]) -> str:
+    h = hashlib.sha256()
+    # This covers this file, the importer and the PyTorch version.
+    h.update(compute_build_fingerprint().encode())
+    for k, v in sorted(functions.items()):
+        if "〇" not in k:
+            continue
+        h.update(k.encode())
+        h.update(inspect.getsource(v).encode())
+    return h.hexdigest()
+
+def generate_library(functions: Dict[str, Any],
+                     cache_dir: Optional[str] = None) -> str:
+    """Convert all op functions in `functions` into MLIR.
+
+    If `cache_dir` is not None, the result is cached in that directory, keyed
+    by the sources of the op functions and the torch-mlir build. All
+    functions are imported into one module and share helper functions, so
+    changing any function regenerates the whole library.
+    """
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = os.path.join(
+            cache_dir, f"library-{_compute_library_cache_key(functions)}.mlir")
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                return f.read()
+    asm = _generate_library(functions)
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(asm)
+        os.replace(tmp_path, cache_path)
+    return asm
+
+def _generate_library(functions: Dict[str, Any]) -> str:
     mb = ModuleBuilder()
     # We use the registry to ensure that the shape functions are consistent
     # with the ops.
@@ -3,7 +3,15 @@
 # SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
 # Also available under a BSD-style license. See LICENSE.
 
-from typing import Any, List, Iterable, Optional, Callable
+from typing import Any, List, Iterable, Optional, Callable, Dict, Sequence, Tuple
+
+import concurrent.futures
+import functools
+import hashlib
+import importlib
+import inspect
+import multiprocessing
+import os
 
 import torch
 from torch import Tensor
@@ -43,7 +51,10 @@ from torch import Tensor
 # We expect both the successful and error cases to be tested.
 #
 # The typical iteration flow is to add invocations to the list and then re-run
-# `build_tools/update_abstract_interp_lib.sh` to re-run the tests.
+# `build_tools/update_abstract_interp_lib.sh` to re-run the tests. The script
+# defers the tests until all functions are defined and then runs them in
+# parallel, skipping functions whose tests passed before (see
+# `run_deferred_checks`).
 
 class TensorOfShape:
     """Symbolic placeholder for a tensor argument to an operation.
@@ -239,24 +250,27 @@ def check_shape_function(invocations: List[Invocation]):
     `torch.ops.*` function using the given invocations.
     """
     def decorator(f):
-        for invocation in invocations:
-            result_shapes, golden_results = _get_fn_and_golden_results(f, invocation)
-            if invocation.is_expected_to_raise_exception():
-                continue
-            # Check for matching results.
-            if len(result_shapes) != len(golden_results):
-                _report(f, invocation, f"Expected {len(golden_results)} result shapes, got {len(result_shapes)}")
-            for result_shape, golden_result in zip(result_shapes, golden_results):
-                result_rank = len(result_shape)
-                golden_rank = len(golden_result.shape)
-                if result_rank != golden_rank:
-                    _report(f, invocation, f"Expected result rank {golden_rank}, got {result_rank}")
-                for dimension_size, golden_dimension_size in zip(result_shape, golden_result.shape):
-                    if dimension_size != golden_dimension_size:
-                        _report(f, invocation, f"Expected result shape {golden_result.shape}, got {result_shape}")
+        _run_or_defer_check(f, functools.partial(_check_shape_function, f, invocations))
         return f
     return decorator
 
+def _check_shape_function(f, invocations: List[Invocation]):
+    for invocation in invocations:
+        result_shapes, golden_results = _get_fn_and_golden_results(f, invocation)
+        if invocation.is_expected_to_raise_exception():
+            continue
+        # Check for matching results.
+        if len(result_shapes) != len(golden_results):
+            _report(f, invocation, f"Expected {len(golden_results)} result shapes, got {len(result_shapes)}")
+        for result_shape, golden_result in zip(result_shapes, golden_results):
+            result_rank = len(result_shape)
+            golden_rank = len(golden_result.shape)
+            if result_rank != golden_rank:
+                _report(f, invocation, f"Expected result rank {golden_rank}, got {result_rank}")
+            for dimension_size, golden_dimension_size in zip(result_shape, golden_result.shape):
+                if dimension_size != golden_dimension_size:
+                    _report(f, invocation, f"Expected result shape {golden_result.shape}, got {result_shape}")
+
 @torch.jit.script
 def _convert_dtype_to_int(dtype: torch.dtype) -> int:
     """Convert a PyTorch `dtype` into its underlying `int` representation.
@@ -274,27 +288,233 @@ def check_dtype_function(invocations: List[Invocation]):
     `torch.ops.*` function using the given invocations.
     """
     def decorator(f):
-        for invocation in invocations:
-            result_dtypes, golden_results = _get_fn_and_golden_results(f, invocation)
-            if invocation.is_expected_to_raise_exception():
-                continue
-
-            if len(result_dtypes) != len(golden_results):
-                _report(f, invocation, f"Expected {len(golden_results)} result dtypes, got {len(result_dtypes)}")
-            for result_dtype, golden_result in zip(result_dtypes, golden_results):
-                if isinstance(golden_result, torch.Tensor):
-                    golden_dtype = golden_result.dtype
-                elif isinstance(golden_result, (int, float)):
-                    # Turn Python type to PyTorch dtype
-                    golden_dtype = torch.tensor([]).to(type(golden_result)).dtype
-                else:
-                    raise ValueError(f"Unhandled return type {type(golden_result)}")
-                # Some dtype funtions have default `dtype` parameters, which are
-                # represented as `int` values in the registry. In order to
-                # support returning the default `int` value, the comparisons of
-                # the result and golden dtypes are done using their underlying
-                # `int` representation.
-                if _convert_dtype_to_int(result_dtype) != _convert_dtype_to_int(golden_dtype):
-                    _report(f, invocation, f"Expected result dtype {golden_dtype}, got {result_dtype}")
+        _run_or_defer_check(f, functools.partial(_check_dtype_function, f, invocations))
         return f
     return decorator
+
+def _check_dtype_function(f, invocations: List[Invocation]):
+    for invocation in invocations:
+        result_dtypes, golden_results = _get_fn_and_golden_results(f, invocation)
+        if invocation.is_expected_to_raise_exception():
+            continue
+
+        if len(result_dtypes) != len(golden_results):
+            _report(f, invocation, f"Expected {len(golden_results)} result dtypes, got {len(result_dtypes)}")
+        for result_dtype, golden_result in zip(result_dtypes, golden_results):
+            if isinstance(golden_result, torch.Tensor):
+                golden_dtype = golden_result.dtype
+            elif isinstance(golden_result, (int, float)):
+                # Turn Python type to PyTorch dtype
+                golden_dtype = torch.tensor([]).to(type(golden_result)).dtype
+            else:
+                raise ValueError(f"Unhandled return type {type(golden_result)}")
+            # Some dtype funtions have default `dtype` parameters, which are
+            # represented as `int` values in the registry. In order to
+            # support returning the default `int` value, the comparisons of
+            # the result and golden dtypes are done using their underlying
+            # `int` representation.
+            if _convert_dtype_to_int(result_dtype) != _convert_dtype_to_int(golden_dtype):
+                _report(f, invocation, f"Expected result dtype {golden_dtype}, got {result_dtype}")
+
+# ==============================================================================
+# Deferred, parallel and cached checking.
+# ==============================================================================
+
+# Running the checks of all functions when they are defined takes minutes.
+# Instead, library generation scripts can call `defer_checks` before defining
+# the functions, and then run all checks with `run_deferred_checks`.
+
+# When set to "1", the check decorators defer their checks from the start.
+# This is set in the worker processes of `run_deferred_checks`, so that
+# defining the functions there doesn't run all checks again.
+_DEFER_CHECKS_ENV_VAR = "TORCH_MLIR_DEFER_ABSTRACT_INTERP_CHECKS"
+_defer_checks = os.environ.get(_DEFER_CHECKS_ENV_VAR) == "1"
+# The deferred checks, by function name.
+_deferred_checks: Dict[str, Tuple[Callable, Callable[[], None]]] = {}
+
+def defer_checks():
+    """Makes the check decorators record their checks instead of running them.
+
+    The recorded checks are run by `run_deferred_checks`.
+    """
+    global _defer_checks
+    _defer_checks = True
+
+def _run_or_defer_check(f, check: Callable[[], None]):
+    if _defer_checks:
+        _deferred_checks[f.__name__] = (f, check)
+    else:
+        check()
+
+@functools.lru_cache(maxsize=None)
+def _hash_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def _compute_helpers_fingerprint(module_name: str) -> str:
+    """Hashes the helper functions of the module defining the checked functions.
+
+    The helpers are all functions defined in the module that are not
+    abstract interpretation functions (i.e. have no `〡` in their name).
+    The abstract interpretation functions called by a checked function are
+    part of its own key instead (see `_compute_check_key`). Helpers defined
+    in this file and in `library_generator.py` are covered by
+    hashing those files.
+    """
+    module = importlib.import_module(module_name)
+    h = hashlib.sha256()
+    for name, value in sorted(vars(module).items()):
+        if "〡" in name or not inspect.isfunction(value) or \
+                value.__module__ != module.__name__:
+            continue
+        h.update(name.encode())
+        h.update(inspect.getsource(value).encode())
+    return h.hexdigest()
+
+def _get_code_names(code) -> List[str]:
+    """Returns the global names referenced by `code` and the code objects
+    nested in it (e.g. lambdas and comprehensions)."""
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names += _get_code_names(const)
+    return names
+
+def _get_called_abstract_interp_functions(f) -> List[Callable]:
+    """Returns the abstract interpretation functions (i.e. functions with
+    `〡` in their name) that `f` references, transitively, sorted by name.
+
+    These are not covered by `_compute_helpers_fingerprint`."""
+    module_globals = vars(inspect.getmodule(f))
+    found = {}
+    worklist = [f]
+    while worklist:
+        function = inspect.unwrap(worklist.pop())
+        for name in _get_code_names(function.__code__):
+            value = module_globals.get(name)
+            if "〡" not in name or name in found or \
+                    not inspect.isfunction(value):
+                continue
+            found[name] = value
+            worklist.append(value)
+    found.pop(f.__name__, None)
+    return [found[name] for name in sorted(found)]
+
+def _compute_check_key(f) -> str:
+    """Computes a key that changes whenever the result of the check of `f`
+    may change."""
+    h = hashlib.sha256()
+    h.update(torch.__version__.encode())
+    h.update(_hash_file(__file__).encode())
+    h.update(_hash_file(os.path.join(os.path.dirname(__file__),
+                                     "library_generator.py")).encode())
+    h.update(_compute_helpers_fingerprint(f.__module__).encode())
+    # The source includes the decorator, and thus the invocations.
+    h.update(inspect.getsource(f).encode())
+    for callee in _get_called_abstract_interp_functions(f):
+        h.update(callee.__name__.encode())
+        h.update(inspect.getsource(callee).encode())
+    return h.hexdigest()
+
+def _run_checks(names: List[str]) -> List[Optional[str]]:
+    """Runs the deferred checks of the functions `names` in this process.
+
+    Returns the error of each check, or None if the check passed.
+    """
+    errors = []
+    for name in names:
+        try:
+            _deferred_checks[name][1]()
+            errors.append(None)
+        except Exception as e:
+            errors.append(f"{e}")
+    return errors
+
+def _run_checks_in_worker(module_name: str, extension_modules: Sequence[str],
+                          names: List[str]) -> List[Optional[str]]:
+    for extension_module in extension_modules:
+        importlib.import_module(extension_module)
+    # Defining the functions records their (deferred) checks in this process.
+    importlib.import_module(module_name)
+    return _run_checks(names)
+
+def run_deferred_checks(max_workers: Optional[int] = None,
+                        cache_dir: Optional[str] = None,
+                        extension_modules: Sequence[str] = ()):
+    """Runs the checks deferred since `defer_checks` was called.
+
+    The checks run in `max_workers` processes (by default, one per CPU), or
+    in this process if `max_workers` is 1. The worker processes import the
+    module that defines the checked functions, so it must not have side
+    effects besides defining them (when it runs as the main module, that
+    means `main` must be guarded by `if __name__ == "__main__"`).
+
+    Args:
+        max_workers: The number of worker processes to run the checks in.
+        cache_dir: If not None, a directory recording the checks that passed,
+            keyed by the source of the checked function (including its
+            invocations) and everything else the check depends on. Checks
+            that passed before are not run again.
+        extension_modules: Modules registering additional PyTorch ops, which
+            the worker processes need to import before running the checks.
+    Raises:
+        ValueError: If any check failed. The message lists all failures.
+    """
+    checks = dict(_deferred_checks)
+    _deferred_checks.clear()
+    keys = {}
+    names_to_run = []
+    for name, (f, _) in sorted(checks.items()):
+        if cache_dir is not None:
+            keys[name] = _compute_check_key(f)
+            if os.path.exists(os.path.join(cache_dir, keys[name])):
+                continue
+        names_to_run.append(name)
+    if not names_to_run:
+        return
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers == 1 or len(names_to_run) == 1:
+        _deferred_checks.update(checks)
+        try:
+            errors = _run_checks(names_to_run)
+        finally:
+            _deferred_checks.clear()
+    else:
+        # Use a few batches per worker to balance the load while keeping the
+        # per-task overhead low.
+        num_batches = min(len(names_to_run), max_workers * 4)
+        batches = [names_to_run[i::num_batches] for i in range(num_batches)]
+        module_name = checks[names_to_run[0]][0].__module__
+        previous_env_value = os.environ.get(_DEFER_CHECKS_ENV_VAR)
+        os.environ[_DEFER_CHECKS_ENV_VAR] = "1"
+        try:
+            # Forking a process that has used PyTorch's thread pools is not
+            # safe, so start the workers from scratch.
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context("spawn")) as executor:
+                batch_errors = list(executor.map(
+                    functools.partial(_run_checks_in_worker, module_name,
+                                      tuple(extension_modules)),
+                    batches))
+        finally:
+            if previous_env_value is None:
+                del os.environ[_DEFER_CHECKS_ENV_VAR]
+            else:
+                os.environ[_DEFER_CHECKS_ENV_VAR] = previous_env_value
+        errors_by_name = {}
+        for batch, errors in zip(batches, batch_errors):
+            errors_by_name.update(zip(batch, errors))
+        errors = [errors_by_name[name] for name in names_to_run]
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        for name, error in zip(names_to_run, errors):
+            if error is None:
+                open(os.path.join(cache_dir, keys[name]), "w").close()
+    failures = [error for error in errors if error is not None]
+    if failures:
+        raise ValueError("\n".join(failures))
@@ -0,0 +1,273 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+"""Externalizing the weights of compiled modules.
+
+By default, the weights of a model end up as constants embedded in the
+compiled module, so every process that loads the module holds its own copy
+of them. `externalize_weights` instead lifts the large floating-point
+constants of each public function into trailing function arguments and
+writes their data to a weight archive, a directory holding:
+- `manifest.json`: The dtype, shape and offset in `weights.bin` of each
+  weight, and for each function the weights to pass as its trailing
+  arguments, in order.
+- `weights.bin`: The raw data of all weights, each starting at a multiple of
+  64 bytes. Identical weights (e.g. used by several functions) are stored
+  once.
+
+Integer constants are never lifted. Besides being rarely large, they often
+carry structure the backends rely on being constant (e.g. the permutation of
+a `tosa.transpose` or the indices of a `stablehlo.gather`).
+
+`WeightArchive` memory-maps `weights.bin`, so processes loading the same
+archive share a single copy of the weights in the page cache:
+```python
+module = torch_mlir.compile(model, example_args,
+                            output_type="linalg-on-tensors",
+                            weight_archive_path="/tmp/model_weights")
+...
+weights = WeightArchive("/tmp/model_weights")
+result = invoker.forward(x, *weights.get_arguments("forward"))
+```
+"""
+
+from typing import Dict, List, Optional
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from torch_mlir.ir import (ArrayAttr, DenseElementsAttr, DenseFPElementsAttr,
+                           DictAttr, FloatType, FunctionType, RankedTensorType,
+                           StringAttr, TypeAttr)
+
+# The format written by this module. Bump this when the format changes in a
+# way that older readers can't handle.
+WEIGHT_ARCHIVE_FORMAT_VERSION = 1
+
+_MANIFEST_FILE_NAME = "manifest.json"
+_WEIGHTS_FILE_NAME = "weights.bin"
+_WEIGHT_ALIGNMENT = 64
+
+# Constants with fewer elements than this are left in the module by default.
+# Small constants cost little to duplicate, and passing them as arguments
+# would hide their values from the backend compiler.
+DEFAULT_MIN_WEIGHT_ELEMENTS = 1024
+
+# Ops producing a tensor from a `value` attribute, for each output type.
+_CONSTANT_OP_NAMES = {
+    "arith.constant",
+    "tosa.const",
+    "stablehlo.constant",
+    "torch.vtensor.literal",
+}
+
+
+def _get_constant_data(op, min_elements: int) -> Optional[np.ndarray]:
+    """Returns the data of `op` if it is a tensor constant that should be
+    externalized, and None otherwise."""
+    if op.name not in _CONSTANT_OP_NAMES or len(op.results) != 1 or \
+            "value" not in op.attributes:
+        return None
+    attr = op.attributes["value"]
+    if not DenseElementsAttr.isinstance(attr):
+        # E.g. `dense_resource`s, whose data isn't accessible from Python.
+        return None
+    attr = DenseElementsAttr(attr)
+    if attr.is_splat:
+        # Splats (e.g. zero-filled init tensors) are tiny in the module.
+        return None
+    tensor_type = RankedTensorType(attr.type)
+    if tensor_type.rank == 0 or \
+            np.prod(tensor_type.shape) < min_elements:
+        return None
+    element_type = tensor_type.element_type
+    # Only floating-point constants are weights (see the module docstring).
+    # Types like bf16 have no numpy equivalent, so these stay inline too.
+    if not FloatType.isinstance(element_type) or \
+            FloatType(element_type).width not in (16, 32, 64) or \
+            str(element_type) == "bf16":
+        return None
+    try:
+        return np.array(DenseFPElementsAttr(attr))
+    except (TypeError, ValueError):
+        return None
+
+
+class _WeightArchiveWriter:
+    """Writes a weight archive.
+
+    The files are written under temporary names and moved into place by
+    `close`, so that processes that have memory-mapped a previous archive at
+    the same path keep seeing the old data instead of a truncated file
+    (which would crash them with SIGBUS).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        fd, self._weights_tmp_path = tempfile.mkstemp(dir=path,
+                                                      suffix=".tmp")
+        self._weights_file = os.fdopen(fd, "wb")
+        self._tensors: Dict[str, Dict] = {}
+        self._functions: Dict[str, List[str]] = {}
+
+    def add_weight(self, data: np.ndarray) -> str:
+        """Adds `data` to the archive and returns its name.
+
+        Weights are named by their content, so adding the same data twice
+        stores it once.
+        """
+        data = np.ascontiguousarray(data)
+        h = hashlib.sha256()
+        h.update(f"{data.dtype.str}{list(data.shape)}".encode())
+        h.update(data.reshape(-1).view(np.uint8))
+        name = h.hexdigest()[:32]
+        if name in self._tensors:
+            return name
+        offset = self._weights_file.tell()
+        padding = -offset % _WEIGHT_ALIGNMENT
+        self._weights_file.write(b"\0" * padding)
+        offset += padding
+        self._weights_file.write(data.tobytes())
+        self._tensors[name] = {
+            "dtype": data.dtype.str,
+            "shape": list(data.shape),
+            "offset": offset,
+        }
+        return name
+
+    def set_function_weights(self, func_name: str, weight_names: List[str]):
+        self._functions[func_name] = weight_names
+
+    def close(self):
+        """Moves the archive into place."""
+        self._weights_file.close()
+        manifest = {
+            "version": WEIGHT_ARCHIVE_FORMAT_VERSION,
+            "tensors": self._tensors,
+            "functions": self._functions,
+        }
+        fd, manifest_tmp_path = tempfile.mkstemp(dir=self.path,
+                                                 suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(self._weights_tmp_path,
+                   os.path.join(self.path, _WEIGHTS_FILE_NAME))
+        os.replace(manifest_tmp_path,
+                   os.path.join(self.path, _MANIFEST_FILE_NAME))
+
+    def abort(self):
+        """Discards the archive, leaving any previous archive in place."""
+        self._weights_file.close()
+        os.unlink(self._weights_tmp_path)
+
+
+def _externalize_function_weights(func_op, writer: _WeightArchiveWriter,
+                                  min_elements: int) -> List[str]:
+    entry_block = func_op.regions[0].blocks[0]
+    function_type = FunctionType(
+        TypeAttr(func_op.attributes["function_type"]).value)
+    inputs = list(function_type.inputs)
+    weight_names = []
+    # Only constants in the entry block are lifted. The lowering pipelines
+    # hoist constants there, and constants in nested regions may be in ops
+    # that are isolated from above.
+    for op in list(entry_block.operations):
+        op = op.operation
+        data = _get_constant_data(op, min_elements)
+        if data is None:
+            continue
+        result = op.results[0]
+        arg = entry_block.add_argument(result.type, op.location)
+        result.replace_all_uses_with(arg)
+        op.erase()
+        inputs.append(result.type)
+        weight_names.append(writer.add_weight(data))
+    if not weight_names:
+        return weight_names
+    func_op.attributes["function_type"] = TypeAttr.get(
+        FunctionType.get(inputs, function_type.results))
+    if "arg_attrs" in func_op.attributes:
+        arg_attrs = list(func_op.attributes["arg_attrs"])
+        arg_attrs += [DictAttr.get({})] * len(weight_names)
+        func_op.attributes["arg_attrs"] = ArrayAttr.get(arg_attrs)
+    return weight_names
+
+
+def externalize_weights(module,
+                        path: str,
+                        min_elements: int = DEFAULT_MIN_WEIGHT_ELEMENTS):
+    """Lifts the floating-point tensor constants of the public functions of
+    `module` into trailing function arguments, and writes their data to a
+    weight archive in the directory `path`.
+
+    `module` is modified in place. Splat constants and constants with fewer
+    than `min_elements` elements are left in the module, as are constants of
+    other element types.
+
+    Args:
+        module: A module in any of the backend output types.
+        path: The directory to write the weight archive to. An existing
+            archive there is replaced.
+        min_elements: The minimum number of elements of a constant for it
+            to be externalized.
+    """
+    writer = _WeightArchiveWriter(path)
+    try:
+        with module.context:
+            for op in module.body.operations:
+                op = op.operation
+                if op.name != "func.func" or \
+                        "sym_visibility" in op.attributes:
+                    continue
+                func_name = StringAttr(op.attributes["sym_name"]).value
+                writer.set_function_weights(
+                    func_name,
+                    _externalize_function_weights(op, writer, min_elements))
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+
+
+class WeightArchive:
+    """A weight archive written by `externalize_weights`.
+
+    The weights are backed by a copy-on-write memory mapping of the archive,
+    so they are only read from disk when used, processes loading the same
+    archive share the memory holding them, and modifying them doesn't modify
+    the archive.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, _MANIFEST_FILE_NAME)) as f:
+            manifest = json.load(f)
+        if manifest["version"] > WEIGHT_ARCHIVE_FORMAT_VERSION:
+            raise ValueError(
+                f"Weight archive '{path}' has format version "
+                f"{manifest['version']}, but only versions up to "
+                f"{WEIGHT_ARCHIVE_FORMAT_VERSION} are supported")
+        self._functions: Dict[str, List[str]] = manifest["functions"]
+        weights_path = os.path.join(path, _WEIGHTS_FILE_NAME)
+        data = None
+        if os.path.getsize(weights_path) > 0:
+            data = np.memmap(weights_path, dtype=np.uint8, mode="c")
+        # The weights, by name.
+        self.tensors: Dict[str, np.ndarray] = {}
+        for name, desc in manifest["tensors"].items():
+            dtype = np.dtype(desc["dtype"])
+            shape = desc["shape"]
+            offset = desc["offset"]
+            num_bytes = int(np.prod(shape)) * dtype.itemsize
+            self.tensors[name] = data[offset:offset + num_bytes].view(
+                dtype).reshape(shape)
+
+    def get_arguments(self, func_name: str) -> List[np.ndarray]:
+        """Returns the weights to pass as the trailing arguments of the
+        function `func_name`."""
+        return [self.tensors[name] for name in self._functions[func_name]]
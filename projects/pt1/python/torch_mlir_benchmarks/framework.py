@@ -0,0 +1,268 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+"""
+# Model-level latency benchmarks.
+
+A benchmark consists of a model and a function creating its inputs for a
+given batch size. Each benchmark is run with every combination of backend,
+batch size and PyTorch thread count, and the latency of each call to
+`forward` is measured. The results can be written as JSON to be compared
+across commits.
+
+This is separate from `torch_mlir_e2e_test`, which only checks correctness
+and runs many small tests in parallel, which would skew latencies.
+"""
+
+import abc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import json
+import sys
+import time
+import traceback
+
+import numpy as np
+import torch
+
+import torch_mlir
+from torch_mlir_e2e_test.linalg_on_tensors_backends.refbackend import RefBackendLinalgOnTensorsBackend
+from torch_mlir_e2e_test.tosa_backends.linalg_on_tensors import LinalgOnTensorsTosaBackend
+
+
+class Benchmark(NamedTuple):
+    """A description of a benchmark as produced by the registry."""
+    # Stable name, used to compare results across runs.
+    name: str
+    # A callable which produces the model to benchmark.
+    model_factory: Callable[[], torch.nn.Module]
+    # A callable which produces the inputs of `forward` for a batch size.
+    input_factory: Callable[[int], Sequence[torch.Tensor]]
+    # The batch sizes to benchmark by default.
+    batch_sizes: Tuple[int, ...]
+
+
+class BenchmarkMeasurement(NamedTuple):
+    # Should match Benchmark.name for the corresponding benchmark.
+    name: str
+    # The name of the backend (see `BACKENDS`).
+    backend: str
+    batch_size: int
+    # The number of intra-op threads PyTorch was configured to use.
+    num_threads: int
+    # If preparing or running the model failed, a string describing the
+    # failure. In that case the measurements below are None.
+    error: Optional[str]
+    # The median and 99th percentile latency of one call, in milliseconds.
+    p50_ms: Optional[float]
+    p99_ms: Optional[float]
+    # The number of samples (batch elements) processed per second.
+    throughput: Optional[float]
+    # The time it took to prepare (i.e. compile) the model, in seconds.
+    prepare_seconds: Optional[float]
+
+
+class BenchmarkBackend(abc.ABC):
+    """A way of running a model."""
+
+    @abc.abstractmethod
+    def prepare(self, model: torch.nn.Module,
+                example_inputs: Sequence[torch.Tensor]) -> Callable[..., Any]:
+        """Prepares `model` for running with inputs like `example_inputs`.
+
+        Returns:
+            A callable taking the inputs as `torch.Tensor`'s and running the
+            model on them.
+        """
+        pass
+
+
+class EagerBackend(BenchmarkBackend):
+    """Runs the model in eager PyTorch."""
+
+    def prepare(self, model, example_inputs):
+        return model
+
+
+class TorchScriptBackend(BenchmarkBackend):
+    """Runs the model as a traced and frozen TorchScript module."""
+
+    def prepare(self, model, example_inputs):
+        return torch.jit.freeze(torch.jit.trace(model, tuple(example_inputs)))
+
+
+class TorchMlirBackend(BenchmarkBackend):
+    """Compiles the model with `torch_mlir.compile` and runs it on a
+    torch-mlir backend.
+
+    The model is traced with the example inputs, so the compiled module is
+    specialized to their shapes.
+    """
+
+    def __init__(self, output_type: str, backend_factory: Callable[[], Any]):
+        self.output_type = output_type
+        self.backend_factory = backend_factory
+
+    def prepare(self, model, example_inputs):
+        backend = self.backend_factory()
+        module = torch_mlir.compile(model,
+                                    list(example_inputs),
+                                    output_type=self.output_type,
+                                    use_tracing=True)
+        invoker = backend.load(backend.compile(module))
+
+        def run(*inputs):
+            return invoker.forward(*[x.numpy() for x in inputs])
+
+        return run
+
+
+# The available backends, by name.
+BACKENDS: Dict[str, Callable[[], BenchmarkBackend]] = {
+    "eager": EagerBackend,
+    "torchscript": TorchScriptBackend,
+    "linalg": lambda: TorchMlirBackend("linalg-on-tensors",
+                                       RefBackendLinalgOnTensorsBackend),
+    "linalg_O1": lambda: TorchMlirBackend(
+        "linalg-on-tensors",
+        lambda: RefBackendLinalgOnTensorsBackend(optimization_level=1)),
+    "tosa": lambda: TorchMlirBackend("tosa", LinalgOnTensorsTosaBackend),
+}
+
+
+def measure(fn: Callable[..., Any], inputs: Sequence[torch.Tensor],
+            batch_size: int, iterations: int,
+            warmup_iterations: int) -> Tuple[float, float, float]:
+    """Measures the latency of `fn(*inputs)`.
+
+    Returns:
+        The median and 99th percentile latency in milliseconds, and the
+        throughput in samples per second.
+    """
+    for _ in range(warmup_iterations):
+        fn(*inputs)
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(*inputs)
+        latencies.append(time.perf_counter() - start)
+    latencies_ms = np.array(latencies) * 1000
+    throughput = batch_size * iterations / sum(latencies)
+    return (float(np.percentile(latencies_ms, 50)),
+            float(np.percentile(latencies_ms, 99)), throughput)
+
+
+def run_benchmark(benchmark: Benchmark, backend_name: str, batch_size: int,
+                  num_threads: int, iterations: int,
+                  warmup_iterations: int) -> BenchmarkMeasurement:
+    """Runs `benchmark` with one backend, batch size and thread count."""
+    previous_num_threads = torch.get_num_threads()
+    torch.set_num_threads(num_threads)
+    try:
+        with torch.no_grad():
+            torch.manual_seed(0)
+            model = benchmark.model_factory()
+            model.train(False)
+            inputs = benchmark.input_factory(batch_size)
+            start = time.perf_counter()
+            fn = BACKENDS[backend_name]().prepare(model, inputs)
+            prepare_seconds = time.perf_counter() - start
+            p50_ms, p99_ms, throughput = measure(fn, inputs, batch_size,
+                                                 iterations, warmup_iterations)
+    except Exception as e:
+        return BenchmarkMeasurement(
+            name=benchmark.name,
+            backend=backend_name,
+            batch_size=batch_size,
+            num_threads=num_threads,
+            error="".join(
+                traceback.format_exception(type(e), e, e.__traceback__)),
+            p50_ms=None,
+            p99_ms=None,
+            throughput=None,
+            prepare_seconds=None)
+    finally:
+        torch.set_num_threads(previous_num_threads)
+    return BenchmarkMeasurement(name=benchmark.name,
+                                backend=backend_name,
+                                batch_size=batch_size,
+                                num_threads=num_threads,
+                                error=None,
+                                p50_ms=p50_ms,
+                                p99_ms=p99_ms,
+                                throughput=throughput,
+                                prepare_seconds=prepare_seconds)
+
+
+def run_benchmarks(benchmarks: List[Benchmark],
+                   backend_names: Sequence[str],
+                   num_threads: Sequence[int],
+                   batch_sizes: Optional[Sequence[int]] = None,
+                   iterations: int = 50,
+                   warmup_iterations: int = 5,
+                   verbose: bool = False) -> List[BenchmarkMeasurement]:
+    """Runs each benchmark with each combination of backend, batch size and
+    thread count.
+
+    Args:
+        benchmarks: The benchmarks to run.
+        backend_names: The backends to run them on (see `BACKENDS`).
+        num_threads: The PyTorch intra-op thread counts to sweep. These don't
+            affect the torch-mlir RefBackend, which runs single-threaded
+            unless built with OpenMP (where `OMP_NUM_THREADS` applies).
+        batch_sizes: The batch sizes to sweep. Defaults to the batch sizes
+            of each benchmark.
+        iterations: The number of measured calls.
+        warmup_iterations: The number of unmeasured calls before measuring.
+        verbose: If True, print progress to stderr.
+    """
+    measurements = []
+    for benchmark in sorted(benchmarks, key=lambda b: b.name):
+        for batch_size in batch_sizes or benchmark.batch_sizes:
+            for threads in num_threads:
+                for backend_name in backend_names:
+                    if verbose:
+                        print(
+                            f"Benchmarking {benchmark.name} with {backend_name}, "
+                            f"batch_size={batch_size}, num_threads={threads}...",
+                            file=sys.stderr)
+                    measurements.append(
+                        run_benchmark(benchmark, backend_name, batch_size,
+                                      threads, iterations, warmup_iterations))
+    return measurements
+
+
+def write_measurements(measurements: List[BenchmarkMeasurement], path: str):
+    """Writes `measurements` as JSON, together with the versions of PyTorch
+    and torch-mlir they were taken with."""
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "torch_version": torch.__version__,
+                "torch_mlir_version": getattr(torch_mlir, "__version__", None),
+                "measurements": [m._asdict() for m in measurements],
+            },
+            f,
+            indent=2)
+
+
+def load_measurements(path: str) -> List[BenchmarkMeasurement]:
+    """Loads measurements written by `write_measurements`."""
+    with open(path) as f:
+        return [
+            BenchmarkMeasurement(**m) for m in json.load(f)["measurements"]
+        ]
+
+
+def report_measurements(measurements: List[BenchmarkMeasurement]):
+    """Prints a table of `measurements`."""
+    for m in measurements:
+        config = (f"{m.name} backend={m.backend} batch_size={m.batch_size} "
+                  f"num_threads={m.num_threads}")
+        if m.error is not None:
+            print(f"ERROR - {config}")
+            continue
+        print(f"{config}: p50={m.p50_ms:.3f}ms p99={m.p99_ms:.3f}ms "
+              f"throughput={m.throughput:.1f}/s "
+              f"prepare={m.prepare_seconds:.2f}s")
@@ -0,0 +1,91 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+"""
+# FX importer benchmark.
+
+Measures the time it takes to import a large synthetic FX graph with
+`torch_mlir._dynamo_fx_importer.import_fx_graph_as_func`:
+```shell
+python -m torch_mlir_benchmarks.fx_importer --num_nodes 100000
+```
+
+The graph is a chain of elementwise ops with scalar literals, like the graphs
+produced by TorchDynamo for large models: few distinct tensor types, source
+locations and literals, repeated over many nodes.
+"""
+
+import argparse
+import statistics
+import time
+
+import torch
+import torch.fx
+from torch._subclasses import FakeTensorMode
+
+from torch_mlir._dynamo_fx_importer import import_fx_graph_as_func
+
+# The number of distinct source lines the nodes are attributed to.
+_NUM_SOURCE_LINES = 100
+
+
+def build_synthetic_graph(num_nodes: int, shape=(16, 16)) -> torch.fx.Graph:
+    """Builds an FX graph with `num_nodes` op nodes and the metadata
+    TorchDynamo sets on them (fake tensor values and stack traces)."""
+    g = torch.fx.Graph()
+    with FakeTensorMode():
+        x = g.placeholder("x")
+        x.meta["val"] = torch.empty(shape)
+        prev = x
+        for i in range(num_nodes):
+            kind = i % 3
+            if kind == 0:
+                target, args = torch.ops.aten.add.Tensor, (prev, x)
+            elif kind == 1:
+                target, args = torch.ops.aten.mul.Scalar, (prev, 0.5)
+            else:
+                target, args = torch.ops.aten.tanh.default, (prev,)
+            node = g.call_function(target, args)
+            node.meta["val"] = target(*[
+                a.meta["val"] if isinstance(a, torch.fx.Node) else a
+                for a in args
+            ])
+            node.stack_trace = (f'File "synthetic_model.py", line '
+                                f'{i % _NUM_SOURCE_LINES + 1}, in forward\n'
+                                f'    y = op(y)\n')
+            prev = node
+    g.output((prev,))
+    return g
+
+
+def _get_argparse():
+    parser = argparse.ArgumentParser(
+        description="Benchmark importing a large FX graph.")
+    parser.add_argument("--num_nodes",
+                        default=100000, type=int,
+                        help="The number of op nodes of the synthetic graph.")
+    parser.add_argument("--iterations",
+                        default=3, type=int,
+                        help="Number of imports. The median time is reported.")
+    return parser
+
+
+def main():
+    args = _get_argparse().parse_args()
+    start = time.perf_counter()
+    g = build_synthetic_graph(args.num_nodes)
+    print(f"Built a graph with {args.num_nodes} nodes in "
+          f"{time.perf_counter() - start:.2f}s")
+    samples = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        import_fx_graph_as_func(g, "synthetic")
+        samples.append(time.perf_counter() - start)
+    median = statistics.median(samples)
+    print(f"Imported in {median:.2f}s (median of {args.iterations}), "
+          f"{median / args.num_nodes * 1e6:.1f}us per node")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+import argparse
+import re
+import sys
+
+from .framework import BACKENDS, report_measurements, run_benchmarks, write_measurements
+from .registry import GLOBAL_BENCHMARK_REGISTRY
+
+# Import the benchmarks to register them in the global registry.
+from . import models
+
+
+def _get_argparse():
+    parser = argparse.ArgumentParser(
+        description="Run model-level latency benchmarks.")
+    parser.add_argument("-f", "--filter", default=".*", help="""
+Regular expression specifying which benchmarks to run.
+""")
+    parser.add_argument("-b", "--backends",
+                        nargs="+", choices=list(BACKENDS.keys()),
+                        default=["eager", "torchscript", "linalg"],
+                        help="The backends to run the benchmarks on.")
+    parser.add_argument("--batch_sizes",
+                        nargs="+", type=int,
+                        help="The batch sizes to sweep. Defaults to the batch sizes of each benchmark.")
+    parser.add_argument("--num_threads",
+                        nargs="+", type=int, default=[1],
+                        help="The PyTorch intra-op thread counts to sweep.")
+    parser.add_argument("--iterations",
+                        default=50, type=int,
+                        help="Number of measured calls per configuration.")
+    parser.add_argument("--warmup_iterations",
+                        default=5, type=int,
+                        help="Number of unmeasured calls per configuration before measuring.")
+    parser.add_argument("-o", "--output",
+                        metavar="FILE",
+                        help="Write the measurements to FILE as JSON.")
+    parser.add_argument("-v", "--verbose",
+                        default=False,
+                        action="store_true",
+                        help="Print progress and the errors of failing benchmarks.")
+    return parser
+
+
+def main():
+    args = _get_argparse().parse_args()
+    benchmarks = [
+        b for b in GLOBAL_BENCHMARK_REGISTRY if re.match(args.filter, b.name)
+    ]
+    if len(benchmarks) == 0:
+        print(
+            f"ERROR: the provided filter {args.filter!r} does not match any benchmarks"
+        )
+        print("The available benchmarks are:")
+        for benchmark in GLOBAL_BENCHMARK_REGISTRY:
+            print(benchmark.name)
+        sys.exit(1)
+    measurements = run_benchmarks(benchmarks, args.backends, args.num_threads,
+                                  args.batch_sizes, args.iterations,
+                                  args.warmup_iterations, args.verbose)
+    report_measurements(measurements)
+    if args.verbose:
+        for m in measurements:
+            if m.error is not None:
+                print(f"\n{m.name} ({m.backend}):\n{m.error}")
+    if args.output:
+        write_measurements(measurements, args.output)
+    sys.exit(1 if any(m.error is not None for m in measurements) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+import torch
+import torch.nn as nn
+import torchvision.models as models
+
+from .registry import register_benchmark
+
+# ==============================================================================
+
+
+@register_benchmark(model_factory=lambda: models.resnet18(), batch_sizes=[1, 8])
+def ResNet18(batch_size: int):
+    return [torch.rand(batch_size, 3, 224, 224)]
+
+
+@register_benchmark(model_factory=lambda: models.mobilenet_v2(),
+                    batch_sizes=[1, 8])
+def MobileNetV2(batch_size: int):
+    return [torch.rand(batch_size, 3, 224, 224)]
+
+# ==============================================================================
+
+
+class Mlp(nn.Module):
+    def __init__(self, in_features=512, hidden_features=2048, num_layers=4):
+        super().__init__()
+        layers = []
+        for i in range(num_layers):
+            layers.append(
+                nn.Linear(in_features if i == 0 else hidden_features,
+                          hidden_features))
+            layers.append(nn.ReLU())
+        self.layers = nn.Sequential(*layers)
+
+    def forward(self, x):
+        return self.layers(x)
+
+
+@register_benchmark(model_factory=lambda: Mlp(), batch_sizes=[1, 32, 256])
+def MLP(batch_size: int):
+    return [torch.rand(batch_size, 512)]
+
+# ==============================================================================
+
+
+class SmallBert(nn.Module):
+    """A BERT-like encoder: token and position embeddings followed by a
+    stack of transformer encoder layers."""
+
+    def __init__(self,
+                 vocab_size=30522,
+                 max_sequence_length=512,
+                 hidden_size=256,
+                 num_layers=4,
+                 num_heads=4):
+        super().__init__()
+        self.token_embedding = nn.Embedding(vocab_size, hidden_size)
+        self.position_embedding = nn.Embedding(max_sequence_length,
+                                               hidden_size)
+        self.layer_norm = nn.LayerNorm(hidden_size)
+        layer = nn.TransformerEncoderLayer(hidden_size,
+                                           num_heads,
+                                           dim_feedforward=4 * hidden_size,
+                                           activation="gelu",
+                                           batch_first=True)
+        self.encoder = nn.TransformerEncoder(layer, num_layers)
+
+    def forward(self, input_ids):
+        positions = torch.arange(input_ids.shape[1]).unsqueeze(0)
+        x = self.token_embedding(input_ids) + \
+            self.position_embedding(positions)
+        return self.encoder(self.layer_norm(x))
+
+
+@register_benchmark(model_factory=lambda: SmallBert(), batch_sizes=[1, 8])
+def SmallBERT(batch_size: int):
+    return [torch.randint(0, 30522, (batch_size, 128))]
@@ -0,0 +1,41 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+
+from typing import Callable, Sequence
+
+import torch
+
+from .framework import Benchmark
+
+# The global registry of benchmarks.
+GLOBAL_BENCHMARK_REGISTRY = []
+# Ensure that there are no duplicate names in the global benchmark registry.
+_SEEN_NAMES = set()
+
+
+def register_benchmark(model_factory: Callable[[], torch.nn.Module],
+                       batch_sizes: Sequence[int] = (1, 8)):
+    """Convenient decorator-based benchmark registration.
+
+    Adds a `framework.Benchmark` to the global benchmark registry based on
+    the decorated function. The benchmark's `name` is taken from the function
+    name, the benchmark's `model_factory` is taken from `model_factory`, and
+    the `input_factory` is the decorated function, which takes a batch size
+    and returns the inputs of `forward`.
+    """
+    def decorator(f):
+        if f.__name__ in _SEEN_NAMES:
+            raise Exception(
+                f"Duplicate benchmark name: '{f.__name__}'. Please make sure that the function wrapped by `register_benchmark` has a unique name.")
+        _SEEN_NAMES.add(f.__name__)
+
+        GLOBAL_BENCHMARK_REGISTRY.append(
+            Benchmark(name=f.__name__,
+                      model_factory=model_factory,
+                      input_factory=f,
+                      batch_sizes=tuple(batch_sizes)))
+        return f
+
+    return decorator
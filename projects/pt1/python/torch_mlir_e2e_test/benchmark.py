@@ -0,0 +1,175 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+"""
+Utilities for benchmarking the phases of the test framework.
+
+Each test is run several times in the current process, and the wall time and
+peak memory of each phase (golden trace generation, compilation and its
+sub-phases, loading and running) are recorded. The results can be saved to
+JSON or CSV and compared against a baseline to catch compile-time and runtime
+regressions, and tests that started failing.
+"""
+
+from typing import Dict, List, NamedTuple, Optional
+
+import csv
+import json
+import statistics
+import sys
+import traceback
+
+from torch_mlir.compiler_utils import PeakMemoryPhaseRecorder, record_phase
+
+from .framework import Test, TestConfig, generate_golden_trace
+
+
+class BenchmarkResult(NamedTuple):
+    # Should match Test.unique_name for the corresponding test.
+    unique_name: str
+    # If the test failed to compile or run, a string describing the failure.
+    # In that case `phases` only contains the iterations that completed.
+    error: Optional[str]
+    # The median wall time in seconds of each phase across iterations.
+    phases: Dict[str, float]
+    # The peak resident set size of the process in MiB during each phase,
+    # as the maximum across iterations. Only measured on Linux; empty
+    # elsewhere.
+    phase_peak_rss_mib: Dict[str, float]
+
+
+def benchmark_test(test: Test,
+                   config: TestConfig,
+                   iterations: int,
+                   warmup_iterations: int = 1) -> BenchmarkResult:
+    """Benchmark a single test by running it in the current process."""
+    samples: Dict[str, List[float]] = {}
+    peak_rss_mib: Dict[str, float] = {}
+    error = None
+    for i in range(warmup_iterations + iterations):
+        with PeakMemoryPhaseRecorder() as recorder:
+            try:
+                with record_phase("golden_trace"):
+                    golden_trace = generate_golden_trace(test)
+                with record_phase("compile"):
+                    compiled = config.compile(test.program_factory())
+                with record_phase("run"):
+                    config.run(compiled, golden_trace)
+            except Exception as e:
+                error = "".join(
+                    traceback.format_exception(type(e), e, e.__traceback__))
+                break
+        if i < warmup_iterations:
+            continue
+        for phase, seconds in recorder.phases.items():
+            samples.setdefault(phase, []).append(seconds)
+        for phase, peak in recorder.peak_rss_bytes.items():
+            peak_rss_mib[phase] = max(peak_rss_mib.get(phase, 0.0),
+                                      peak / 1024**2)
+    return BenchmarkResult(
+        unique_name=test.unique_name,
+        error=error,
+        phases={
+            phase: statistics.median(values)
+            for phase, values in samples.items()
+        },
+        phase_peak_rss_mib=peak_rss_mib)
+
+
+def run_benchmarks(tests: List[Test],
+                   config: TestConfig,
+                   iterations: int = 5,
+                   warmup_iterations: int = 1,
+                   verbose: bool = False) -> List[BenchmarkResult]:
+    """Benchmark the given `Test`'s with the provided `TestConfig`.
+
+    Tests are run sequentially to avoid measuring contention between them.
+    """
+    results = []
+    for test in sorted(tests, key=lambda t: t.unique_name):
+        if verbose:
+            print(f"Benchmarking {test.unique_name}...", file=sys.stderr)
+        results.append(
+            benchmark_test(test, config, iterations, warmup_iterations))
+    return results
+
+
+def write_benchmark_results(results: List[BenchmarkResult], path: str):
+    """Write benchmark results to `path`, as CSV if it ends in `.csv` and as
+    JSON otherwise."""
+    if path.endswith(".csv"):
+        phases = sorted({phase for r in results for phase in r.phases})
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["unique_name", "error"] + phases +
+                            [f"{phase}_peak_rss_mib" for phase in phases])
+            for r in results:
+                writer.writerow(
+                    [r.unique_name, r.error or ""] +
+                    [r.phases.get(phase, "") for phase in phases] +
+                    [r.phase_peak_rss_mib.get(phase, "") for phase in phases])
+        return
+    with open(path, "w") as f:
+        json.dump({r.unique_name: r._asdict() for r in results}, f, indent=2)
+
+
+def load_benchmark_results(path: str) -> Dict[str, BenchmarkResult]:
+    """Load benchmark results previously written as JSON."""
+    with open(path) as f:
+        return {
+            name: BenchmarkResult(**fields)
+            for name, fields in json.load(f).items()
+        }
+
+
+def find_regressions(results: List[BenchmarkResult],
+                     baseline: Dict[str, BenchmarkResult],
+                     threshold: float,
+                     min_seconds: float = 1e-3) -> List[str]:
+    """Compare benchmark results against a baseline.
+
+    A test regresses when it fails but didn't fail in the baseline (or is
+    missing from it). A phase of a test regresses when it is slower than in
+    the baseline by more than `threshold` (relative) and by more than
+    `min_seconds` (absolute, to ignore noise in very short phases). Phases
+    that are missing from the baseline are ignored.
+
+    Returns:
+        A human readable description of each regression.
+    """
+    regressions = []
+    for result in results:
+        baseline_result = baseline.get(result.unique_name)
+        if result.error is not None and (baseline_result is None or
+                                         baseline_result.error is None):
+            regressions.append(f'"{result.unique_name}" failed: ' +
+                               result.error.strip().splitlines()[-1])
+        if baseline_result is None:
+            continue
+        for phase, seconds in sorted(result.phases.items()):
+            baseline_seconds = baseline_result.phases.get(phase)
+            if baseline_seconds is None:
+                continue
+            if seconds > baseline_seconds * (1 + threshold) and \
+                    seconds - baseline_seconds > min_seconds:
+                regressions.append(
+                    f'"{result.unique_name}" phase "{phase}": '
+                    f'{seconds:.4f}s vs. {baseline_seconds:.4f}s in baseline '
+                    f'(+{(seconds / baseline_seconds - 1) * 100:.1f}%)')
+    return regressions
+
+
+def report_benchmark_results(results: List[BenchmarkResult]):
+    """Print a summary of benchmark results."""
+    for r in results:
+        if r.error is not None:
+            print(f'ERROR - "{r.unique_name}"')
+            continue
+        phases = []
+        for phase, seconds in sorted(r.phases.items()):
+            phase_str = f"{phase}={seconds:.4f}s"
+            if phase in r.phase_peak_rss_mib:
+                phase_str += f" (peak_rss={r.phase_peak_rss_mib[phase]:.1f}MiB)"
+            phases.append(phase_str)
+        print(f'"{r.unique_name}": {", ".join(phases)}')
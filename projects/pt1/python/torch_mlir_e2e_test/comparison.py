@@ -0,0 +1,223 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+"""
+Utilities for comparing the accuracy and speed of several test configs.
+
+Each test is run against every config in the current process, reusing one
+golden trace per test, and the outcome, the maximum error against the golden
+trace and the compile and run times are collected into a matrix.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Set
+
+import csv
+import json
+import math
+import sys
+import time
+import traceback
+
+import torch
+
+from .framework import (Test, TestConfig, TestResult, TorchScriptValue,
+                        TraceItem, clone_torch_script_value,
+                        generate_golden_trace)
+from .reporting import ErrorContext, SingleTestReport, TensorComparison
+
+
+class ComparisonResult(NamedTuple):
+    # Should match Test.unique_name for the corresponding test.
+    unique_name: str
+    # The name of the config the test was run with.
+    config_name: str
+    # One of "PASS", "FAIL" (wrong results), "COMPILE_ERROR", "RUNTIME_ERROR",
+    # "GOLDEN_TRACE_ERROR" (the golden trace couldn't be generated, so the
+    # test wasn't run with any config) or "SKIP" (known to crash with this
+    # config).
+    outcome: str
+    # The maximum absolute error of any output tensor, if the test ran.
+    max_abs_error: Optional[float]
+    # The wall time of `TestConfig.compile`, if it ran.
+    compile_seconds: Optional[float]
+    # The wall time of `TestConfig.run`, if it ran.
+    run_seconds: Optional[float]
+
+
+def _max_abs_error(value: TorchScriptValue,
+                   golden: TorchScriptValue) -> float:
+    """The maximum absolute error of the tensors in `value`, or infinity if
+    the structure of `value` doesn't match `golden`."""
+    if isinstance(golden, torch.Tensor):
+        if not isinstance(value, torch.Tensor) or \
+                value.shape != golden.shape:
+            return math.inf
+        return TensorComparison(value, golden, 0, 0).max_abs_error
+    if isinstance(golden, (tuple, list)):
+        if type(value) != type(golden) or len(value) != len(golden):
+            return math.inf
+        return max((_max_abs_error(v, g) for v, g in zip(value, golden)),
+                   default=0.0)
+    if isinstance(golden, dict):
+        if not isinstance(value, dict) or value.keys() != golden.keys():
+            return math.inf
+        return max((_max_abs_error(value[k], golden[k]) for k in golden),
+                   default=0.0)
+    return 0.0
+
+
+def _compare_test(test: Test, golden_trace, config_name: str,
+                  config: TestConfig) -> ComparisonResult:
+    compile_seconds = None
+    run_seconds = None
+    try:
+        start = time.perf_counter()
+        compiled = config.compile(test.program_factory())
+        compile_seconds = time.perf_counter() - start
+    except Exception:
+        return ComparisonResult(test.unique_name, config_name,
+                                "COMPILE_ERROR", None, None, None)
+    try:
+        # Configs may modify the inputs in place, so give each config its
+        # own copy of them.
+        input_trace = [
+            TraceItem(symbol=item.symbol,
+                      inputs=clone_torch_script_value(item.inputs),
+                      output=None) for item in golden_trace
+        ]
+        start = time.perf_counter()
+        trace = config.run(compiled, input_trace)
+        run_seconds = time.perf_counter() - start
+    except Exception:
+        return ComparisonResult(test.unique_name, config_name,
+                                "RUNTIME_ERROR", None, compile_seconds, None)
+    result = TestResult(unique_name=test.unique_name,
+                        compilation_error=None,
+                        runtime_error=None,
+                        trace=trace,
+                        golden_trace=golden_trace,
+                        rtol=test.rtol,
+                        atol=test.atol)
+    report = SingleTestReport(result, ErrorContext.empty())
+    max_abs_error = max((_max_abs_error(item.output, golden_item.output)
+                         for item, golden_item in zip(trace, golden_trace)),
+                        default=0.0)
+    return ComparisonResult(test.unique_name, config_name,
+                            "FAIL" if report.failed else "PASS",
+                            max_abs_error, compile_seconds, run_seconds)
+
+
+def compare_configs(tests: List[Test],
+                    configs: Dict[str, TestConfig],
+                    skipped_tests: Optional[Dict[str, Set[str]]] = None,
+                    golden_trace_cache=None,
+                    verbose: bool = False) -> List[ComparisonResult]:
+    """Run each test against each config, sharing the golden trace.
+
+    Tests run sequentially in this process so that the timings are not
+    skewed by contention between tests.
+
+    Args:
+        tests: The tests to run.
+        configs: The configs to compare, by name.
+        skipped_tests: For each config name, the tests that should not be
+            run with that config (e.g. because they crash).
+        golden_trace_cache: If not None, a
+            `golden_trace_cache.GoldenTraceCache` to take the golden traces
+            from.
+        verbose: If True, print progress to stderr.
+    Returns:
+        One result per test and config, sorted by test name.
+    """
+    skipped_tests = skipped_tests or {}
+    results = []
+    for test in sorted(tests, key=lambda t: t.unique_name):
+        if verbose:
+            print(f"Comparing {test.unique_name}...", file=sys.stderr)
+        try:
+            if golden_trace_cache is not None:
+                golden_trace = golden_trace_cache.get_golden_trace(test)
+            else:
+                golden_trace = generate_golden_trace(test)
+        except Exception:
+            if verbose:
+                traceback.print_exc()
+            for config_name in configs:
+                results.append(
+                    ComparisonResult(test.unique_name, config_name,
+                                     "GOLDEN_TRACE_ERROR", None, None, None))
+            continue
+        for config_name, config in configs.items():
+            if test.unique_name in skipped_tests.get(config_name, set()):
+                results.append(
+                    ComparisonResult(test.unique_name, config_name, "SKIP",
+                                     None, None, None))
+                continue
+            results.append(
+                _compare_test(test, golden_trace, config_name, config))
+    return results
+
+
+def _format_cell(result: ComparisonResult) -> str:
+    if result.outcome != "PASS" and result.outcome != "FAIL":
+        return result.outcome
+    return (f"{result.outcome} err={result.max_abs_error:.2e} "
+            f"compile={result.compile_seconds:.3f}s "
+            f"run={result.run_seconds:.4f}s")
+
+
+def report_comparison(results: List[ComparisonResult]):
+    """Print the comparison matrix, and for each test the config with the
+    fastest run time among those that passed."""
+    by_test: Dict[str, Dict[str, ComparisonResult]] = {}
+    for result in results:
+        by_test.setdefault(result.unique_name, {})[result.config_name] = result
+    for unique_name, by_config in by_test.items():
+        print(f'"{unique_name}":')
+        for config_name, result in by_config.items():
+            print(f"    {config_name}: {_format_cell(result)}")
+        passed = [r for r in by_config.values() if r.outcome == "PASS"]
+        if passed:
+            fastest = min(passed, key=lambda r: r.run_seconds)
+            print(f"    fastest passing config: {fastest.config_name}")
+
+    print("\nSummary:")
+    config_names = list(dict.fromkeys(r.config_name for r in results))
+    for config_name in config_names:
+        config_results = [r for r in results if r.config_name == config_name]
+        num_passed = sum(r.outcome == "PASS" for r in config_results)
+        print(f"    {config_name}: {num_passed} of {len(config_results)} passed")
+
+
+def _json_safe(value):
+    # JSON has no representation for infinities and NaN (an infinite error
+    # means that the structure of the output didn't match), so write them as
+    # strings that Python's `float` parses back.
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    return value
+
+
+def write_comparison_results(results: List[ComparisonResult], path: str):
+    """Write comparison results to `path`, as CSV if it ends in `.csv` and
+    as JSON otherwise.
+
+    In JSON, non-finite numbers are written as the strings "inf", "-inf" and
+    "nan", so that the output is valid JSON.
+    """
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(ComparisonResult._fields)
+            for r in results:
+                writer.writerow(["" if v is None else v for v in r])
+        return
+    with open(path, "w") as f:
+        json.dump([{
+            field: _json_safe(value)
+            for field, value in r._asdict().items()
+        } for r in results],
+                  f,
+                  indent=2,
+                  allow_nan=False)
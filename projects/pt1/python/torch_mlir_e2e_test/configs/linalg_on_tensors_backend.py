@@ -7,6 +7,7 @@ from typing import Any
 
 import torch
 import torch_mlir
+from torch_mlir.compiler_utils import record_phase
 
 from torch_mlir_e2e_test.linalg_on_tensors_backends.abc import LinalgOnTensorsBackend
 from torch_mlir_e2e_test.framework import TestConfig, Trace, TraceItem
@@ -33,12 +34,19 @@ class LinalgOnTensorsBackendTestConfig(TestConfig):
         module = torch_mlir.compile(
             program, example_args, output_type="linalg-on-tensors")
 
-        return self.backend.compile(module)
+        with record_phase("backend_compile"):
+            return self.backend.compile(module)
 
 
 
     def run(self, artifact: Any, trace: Trace) -> Trace:
-        backend_module = self.backend.load(artifact)
+        return self.run_loaded(self.load(artifact), trace)
+
+    def load(self, artifact: Any) -> Any:
+        with record_phase("backend_load"):
+            return self.backend.load(artifact)
+
+    def run_loaded(self, backend_module: Any, trace: Trace) -> Trace:
         result: Trace = []
         for item in trace:
             numpy_inputs = recursively_convert_to_numpy(item.inputs)
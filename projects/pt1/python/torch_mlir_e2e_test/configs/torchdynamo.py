@@ -3,7 +3,9 @@
 # SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
 # Also available under a BSD-style license. See LICENSE.
 
-from typing import List, Union, Optional, Sequence
+from typing import Any, Dict, Hashable, List, Union, Optional, Sequence, Tuple
+
+import collections
 
 import numpy as np
 import torch
@@ -16,6 +18,7 @@ from torch._functorch.aot_autograd import (
 )
 
 from torch_mlir._dynamo_fx_importer import import_fx_graph_as_func
+from torch_mlir.compiler_utils import record_phase
 from torch_mlir.dynamo import _get_decomposition_table
 from torch_mlir import (
     _example_args,
@@ -54,6 +57,38 @@ def _returns_empty_tuple(fx_graph: torch.fx.GraphModule) -> bool:
     return True
 
 
+def _can_be_constant(param: torch.Tensor) -> bool:
+    # The FX importer can't import quantized tensors as literals.
+    return not param.is_quantized
+
+
+def _lift_params_to_attrs(gm: torch.fx.GraphModule,
+                          params: Sequence[torch.Tensor]) -> torch.fx.GraphModule:
+    """Returns a copy of `gm` in which the placeholders for `params`, which
+    `aot_autograd` passes first, are replaced by `get_attr` nodes of them.
+
+    Parameters that can't be imported as constants (see `_can_be_constant`)
+    keep their placeholders. `gm` itself is left unchanged, since it is still
+    called with the parameters as inputs.
+    """
+    root = torch.nn.Module()
+    g = torch.fx.Graph()
+    env = {}
+    num_params_seen = 0
+    for node in gm.graph.nodes:
+        if node.op == "placeholder" and num_params_seen < len(params):
+            param = params[num_params_seen]
+            num_params_seen += 1
+            if _can_be_constant(param):
+                name = f"_param{num_params_seen - 1}"
+                setattr(root, name, param)
+                env[node] = g.get_attr(name)
+                env[node].meta = node.meta.copy()
+                continue
+        env[node] = g.node_copy(node, lambda n: env[n])
+    return torch.fx.GraphModule(root, g)
+
+
 def jit(
     model: torch.nn.Module,
     example_args: _example_args,
@@ -61,7 +96,28 @@ def jit(
     backend_legal_ops: Optional[Sequence[str]] = None,
     extra_library=None,
     verbose: bool = False,
+    params_as_constants: bool = False,
+    dynamic: bool = False,
 ):
+    """Compiles `model` with TorchDynamo.
+
+    If `params_as_constants` is True, the current values of the parameters
+    and buffers of `model` are imported as constants, and the compiled
+    function only takes the parameters that can't be constants (see
+    `_get_non_constant_params`) followed by the inputs of `model`. The
+    compiled function doesn't see later changes to the parameters; see
+    `_params_version` for detecting them. Otherwise, the compiled function
+    takes all parameters and buffers (in the order of `_get_params_flat`)
+    followed by the inputs.
+
+    If `dynamic` is True, TorchDynamo traces `model` with symbolic sizes, so
+    the sizes of the inputs are `?` in the compiled function. With the
+    `torch` output type, the symbolic shapes are recorded in the
+    `torch.symbolic_shape` argument attributes, and arguments with a
+    `torch.symbolic_value` attribute take the value of a symbol instead of a
+    tensor. These attributes are dropped when lowering to the other output
+    types.
+    """
     if extra_library is None:
         extra_library = []
     import torch._dynamo as dynamo
@@ -89,7 +145,10 @@ def jit(
 
         nonlocal mlir_module
         *_, model_name, nth_graph = get_aot_compilation_context()
-        mlir_module = import_fx_graph_as_func(gm.graph, model_name)
+        graph = gm.graph
+        if params_as_constants:
+            graph = _lift_params_to_attrs(gm, _get_params_flat(model)).graph
+        mlir_module = import_fx_graph_as_func(graph, model_name)
         return gm
 
     my_backend = aot_autograd(fw_compiler=my_aot_autograd_backend,
@@ -98,21 +157,185 @@ def jit(
     with torch.no_grad():
         set_model_name(model.__class__.__name__)
         torch._dynamo.reset()
-        dynamo_f = dynamo.optimize(my_backend, nopython=True)(
+        dynamo_f = dynamo.optimize(my_backend, nopython=True, dynamic=dynamic)(
             lambda method, *inputs: method(*inputs))
-        dynamo_f(lambda *inputs: model(*[x.clone() for x in inputs]),
-                 *example_args)
+        with record_phase("import"):
+            dynamo_f(lambda *inputs: model(*[x.clone() for x in inputs]),
+                     *example_args)
         option_string = ("{backend-legal-ops=" + ",".join(backend_legal_ops) +
                          " extra-library=" + extra_library_file_name + "}")
         assert mlir_module is not None
-        run_pipeline_with_repro_report(
-            mlir_module,
-            # f"builtin.module(torch-function-to-torch-backend-pipeline{option_string})",
-            f"builtin.module(torch-lower-to-backend-contract)",
-            "Lowering TorchFX IR -> Torch Backend IR",
-        )
+        with record_phase("torch_backend_pipeline"):
+            run_pipeline_with_repro_report(
+                mlir_module,
+                # f"builtin.module(torch-function-to-torch-backend-pipeline{option_string})",
+                f"builtin.module(torch-lower-to-backend-contract)",
+                "Lowering TorchFX IR -> Torch Backend IR",
+            )
+
+    with record_phase("backend_lowering"):
+        return _lower_mlir_module(verbose, output_type, mlir_module)
+
+
+def _get_params_flat(model: torch.nn.Module) -> List[torch.Tensor]:
+    """Gets the parameters and buffers of `model` in the order that
+    `aot_autograd` passes them to the compiled graph."""
+    params = {
+        **dict(model.named_parameters(remove_duplicate=False)),
+        **dict(model.named_buffers(remove_duplicate=False)),
+    }
+    params_flat, params_spec = pytree.tree_flatten(params)
+    return list(params_flat)
+
+
+def _get_non_constant_params(model: torch.nn.Module) -> List[torch.Tensor]:
+    """Gets the parameters and buffers of `model` that `jit` passes as
+    arguments even with `params_as_constants`, in order."""
+    return [p for p in _get_params_flat(model) if not _can_be_constant(p)]
+
+
+def _params_version(model: torch.nn.Module) -> Hashable:
+    """A key that changes whenever a parameter or buffer of `model` is
+    replaced or modified in place (e.g. the running statistics of a batch
+    norm in training mode), so that programs compiled with
+    `params_as_constants` can be cached on it."""
+    return tuple((id(p), p._version) for p in _get_params_flat(model))
+
+
+def _input_signature(inputs: Sequence[Any]) -> Hashable:
+    """A key identifying the compiled program that `jit` produces for
+    `inputs`.
+
+    Tensors are only distinguished by their shape and dtype, but dynamo
+    specializes on the values of other inputs, so those are part of the key.
+    """
+    return tuple((tuple(x.shape), x.dtype) if isinstance(x, torch.Tensor)
+                 else (type(x), repr(x)) for x in inputs)
+
 
-    return _lower_mlir_module(verbose, output_type, mlir_module)
+class _LRUCache:
+    """A mapping that evicts its least recently used entry when full."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+
+    def get(self, key):
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def bucket_size(size: int, buckets: Optional[Sequence[int]] = None) -> int:
+    """Rounds `size` up to the smallest bucket that holds it.
+
+    Args:
+        size: The size of a dynamic axis.
+        buckets: The allowed sizes, in increasing order. If None, the buckets
+            are the powers of two.
+    Returns:
+        The bucketed size.
+    """
+    if buckets is None:
+        return 1 << max(size - 1, 0).bit_length()
+    for bucket in buckets:
+        if size <= bucket:
+            return bucket
+    raise ValueError(
+        f"Size {size} is larger than the largest bucket {buckets[-1]}")
+
+
+class ShapeBucketedModule:
+    """Runs a model through TorchDynamo, compiling once per shape bucket.
+
+    Inputs are padded along their dynamic axes up to the next bucket size
+    (see `bucket_size`), so that for example all sequence lengths between 65
+    and 128 share one compiled program. Compiled programs are kept in an LRU
+    cache keyed by the bucketed input signature.
+
+    Padding is only correct for models whose outputs for the unpadded
+    positions don't depend on the padding (e.g. with an attention mask that
+    the caller pads accordingly). The outputs are returned at the padded
+    size; the caller is responsible for slicing them.
+
+    The parameters and buffers of the model are compiled in as constants.
+    If they are replaced or modified in place, the affected programs are
+    compiled again on their next use.
+    """
+
+    def __init__(self,
+                 model: torch.nn.Module,
+                 backend,
+                 dynamic_axes: Dict[int, Sequence[int]],
+                 buckets: Optional[Sequence[int]] = None,
+                 pad_value: Union[int, float] = 0,
+                 max_cache_size: int = 8):
+        """Create a ShapeBucketedModule.
+
+        Args:
+            model: The model to run.
+            backend: The linalg-on-tensors backend to compile the model with.
+            dynamic_axes: Maps the index of each input with dynamic sizes to
+                its dynamic axes.
+            buckets: The allowed sizes of the dynamic axes, in increasing
+                order. Defaults to powers of two.
+            pad_value: The value used for padding.
+            max_cache_size: The maximum number of compiled programs to keep.
+        """
+        self.model = model
+        self.backend = backend
+        self.dynamic_axes = dynamic_axes
+        self.buckets = buckets
+        self.pad_value = pad_value
+        self._cache = _LRUCache(max_cache_size)
+
+    def _pad(self, inputs: Sequence[Any]) -> List[Any]:
+        padded_inputs = []
+        for i, x in enumerate(inputs):
+            axes = self.dynamic_axes.get(i)
+            if not axes:
+                padded_inputs.append(x)
+                continue
+            # `torch.nn.functional.pad` takes (before, after) pairs starting
+            # from the last axis.
+            pad = [0] * (2 * x.dim())
+            for axis in axes:
+                axis = axis % x.dim()
+                size = x.shape[axis]
+                pad[2 * (x.dim() - 1 - axis) + 1] = \
+                    bucket_size(size, self.buckets) - size
+            if any(pad):
+                x = torch.nn.functional.pad(x, pad, value=self.pad_value)
+            padded_inputs.append(x)
+        return padded_inputs
+
+    def __call__(self, *inputs):
+        padded_inputs = self._pad(inputs)
+        key = (_input_signature(padded_inputs), _params_version(self.model))
+        backend_module = self._cache.get(key)
+        if backend_module is None:
+            module = jit(self.model,
+                         padded_inputs,
+                         output_type="linalg-on-tensors",
+                         params_as_constants=True)
+            backend_module = self.backend.load(self.backend.compile(module))
+            self._cache.put(key, backend_module)
+        with torch.no_grad():
+            numpy_inputs = recursively_convert_to_numpy(
+                _get_non_constant_params(self.model) + list(padded_inputs))
+        outputs = getattr(backend_module,
+                          self.model.__class__.__name__)(*numpy_inputs)
+        return refine_result_type(outputs)
 
 
 class TorchDynamoTestConfig(TestConfig):
@@ -126,22 +349,41 @@ class TorchDynamoTestConfig(TestConfig):
         return program
 
     def run(self, artifact: torch.nn.Module, trace: Trace) -> Trace:
+        return self.run_loaded(self.load(artifact), trace)
+
+    def load(
+        self, artifact: torch.nn.Module
+    ) -> Tuple[torch.nn.Module, Dict[Hashable, Any]]:
+        # The programs are compiled on first use by `run_loaded`, once per
+        # input signature, and are kept with the loaded artifact so that
+        # later runs reuse them.
+        return artifact, {}
+
+    def run_loaded(
+        self, loaded: Tuple[torch.nn.Module, Dict[Hashable, Any]],
+        trace: Trace) -> Trace:
+        artifact, backend_modules = loaded
         result: Trace = []
+        # Trace items that are called with the same input signature share
+        # the compiled program, unless the parameters changed in between
+        # (e.g. because the module updates a buffer in its forward).
         for item in trace:
-            module = jit(artifact,
-                         item.inputs,
-                         output_type="linalg-on-tensors")
-            module = self.backend.compile(module)
-            backend_module = self.backend.load(module)
-            params = {
-                **dict(artifact.named_parameters(remove_duplicate=False)),
-                **dict(artifact.named_buffers(remove_duplicate=False)),
-            }
-            params_flat, params_spec = pytree.tree_flatten(params)
-            params_flat = list(params_flat)
+            key = (_input_signature(item.inputs), _params_version(artifact))
+            backend_module = backend_modules.get(key)
+            if backend_module is None:
+                # The parameters are compiled in as constants, so that they
+                # don't need to be converted and passed on every call.
+                module = jit(artifact,
+                             item.inputs,
+                             output_type="linalg-on-tensors",
+                             params_as_constants=True)
+                module = self.backend.compile(module)
+                with record_phase("backend_load"):
+                    backend_module = self.backend.load(module)
+                backend_modules[key] = backend_module
             with torch.no_grad():
-                numpy_inputs = recursively_convert_to_numpy(params_flat +
-                                                            item.inputs)
+                numpy_inputs = recursively_convert_to_numpy(
+                    _get_non_constant_params(artifact) + list(item.inputs))
             outputs = getattr(backend_module,
                               artifact.__class__.__name__)(*numpy_inputs)
             output = refine_result_type(outputs)
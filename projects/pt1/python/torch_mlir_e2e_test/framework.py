@@ -21,14 +21,22 @@ compiling or TorchScript'ing).
 """
 
 import abc
-from typing import Any, Callable, List, NamedTuple, Optional, TypeVar, Union, Dict
-from itertools import repeat
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple, TypeVar, Union, Dict
 
+import collections
+import faulthandler
+import json
+import math
+import os
 import sys
+import tempfile
+import time
 import traceback
 
 import torch
 import multiprocess as mp
+from multiprocess.connection import wait
+from multiprocessing import resource_tracker, shared_memory
 
 TorchScriptValue = Union[int, float, List['TorchScriptValue'],
                          Dict['TorchScriptValue',
@@ -74,22 +82,6 @@ def clone_torch_script_value(v: TorchScriptValue):
     assert False, "unhandled cloning of TorchScriptValue value type"
 
 
-# This clone helper is used to work around issues with output tensors when
-# using multiprocessing module to run tests. The error happens for tests like
-# ContiguousModule_basic where the output tensor aliases with an input tensor.
-# When the output tensor is not cloned, the testing trace would be modified for
-# unknown reason when passed through the shared memory through synchronized
-# queue for example.
-# TODO: Figure out the root cause of the failure and fix properly.
-def clone_trace(trace: Trace) -> Trace:
-    return [
-        TraceItem(symbol=item.symbol,
-                  inputs=clone_torch_script_value(item.inputs),
-                  output=clone_torch_script_value(item.output))
-        for item in trace
-    ]
-
-
 # A type shared between the result of `TestConfig.compile` and the input
 # to `TestConfig.run`. Each backend will likely have a different definition of
 # this type.
@@ -162,6 +154,25 @@ class TestConfig(abc.ABC):
         """
         pass
 
+    def load(self, artifact: CompiledArtifact) -> Any:
+        """Load the compiled artifact produced by `compile` for running.
+
+        The result can be passed to `run_loaded` any number of times, so that
+        repeated runs (e.g. when measuring latency) don't pay for loading the
+        artifact each time. The default implementation returns `artifact`
+        unchanged, which is appropriate for configs without a separate
+        loading step.
+        """
+        return artifact
+
+    def run_loaded(self, loaded: Any, trace: Trace) -> Trace:
+        """Like `run`, but for an artifact that was loaded with `load`.
+
+        Configs overriding `load` must override this too. `loaded` may be
+        shared between calls in the same way as the artifact of `run`.
+        """
+        return self.run(loaded, trace)
+
 
 # Utilities for common testing trace generation.
 # Also, resets the random seed for reproducibility.
@@ -193,6 +204,12 @@ class TestUtils:
         return vals
 
 
+# The default tolerances for comparing tensors against the golden trace. See
+# `reporting.TensorComparison`.
+DEFAULT_RTOL = 1e-03
+DEFAULT_ATOL = 1e-07
+
+
 class Test(NamedTuple):
     """A description of a test as produced by the test frontend.
     """
@@ -213,6 +230,10 @@ class Test(NamedTuple):
     # module, actually).
     # The secon parameter is a `TestUtils` instance for convenience.
     program_invoker: Callable[[Any, TestUtils], None]
+    # The relative and absolute tolerances for comparing output tensors
+    # against the golden trace.
+    rtol: float = DEFAULT_RTOL
+    atol: float = DEFAULT_ATOL
 
 
 class TestResult(NamedTuple):
@@ -240,6 +261,14 @@ class TestResult(NamedTuple):
     trace: Optional[Trace]
     # The golden trace which `trace` is expected to match.
     golden_trace: Optional[Trace]
+    # The tolerances to compare `trace` to `golden_trace` with. Should match
+    # Test.rtol and Test.atol for the corresponding test.
+    rtol: float = DEFAULT_RTOL
+    atol: float = DEFAULT_ATOL
+    # True if the test didn't finish because its process crashed or it timed
+    # out. Such a result may not be reproducible (e.g. on a loaded machine),
+    # so it shouldn't be reused for later runs.
+    aborted: bool = False
 
 
 class _Tracer:
@@ -282,9 +311,20 @@ def generate_golden_trace(test: Test) -> Trace:
     return trace
 
 
-def compile_and_run_test(test: Test, config: TestConfig, verbose=False) -> Any:
+def compile_and_run_test(test: Test,
+                         config: TestConfig,
+                         verbose=False,
+                         golden_trace_cache=None) -> Any:
+    """Compile and run `test` with `config`.
+
+    If `golden_trace_cache` is not None, it is a
+    `golden_trace_cache.GoldenTraceCache` that the golden trace is taken from.
+    """
     try:
-        golden_trace = generate_golden_trace(test)
+        if golden_trace_cache is not None:
+            golden_trace = golden_trace_cache.get_golden_trace(test)
+        else:
+            golden_trace = generate_golden_trace(test)
         if verbose:
             print(f"Compiling {test.unique_name}...", file=sys.stderr)
         compiled = config.compile(test.program_factory())
@@ -311,58 +351,392 @@ def compile_and_run_test(test: Test, config: TestConfig, verbose=False) -> Any:
     return TestResult(unique_name=test.unique_name,
                       compilation_error=None,
                       runtime_error=None,
-                      trace=clone_trace(trace),
-                      golden_trace=clone_trace(golden_trace))
+                      trace=trace,
+                      golden_trace=golden_trace,
+                      rtol=test.rtol,
+                      atol=test.atol)
+
+
+# Tensors are placed at offsets that are a multiple of this in the shared
+# memory segment of a result.
+_SHARED_MEMORY_ALIGNMENT = 64
+
+
+class _SharedTensor:
+    """A placeholder for a tensor whose data lives in shared memory."""
+
+    def __init__(self, offset: int, shape: Tuple[int, ...], dtype: torch.dtype):
+        self.offset = offset
+        self.shape = shape
+        self.dtype = dtype
+
+
+def _map_tensors(v: TorchScriptValue, fn: Callable[[Any], Any]):
+    """Applies `fn` to each tensor (or `_SharedTensor`) in `v`."""
+    if isinstance(v, (torch.Tensor, _SharedTensor)):
+        return fn(v)
+    if isinstance(v, tuple):
+        return tuple(_map_tensors(field, fn) for field in v)
+    if isinstance(v, list):
+        return [_map_tensors(item, fn) for item in v]
+    if isinstance(v, dict):
+        return {key: _map_tensors(val, fn) for key, val in v.items()}
+    return v
+
+
+def _map_trace_tensors(trace: Optional[Trace],
+                       fn: Callable[[Any], Any]) -> Optional[Trace]:
+    if trace is None:
+        return None
+    return [
+        TraceItem(symbol=item.symbol,
+                  inputs=_map_tensors(item.inputs, fn),
+                  output=_map_tensors(item.output, fn)) for item in trace
+    ]
 
 
-def run_tests(tests: List[Test], config: TestConfig, sequential=False, verbose=False) -> List[TestResult]:
-    """Invoke the given `Test`'s with the provided `TestConfig`."""
-    num_processes = min(int(mp.cpu_count() * 1.1), len(tests))
+def _move_result_to_shared_memory(
+        result: TestResult) -> Tuple[TestResult, Optional[str]]:
+    """Copies the tensors of `result` into a new shared memory segment.
+
+    Returns `result` with the tensors replaced by `_SharedTensor`'s, and the
+    name of the segment (or None if no segment was needed). The caller hands
+    ownership of the segment to whoever receives the name, who must release
+    it with `_take_result_from_shared_memory`. The segment stays registered
+    with the resource tracker until then, so the tracker must be shared with
+    the receiver (see `run_tests`): if the receiver never takes the segment,
+    the tracker unlinks it once both processes have exited.
+
+    Tensors that can't be described by a shape and dtype alone (e.g.
+    quantized or empty tensors) are left in place and are pickled as usual.
+    """
+    tensors = []
+    size = 0
+
+    def plan(t: torch.Tensor):
+        nonlocal size
+        if t.layout != torch.strided or t.is_quantized or \
+                t.device.type != "cpu" or t.numel() == 0:
+            return t
+        shared = _SharedTensor(size, tuple(t.shape), t.dtype)
+        tensors.append((shared, t))
+        size += math.ceil(t.numel() * t.element_size() /
+                          _SHARED_MEMORY_ALIGNMENT) * _SHARED_MEMORY_ALIGNMENT
+        return shared
+
+    result = result._replace(
+        trace=_map_trace_tensors(result.trace, plan),
+        golden_trace=_map_trace_tensors(result.golden_trace, plan))
+    if not tensors:
+        return result, None
+
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        for shared, t in tensors:
+            torch.frombuffer(shm.buf,
+                             dtype=t.dtype,
+                             count=t.numel(),
+                             offset=shared.offset).view(shared.shape).copy_(t)
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return result, shm.name
+
+
+def _take_result_from_shared_memory(result: TestResult,
+                                    shm_name: Optional[str]) -> TestResult:
+    """Inverse of `_move_result_to_shared_memory`.
+
+    Copies the tensors out of the shared memory segment `shm_name` and
+    releases the segment. Unlinking it also unregisters it from the resource
+    tracker, which is the point where ownership passes to this process.
+    """
+    if shm_name is None:
+        return result
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+
+        def load(shared: _SharedTensor):
+            return torch.frombuffer(shm.buf,
+                                    dtype=shared.dtype,
+                                    count=math.prod(shared.shape),
+                                    offset=shared.offset).view(
+                                        shared.shape).clone()
+
+        return result._replace(
+            trace=_map_trace_tensors(result.trace, load),
+            golden_trace=_map_trace_tensors(result.golden_trace, load))
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _worker_main(tests: List[Test], config: TestConfig, conn,
+                 stderr_dir: str, verbose: bool, golden_trace_cache):
+    """The main loop of a test worker process.
+
+    Receives indices into `tests` over `conn`, and sends back the index, the
+    `TestResult`, the duration and the name of the shared memory segment
+    holding the tensors of the result (see `_move_result_to_shared_memory`)
+    of each test. The stderr of each test
+    (including output from native code) is captured in a file in `stderr_dir`
+    while the test runs, so that it can be recovered if the process crashes,
+    and is forwarded to the real stderr afterwards.
+    """
+    # This is needed because autograd does not support crossing process
+    # boundaries.
+    torch.autograd.set_grad_enabled(False)
+    # Dump the Python stack to the captured stderr on a crash.
+    faulthandler.enable()
+    original_stderr_fd = os.dup(2)
+    while True:
+        try:
+            index = conn.recv()
+        except EOFError:
+            return
+        if index is None:
+            return
+        test = tests[index]
+        stderr_path = os.path.join(stderr_dir, f"{index}.stderr")
+        sys.stderr.flush()
+        with open(stderr_path, "wb") as f:
+            os.dup2(f.fileno(), 2)
+        try:
+            start = time.perf_counter()
+            result = compile_and_run_test(test, config, verbose,
+                                          golden_trace_cache)
+            duration = time.perf_counter() - start
+        finally:
+            sys.stderr.flush()
+            os.dup2(original_stderr_fd, 2)
+        with open(stderr_path, "rb") as f:
+            os.write(2, f.read())
+        os.unlink(stderr_path)
+        # Only metadata goes through the pipe; the tensor data is handed over
+        # in shared memory.
+        result, shm_name = _move_result_to_shared_memory(result)
+        conn.send((index, result, duration, shm_name))
+
+
+class _Worker:
+    """A long-lived process running tests one at a time."""
+
+    def __init__(self, tests: List[Test], config: TestConfig, stderr_dir: str,
+                 verbose: bool, golden_trace_cache):
+        self.conn, child_conn = mp.Pipe()
+        self.process = mp.Process(target=_worker_main,
+                                  args=(tests, config, child_conn, stderr_dir,
+                                        verbose, golden_trace_cache),
+                                  daemon=True)
+        self.process.start()
+        # Only the child holds its end of the pipe, so that we see an EOF
+        # when it dies.
+        child_conn.close()
+        # The index of the test currently running on the worker, if any.
+        self.test_index: Optional[int] = None
+        self.start_time: Optional[float] = None
+
+    def start_test(self, index: int):
+        self.test_index = index
+        self.start_time = time.monotonic()
+        self.conn.send(index)
+
+    def finish_test(self):
+        self.test_index = None
+        self.start_time = None
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def shutdown(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join()
+        self.conn.close()
+
+
+def _load_test_durations(path: Optional[str]) -> Dict[str, float]:
+    if path is None or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_test_durations(path: str, durations: Dict[str, float]):
+    # Write atomically, since concurrent runs may share the file.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(durations, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _get_default_num_workers(num_tests: int) -> int:
+    num_workers = min(int(mp.cpu_count() * 1.1), num_tests)
     # TODO: We've noticed that on certain 2 core machine parallelizing the tests
     # makes the llvm backend legacy pass manager 20x slower than using a
     # single process. Need to investigate the root cause eventually. This is a
     # hack to work around this issue.
-    # Also our multiprocessing implementation is not the most efficient, so
-    # the benefit at core count 2 is probably not worth it anyway.
     if mp.cpu_count() == 2:
-        num_processes = 1
-
+        num_workers = 1
+    return max(num_workers, 1)
+
+
+def _make_aborted_test_result(test: Test, reason: str,
+                              stderr_path: str) -> TestResult:
+    stderr = ""
+    if os.path.exists(stderr_path):
+        with open(stderr_path, "rb") as f:
+            stderr = f.read().decode(errors="replace")
+        os.unlink(stderr_path)
+    runtime_error = reason
+    if stderr:
+        runtime_error += f"Captured stderr:\n{stderr}"
+    return TestResult(unique_name=test.unique_name,
+                      compilation_error=None,
+                      runtime_error=runtime_error,
+                      trace=None,
+                      golden_trace=None,
+                      aborted=True)
+
+
+def run_tests(tests: List[Test],
+              config: TestConfig,
+              sequential=False,
+              verbose=False,
+              num_workers: Optional[int] = None,
+              timeout: Optional[float] = None,
+              durations_path: Optional[str] = None,
+              golden_trace_cache=None) -> List[TestResult]:
+    """Invoke the given `Test`'s with the provided `TestConfig`.
+
+    Unless `sequential` is set, the tests run in a pool of long-lived worker
+    processes. Each worker runs one test at a time, and the next test goes to
+    whichever worker becomes idle first. A worker that crashes or exceeds
+    `timeout` is replaced, and its test is reported as a runtime error that
+    includes the stderr the test produced.
+
+    Args:
+        tests: The tests to run.
+        config: The `TestConfig` to run them with.
+        sequential: If True, run the tests in the current process. This makes
+            it easier to attach a debugger, but a crash ends the whole run.
+        verbose: If True, print progress to stderr.
+        num_workers: The number of worker processes. Defaults to about the
+            number of CPUs.
+        timeout: If not None, the maximum number of seconds a single test may
+            take before its worker is killed.
+        durations_path: A JSON file mapping test names to their duration in
+            seconds in previous runs. If given, tests are started longest
+            first, so that slow tests don't end up running alone at the end
+            of the run, and the file is updated with the new durations. Tests
+            without a recorded duration are started first.
+        golden_trace_cache: If not None, a
+            `golden_trace_cache.GoldenTraceCache` to take the golden traces
+            from.
+    Returns:
+        The results of the tests, sorted by name.
+    """
     # Sort the tests to make output nicer.
     tests = list(sorted(tests, key=lambda t: t.unique_name))
-
-    # TODO: If num_processes == 1, then run without any of the multiprocessing
-    # machinery. In theory it should work, but any crash in the testing process
-    # seems to cause a cascade of failures resulting in undecipherable error
-    # messages.
-    if num_processes == 1 or sequential:
-        return [compile_and_run_test(test, config, verbose) for test in tests]
-
-    # This is needed because autograd does not support crossing process
-    # boundaries.
-    torch.autograd.set_grad_enabled(False)
-
-    pool = mp.Pool(num_processes)
-    arg_list = zip(tests, repeat(config))
-    handles = pool.starmap_async(compile_and_run_test, arg_list)
-    results = handles.get()
-
-    tests_with_results = {result.unique_name for result in results}
-    all_tests = {test.unique_name for test in tests}
-    # For processes that are crashed due to compile time or runtime error,
-    # the error outputs are printed out all together but no TestResult is
-    # produced when the process crashed.
-    # TODO: Find a clean way to capture the output from crashed process and
-    # create more detailed runtime_error for those tests.
-    aborted_tests = all_tests - tests_with_results
-    aborted_tests_results = [
-        TestResult(
-            unique_name=aborted_test_name,
-            compilation_error=None,
-            runtime_error=
-            "Testing process terminated. Either the compiler crashed or the compiled code crashed at runtime.\n",
-            trace=None,
-            golden_trace=None) for aborted_test_name in aborted_tests
-    ]
-    results.extend(aborted_tests_results)
-    results.sort(key=lambda result: result.unique_name)
-    return results
+    if sequential:
+        return [
+            compile_and_run_test(test, config, verbose, golden_trace_cache)
+            for test in tests
+        ]
+    if len(tests) == 0:
+        return []
+
+    if num_workers is None:
+        num_workers = _get_default_num_workers(len(tests))
+    num_workers = min(num_workers, len(tests))
+
+    durations = _load_test_durations(durations_path)
+    # Longest first. `sorted` is stable, so ties stay sorted by name.
+    pending = collections.deque(
+        sorted(range(len(tests)),
+               key=lambda i: -durations.get(tests[i].unique_name,
+                                            float("inf"))))
+
+    # Start the resource tracker before forking the workers, so that they
+    # share it with us. Shared memory segments holding results then stay
+    # registered until we have taken them, and are cleaned up if we never do.
+    if os.name == "posix":
+        resource_tracker.ensure_running()
+
+    results: Dict[int, TestResult] = {}
+    with tempfile.TemporaryDirectory(prefix="torch_mlir_e2e_") as stderr_dir:
+
+        def create_worker():
+            return _Worker(tests, config, stderr_dir, verbose,
+                           golden_trace_cache)
+
+        def stderr_path(index):
+            return os.path.join(stderr_dir, f"{index}.stderr")
+
+        workers = [create_worker() for _ in range(num_workers)]
+        try:
+            while pending or any(w.test_index is not None for w in workers):
+                for worker in workers:
+                    if worker.test_index is None and pending:
+                        worker.start_test(pending.popleft())
+                busy = [w for w in workers if w.test_index is not None]
+                wait_timeout = None
+                if timeout is not None:
+                    now = time.monotonic()
+                    wait_timeout = max(
+                        0, min(w.start_time + timeout - now for w in busy))
+                ready = wait([w.conn for w in busy], wait_timeout)
+                for i, worker in enumerate(workers):
+                    index = worker.test_index
+                    if index is None:
+                        continue
+                    test = tests[index]
+                    if worker.conn in ready:
+                        try:
+                            received_index, result, duration, shm_name = \
+                                worker.conn.recv()
+                            assert received_index == index
+                            results[index] = _take_result_from_shared_memory(
+                                result, shm_name)
+                            durations[test.unique_name] = duration
+                            worker.finish_test()
+                            continue
+                        except (EOFError, OSError):
+                            worker.process.join()
+                            reason = (
+                                "Testing process terminated with exit code "
+                                f"{worker.process.exitcode}. Either the "
+                                "compiler crashed or the compiled code "
+                                "crashed at runtime.\n")
+                    elif timeout is not None and \
+                            time.monotonic() - worker.start_time > timeout:
+                        reason = f"Test timed out after {timeout} seconds.\n"
+                    else:
+                        continue
+                    durations[test.unique_name] = \
+                        time.monotonic() - worker.start_time
+                    worker.kill()
+                    results[index] = _make_aborted_test_result(
+                        test, reason, stderr_path(index))
+                    if verbose:
+                        print(f"{test.unique_name}: {reason}",
+                              end="",
+                              file=sys.stderr)
+                    workers[i] = create_worker()
+        finally:
+            for worker in workers:
+                if worker.test_index is None:
+                    worker.shutdown()
+                else:
+                    worker.kill()
+
+    if durations_path is not None:
+        _save_test_durations(durations_path, durations)
+    return [results[i] for i in range(len(tests))]
@@ -0,0 +1,132 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+"""
+An on-disk cache of golden traces.
+
+Golden traces are produced by running the test program eagerly in PyTorch,
+which is deterministic since `TestUtils` resets the random seed. This is
+repeated for every test in every config, so caching them saves a lot of time
+across repeated runs and configs.
+"""
+
+from typing import List, Optional
+
+import functools
+import hashlib
+import inspect
+import os
+import tempfile
+
+import torch
+
+from . import framework
+from .framework import Test, Trace, TraceItem, generate_golden_trace
+
+# Bump this whenever the format of the cache entries changes.
+_CACHE_FORMAT_VERSION = "1"
+
+
+@functools.lru_cache(maxsize=None)
+def hash_source_file(path: str) -> str:
+    """Returns the SHA-256 digest of the file at `path`.
+
+    The result is memoized, so files are expected not to change while the
+    process is running.
+    """
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def get_test_source_files(test: Test) -> Optional[List[str]]:
+    """Returns the source files defining `test`.
+
+    These are the files defining the test program, the test invoker and the
+    test framework (which provides `TestUtils`). Returns None if they can't
+    be determined.
+
+    Other modules that the test program uses, such as helpers shared between
+    files of the `test_suite` package, are not included, so changing them
+    doesn't invalidate cached golden traces. Clear the cache after changing
+    such modules.
+    """
+    try:
+        source_files = {
+            inspect.getsourcefile(test.program_factory),
+            inspect.getsourcefile(test.program_invoker),
+            inspect.getsourcefile(framework),
+        }
+    except TypeError:
+        return None
+    if None in source_files:
+        return None
+    return sorted(source_files)
+
+
+def compute_golden_trace_key(test: Test) -> Optional[str]:
+    """Computes the cache key of the golden trace of `test`.
+
+    The key covers the test name, the PyTorch version and the contents of the
+    source files of the test (see `get_test_source_files`). Returns None if
+    the source files can't be determined, in which case the golden trace
+    should not be cached.
+    """
+    source_files = get_test_source_files(test)
+    if source_files is None:
+        return None
+    h = hashlib.sha256()
+    h.update(_CACHE_FORMAT_VERSION.encode())
+    h.update(test.unique_name.encode())
+    h.update(torch.__version__.encode())
+    for source_file in source_files:
+        h.update(hash_source_file(source_file).encode())
+    return h.hexdigest()
+
+
+class GoldenTraceCache:
+    """A directory of golden traces, keyed by `compute_golden_trace_key`.
+
+    Entries are written with `torch.save` as plain lists, dicts and tensors,
+    so that loading them doesn't depend on the classes of this package.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path_for_key(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".pt")
+
+    def lookup(self, key: str) -> Optional[Trace]:
+        """Returns the golden trace stored under `key`, or None on a miss."""
+        try:
+            entries = torch.load(self._path_for_key(key))
+        except FileNotFoundError:
+            return None
+        return [TraceItem(**entry) for entry in entries]
+
+    def store(self, key: str, trace: Trace):
+        """Stores `trace` under `key`."""
+        # Write to a temporary file and atomically move it into place, since
+        # tests run concurrently in several processes.
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                torch.save([item._asdict() for item in trace], f)
+            os.replace(tmp_path, self._path_for_key(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get_golden_trace(self, test: Test) -> Trace:
+        """Returns the golden trace of `test`, generating and storing it if
+        it isn't in the cache yet."""
+        key = compute_golden_trace_key(test)
+        if key is None:
+            return generate_golden_trace(test)
+        trace = self.lookup(key)
+        if trace is None:
+            trace = generate_golden_trace(test)
+            self.store(key, trace)
+        return trace
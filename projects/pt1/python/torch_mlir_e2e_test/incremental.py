@@ -0,0 +1,187 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+"""
+Incremental test runs.
+
+The result of a test only depends on the source of the test, on the test
+config, on the test framework and on the torch-mlir build. When none of them
+changed since the test last ran, its previous result is reused instead of
+running the test again.
+"""
+
+from typing import List, Optional, Tuple
+
+import functools
+import hashlib
+import os
+import tempfile
+
+import torch
+
+from torch_mlir.compile_cache import compute_build_fingerprint
+
+from .framework import Test, TestConfig, TestResult, TraceItem, run_tests
+from .golden_trace_cache import get_test_source_files, hash_source_file
+
+# Bump this whenever the format of the stored results changes.
+_STORE_FORMAT_VERSION = "2"
+
+
+@functools.lru_cache(maxsize=None)
+def _compute_framework_fingerprint() -> str:
+    """Hashes the sources of this package, except for the test suite itself
+    (whose files are covered per test)."""
+    h = hashlib.sha256()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for root, dirs, files in os.walk(package_dir):
+        dirs.sort()
+        if root == package_dir and "test_suite" in dirs:
+            dirs.remove("test_suite")
+        for file_name in sorted(files):
+            if not file_name.endswith(".py"):
+                continue
+            path = os.path.join(root, file_name)
+            h.update(os.path.relpath(path, package_dir).encode())
+            h.update(hash_source_file(path).encode())
+    return h.hexdigest()
+
+
+def compute_test_fingerprint(test: Test,
+                             config_description: str) -> Optional[str]:
+    """Computes a fingerprint of everything the result of `test` depends on.
+
+    This covers the source files of the test, the sources of the test
+    framework and configs, the torch-mlir build (see
+    `torch_mlir.compile_cache.compute_build_fingerprint`) and
+    `config_description`.
+
+    Args:
+        test: The test.
+        config_description: A string describing the config the test is run
+            with and its options, e.g. the name of the config and the
+            optimization level of the backend.
+    Returns:
+        The fingerprint, or None if the source files of the test can't be
+        determined.
+    """
+    source_files = get_test_source_files(test)
+    if source_files is None:
+        return None
+    h = hashlib.sha256()
+    h.update(_STORE_FORMAT_VERSION.encode())
+    h.update(test.unique_name.encode())
+    h.update(config_description.encode())
+    h.update(compute_build_fingerprint().encode())
+    h.update(_compute_framework_fingerprint().encode())
+    for source_file in source_files:
+        h.update(hash_source_file(source_file).encode())
+    return h.hexdigest()
+
+
+def _trace_to_plain(trace):
+    if trace is None:
+        return None
+    return [item._asdict() for item in trace]
+
+
+def _trace_from_plain(trace):
+    if trace is None:
+        return None
+    return [TraceItem(**item) for item in trace]
+
+
+class TestResultStore:
+    """A directory holding the latest result of each test.
+
+    Each result is stored together with the fingerprint it was produced
+    with (see `compute_test_fingerprint`), and is only returned by `lookup`
+    for the same fingerprint.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def _path_for_test(self, unique_name: str) -> str:
+        return os.path.join(self.store_dir, unique_name + ".pt")
+
+    def lookup(self, unique_name: str,
+               fingerprint: str) -> Optional[TestResult]:
+        """Returns the stored result of the test if it was produced with
+        `fingerprint`, or None otherwise."""
+        try:
+            entry = torch.load(self._path_for_test(unique_name))
+        except FileNotFoundError:
+            return None
+        if entry["fingerprint"] != fingerprint:
+            return None
+        result = entry["result"]
+        result["trace"] = _trace_from_plain(result["trace"])
+        result["golden_trace"] = _trace_from_plain(result["golden_trace"])
+        return TestResult(**result)
+
+    def store(self, result: TestResult, fingerprint: str):
+        """Stores `result`, replacing any previous result of the test."""
+        entry = {
+            "fingerprint": fingerprint,
+            "result": result._replace(
+                trace=_trace_to_plain(result.trace),
+                golden_trace=_trace_to_plain(result.golden_trace))._asdict(),
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                torch.save(entry, f)
+            os.replace(tmp_path, self._path_for_test(result.unique_name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def run_tests_incrementally(tests: List[Test], config: TestConfig,
+                            config_description: str, store: TestResultStore,
+                            **kwargs) -> Tuple[List[TestResult], List[str]]:
+    """Like `framework.run_tests`, but reuses the results stored in `store`
+    for tests whose fingerprint is unchanged.
+
+    Args:
+        tests: The tests to run.
+        config: The config to run them with.
+        config_description: See `compute_test_fingerprint`.
+        store: The store to take previous results from and to record the
+            new results in.
+        **kwargs: Forwarded to `framework.run_tests`.
+    Returns:
+        The results of all tests, sorted by name, and the names of the tests
+        whose result was reused.
+
+    The results of tests that crashed or timed out (see
+    `TestResult.aborted`) are not stored, so those tests run again next time.
+    """
+    fingerprints = {
+        test.unique_name: compute_test_fingerprint(test, config_description)
+        for test in tests
+    }
+    reused_results = []
+    tests_to_run = []
+    for test in tests:
+        fingerprint = fingerprints[test.unique_name]
+        result = None
+        if fingerprint is not None:
+            result = store.lookup(test.unique_name, fingerprint)
+        if result is None:
+            tests_to_run.append(test)
+        else:
+            reused_results.append(result)
+
+    new_results = run_tests(tests_to_run, config, **kwargs)
+    for result in new_results:
+        fingerprint = fingerprints[result.unique_name]
+        if fingerprint is not None and not result.aborted:
+            store.store(result, fingerprint)
+
+    results = sorted(reused_results + new_results,
+                     key=lambda result: result.unique_name)
+    return results, sorted(result.unique_name for result in reused_results)
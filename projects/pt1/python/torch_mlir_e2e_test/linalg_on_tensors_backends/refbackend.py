@@ -4,6 +4,9 @@
 # Also available under a BSD-style license. See LICENSE.
 
 import ctypes
+import threading
+from typing import List, Optional, Sequence, Tuple, Union
+
 import numpy as np
 
 from torch_mlir.ir import *
@@ -78,33 +81,86 @@ def get_ctype_func(func_name):
     return ctypes.CFUNCTYPE(*ctypes_arg), ret_types
 
 
-class RefBackendInvoker:
+def get_entry_point_funcs(module):
+    """Returns the names of the functions that can be invoked on `module`."""
+    entry_points = []
+    with module.context:
+        for func in module.body:
+            if "sym_name" not in func.attributes:
+                continue
+            func_name = str(func.attributes["sym_name"]).replace('"', '')
+            if func_name.startswith(CONSUME_RETURN_FUNC_PREFIX):
+                continue
+            # Only defined functions are entry points. External declarations
+            # (such as the consume functions) have an empty body.
+            if len(func.regions) == 0 or len(func.regions[0].blocks) == 0:
+                continue
+            entry_points.append(func_name)
+    return entry_points
 
-    def __init__(self, module):
-        self.ee = ExecutionEngine(module)
+
+class RefBackendInvoker:
+    """Invokes the functions of a module loaded into an `ExecutionEngine`.
+
+    Results are handed back by the compiled code through the
+    `refbackend_consume_func_return_*` callbacks. They are stored in a
+    thread-local slot, so that one invoker (and its `ExecutionEngine`) can
+    be shared by many threads. The compiled code is called through ctypes,
+    which releases the GIL for the duration of the call, so kernels invoked
+    from different threads run concurrently.
+    """
+
+    def __init__(self,
+                 module,
+                 enable_object_dump: bool = False,
+                 opt_level: int = 2,
+                 shared_libs: Optional[List[str]] = None):
+        self._thread_local = threading.local()
+        self.ee = ExecutionEngine(module,
+                                  opt_level=opt_level,
+                                  shared_libs=shared_libs or [],
+                                  enable_object_dump=enable_object_dump)
         self.result = None
+        # The ExecutionEngine only holds the raw function pointers, so keep
+        # the ctypes callback objects alive for the lifetime of the invoker.
+        self._return_callbacks = []
 
         return_funcs = get_return_funcs(module)
 
         for ret_func in return_funcs:
             ctype_wrapper, ret_types = get_ctype_func(ret_func)
 
-            def consume_return_funcs(*args):
-                self.result = tuple([
+            def consume_return_funcs(*args, ret_types=ret_types):
+                result = tuple([
                     arg if type in elemental_type_to_ctype
                     else unranked_memref_to_numpy(
                         arg, memref_type_to_np_dtype[type])
                     for arg, type in zip(args, ret_types)
                 ])
-                if len(self.result) == 1:
-                    self.result = self.result[0]
+                if len(result) == 1:
+                    result = result[0]
+                self.result = result
+
+            callback = ctype_wrapper(consume_return_funcs)
+            self._return_callbacks.append(callback)
+            self.ee.register_runtime(ret_func, callback)
+
+    @property
+    def result(self):
+        """The result of the last invocation on the current thread."""
+        return getattr(self._thread_local, "result", None)
 
-            self.ee.register_runtime(ret_func,
-                                     ctype_wrapper(consume_return_funcs))
+    @result.setter
+    def result(self, value):
+        self._thread_local.result = value
 
     def __getattr__(self, function_name: str):
+        func = None
 
         def invoke(*args):
+            nonlocal func
+            if func is None:
+                func = self.ee.lookup(function_name)
             ffi_args = []
             for arg in args:
                 assert_arg_type_is_supported(arg.dtype)
@@ -112,16 +168,185 @@ class RefBackendInvoker:
                     ctypes.pointer(
                         ctypes.pointer(get_unranked_memref_descriptor(arg))))
 
-            self.ee.invoke(function_name, *ffi_args)
+            packed_args = (ctypes.c_void_p * len(ffi_args))()
+            for i, ffi_arg in enumerate(ffi_args):
+                packed_args[i] = ctypes.cast(ffi_arg, ctypes.c_void_p)
+            func(packed_args)
             result = self.result
             assert result is not None, "Invocation didn't produce a result"
             self.result = None
             return result
 
+        # Cache the closure (and with it the resolved function pointer) so
+        # that later accesses don't go through `__getattr__` again.
+        setattr(self, function_name, invoke)
         return invoke
 
+    def prepare(self, function_name: str,
+                arg_specs: Sequence[Union[np.ndarray, "ArgSpec"]]
+                ) -> "PreparedCall":
+        """Prepares repeated calls to `function_name` with fixed arg shapes.
+
+        Args:
+            function_name: The function to call.
+            arg_specs: For each argument, either an example numpy array or a
+                `(shape, dtype)` tuple.
+        Returns:
+            A `PreparedCall` that can be invoked like the function itself.
+        """
+        return PreparedCall(self, function_name, arg_specs)
+
+
+# The shape and numpy dtype of an argument of a `PreparedCall`.
+ArgSpec = Tuple[Sequence[int], np.dtype]
+
+
+def _make_rebindable_memref_descriptor(rank: int):
+    """Creates a ranked memref descriptor type with untyped data pointers.
+
+    The layout matches `make_nd_memref_descriptor` (or
+    `make_zero_d_memref_descriptor` for rank 0), but the aligned pointer is a
+    plain `c_void_p`, so that it can be rebound to a new buffer from an
+    integer address without creating a new ctypes pointer object.
+    """
+    fields = [
+        ("allocated", ctypes.c_longlong),
+        ("aligned", ctypes.c_void_p),
+        ("offset", ctypes.c_longlong),
+    ]
+    if rank > 0:
+        fields += [
+            ("shape", ctypes.c_longlong * rank),
+            ("strides", ctypes.c_longlong * rank),
+        ]
+
+    class RebindableMemRefDescriptor(ctypes.Structure):
+        _fields_ = fields
+
+    return RebindableMemRefDescriptor
+
+
+class _CallStructures:
+    """The memref descriptors and packed argument array of a `PreparedCall`
+    for one thread."""
+
+    def __init__(self, shapes: Sequence[Tuple[int, ...]]):
+        self.descriptors = []
+        # Keeps the ctypes objects referenced from `packed_args` alive.
+        self._keep_alive = []
+        self.packed_args = (ctypes.c_void_p * len(shapes))()
+        for i, shape in enumerate(shapes):
+            descriptor = _make_rebindable_memref_descriptor(len(shape))()
+            descriptor.offset = 0
+            if len(shape) > 0:
+                # Row-major strides, in elements.
+                strides = [1] * len(shape)
+                for d in reversed(range(len(shape) - 1)):
+                    strides[d] = strides[d + 1] * shape[d + 1]
+                descriptor.shape[:] = shape
+                descriptor.strides[:] = strides
+            unranked = UnrankedMemRefDescriptor()
+            unranked.rank = len(shape)
+            unranked.descriptor = ctypes.cast(ctypes.pointer(descriptor),
+                                              ctypes.c_void_p)
+            unranked_ptr_ptr = ctypes.pointer(ctypes.pointer(unranked))
+            self.packed_args[i] = ctypes.cast(unranked_ptr_ptr,
+                                              ctypes.c_void_p)
+            self.descriptors.append(descriptor)
+            self._keep_alive.append((unranked, unranked_ptr_ptr))
+
+
+class PreparedCall:
+    """A call to a RefBackend function with preallocated calling structures.
+
+    The function pointer is resolved once, and the memref descriptors for the
+    arguments are allocated and filled in once per thread. Each call only
+    rebinds the data pointers of the descriptors to the buffers of the given
+    arguments. Arguments must therefore have exactly the shapes and dtypes
+    the call was prepared with, and be C-contiguous.
+
+    Like `RefBackendInvoker`, a `PreparedCall` can be invoked from several
+    threads concurrently: each thread rebinds its own descriptors.
+
+    Results can optionally be copied into caller-provided output buffers with
+    the `out=` keyword argument, which avoids handing out views of memory
+    owned by the compiled code.
+    """
+
+    def __init__(self, invoker: RefBackendInvoker, function_name: str,
+                 arg_specs: Sequence[Union[np.ndarray, ArgSpec]]):
+        self._invoker = invoker
+        self._func = invoker.ee.lookup(function_name)
+        self._function_name = function_name
+        self._shapes = []
+        self._dtypes = []
+        for spec in arg_specs:
+            if isinstance(spec, np.ndarray):
+                shape, dtype = spec.shape, spec.dtype
+            else:
+                shape, dtype = spec
+            dtype = np.dtype(dtype)
+            assert_arg_type_is_supported(dtype)
+            self._shapes.append(tuple(shape))
+            self._dtypes.append(dtype)
+        self._thread_local = threading.local()
+        # Allocate the structures of the preparing thread eagerly, so that
+        # single-threaded callers don't pay for it on the first call.
+        self._thread_local.structures = _CallStructures(self._shapes)
+
+    def _get_call_structures(self) -> _CallStructures:
+        structures = getattr(self._thread_local, "structures", None)
+        if structures is None:
+            structures = _CallStructures(self._shapes)
+            self._thread_local.structures = structures
+        return structures
+
+    def __call__(self, *args, out=None):
+        """Invokes the function.
 
-LOWERING_PIPELINE = "builtin.module(" + ",".join([
+        Args:
+            args: The numpy arrays to pass. They must match the specs that the
+                call was prepared with.
+            out: Optionally, a numpy array (or a tuple of numpy arrays for
+                multiple results) that the results are copied into.
+        Returns:
+            The results of the call, or `out` if it was given.
+        """
+        if len(args) != len(self._shapes):
+            raise ValueError(
+                f"Expected {len(self._shapes)} arguments for prepared "
+                f"call to '{self._function_name}' but got {len(args)}")
+        structures = self._get_call_structures()
+        for i, (arg, descriptor) in enumerate(
+                zip(args, structures.descriptors)):
+            if arg.shape != self._shapes[i] or arg.dtype != self._dtypes[i]:
+                raise ValueError(
+                    f"Argument #{i} of prepared call to "
+                    f"'{self._function_name}' has shape {arg.shape} and dtype "
+                    f"{arg.dtype}, but the call was prepared for shape "
+                    f"{self._shapes[i]} and dtype {self._dtypes[i]}")
+            if not arg.flags.c_contiguous:
+                raise ValueError(
+                    f"Argument #{i} of prepared call to "
+                    f"'{self._function_name}' must be C-contiguous")
+            data = arg.ctypes.data
+            descriptor.allocated = data
+            descriptor.aligned = data
+        self._func(structures.packed_args)
+        result = self._invoker.result
+        assert result is not None, "Invocation didn't produce a result"
+        self._invoker.result = None
+        if out is None:
+            return result
+        if isinstance(out, tuple):
+            for o, r in zip(out, result):
+                np.copyto(o, r)
+        else:
+            np.copyto(out, result)
+        return out
+
+
+LOWERING_PASSES = [
     "func.func(refback-generalize-tensor-pad)",
     # Apply some optimizations. It would be great if MLIR had more useful
     # optimizations that worked out of the box here.
@@ -173,14 +398,86 @@ LOWERING_PIPELINE = "builtin.module(" + ",".join([
     "convert-cf-to-llvm",
     "convert-complex-to-llvm",
     "reconcile-unrealized-casts",
-]) + ")"
+]
+
+LOWERING_PIPELINE = "builtin.module(" + ",".join(LOWERING_PASSES) + ")"
+
+
+def get_lowering_pipeline(optimization_level: int = 0) -> str:
+    """Returns the RefBackend lowering pipeline for `optimization_level`.
+
+    Level 0 is `LOWERING_PIPELINE`, which lowers linalg ops straight to scalar
+    loops. Higher levels are opt-in performance pipelines:
+    - Level 1 lowers linalg ops to affine loops, tiles them for locality and
+      vectorizes the innermost loops.
+    - Level 2 additionally turns the outer loops into `scf.parallel` loops
+      and lowers those to OpenMP. The resulting code requires an OpenMP
+      runtime library to be loaded into the ExecutionEngine.
+    """
+    if optimization_level == 0:
+        return LOWERING_PIPELINE
+    if optimization_level not in (1, 2):
+        raise ValueError(
+            f"Unsupported RefBackend optimization level: {optimization_level}")
+    passes = []
+    seen_lower_affine = False
+    seen_expand_strided_metadata = False
+    for p in LOWERING_PASSES:
+        if p == "func.func(convert-linalg-to-loops)":
+            passes += [
+                "func.func(convert-linalg-to-affine-loops)",
+                "func.func(affine-loop-tile{tile-size=32})",
+                "func.func(affine-super-vectorize{virtual-vector-size=8})",
+            ]
+            if optimization_level >= 2:
+                passes.append("func.func(affine-parallelize)")
+            continue
+        if p == "convert-scf-to-cf" and optimization_level >= 2:
+            passes.append("convert-scf-to-openmp")
+        if p == "expand-strided-metadata" and not seen_expand_strided_metadata:
+            seen_expand_strided_metadata = True
+            passes.append("convert-vector-to-llvm")
+        if p == "reconcile-unrealized-casts" and optimization_level >= 2:
+            passes.append("convert-openmp-to-llvm")
+        passes.append(p)
+        if p == "func.func(lower-affine)" and not seen_lower_affine:
+            seen_lower_affine = True
+            # The vectorizer produces `vector.transfer_*` ops, which need to
+            # be lowered before the loops are converted to the CFG.
+            passes.append("func.func(convert-vector-to-scf)")
+    return "builtin.module(" + ",".join(passes) + ")"
+
+
+# The LLVM optimization level used by the ExecutionEngine at each RefBackend
+# optimization level.
+_EXECUTION_ENGINE_OPT_LEVELS = {0: 2, 1: 3, 2: 3}
 
 
 class RefBackendLinalgOnTensorsBackend(LinalgOnTensorsBackend):
     """Main entry-point for the reference backend."""
 
-    def __init__(self):
+    def __init__(self,
+                 optimization_level: int = 0,
+                 shared_libs: Optional[List[str]] = None):
+        """Create a RefBackend.
+
+        Args:
+          optimization_level: Selects the lowering pipeline, see
+            `get_lowering_pipeline`. Level 0 (the default) is the simple
+            reference pipeline, higher levels tile, vectorize and parallelize
+            the code and compile it with a higher LLVM optimization level.
+          shared_libs: Shared libraries to load into the ExecutionEngine. At
+            optimization level 2 this must include an OpenMP runtime (such as
+            `libomp.so`).
+        """
         super().__init__()
+        self.lowering_pipeline = get_lowering_pipeline(optimization_level)
+        if optimization_level >= 2 and not shared_libs:
+            raise ValueError(
+                "RefBackend optimization level 2 requires an OpenMP runtime "
+                "library to be passed in `shared_libs`")
+        self.optimization_level = optimization_level
+        self.shared_libs = shared_libs
 
     def compile(self, imported_module: Module):
         """Compiles an imported module, with a flat list of functions.
@@ -197,10 +494,51 @@ class RefBackendLinalgOnTensorsBackend(LinalgOnTensorsBackend):
         """
 
         run_pipeline_with_repro_report(
-            imported_module, LOWERING_PIPELINE,
+            imported_module, self.lowering_pipeline,
             "Lowering Linalg-on-Tensors IR to LLVM with RefBackend")
         return imported_module
 
     def load(self, module) -> RefBackendInvoker:
         """Loads a compiled artifact into the runtime."""
-        return RefBackendInvoker(module)
+        return RefBackendInvoker(
+            module,
+            opt_level=_EXECUTION_ENGINE_OPT_LEVELS[self.optimization_level],
+            shared_libs=self.shared_libs)
+
+    def save(self,
+             artifact: Module,
+             path: str,
+             object_file_path: Optional[str] = None):
+        """Persists a compiled artifact to disk.
+
+        The LLVM-dialect module produced by `compile` is written to `path` as
+        MLIR bytecode, which `load_from_path` can load without re-running the
+        lowering pipeline.
+
+        Args:
+          artifact: A compiled artifact produced by `compile`.
+          path: The file to write the bytecode to.
+          object_file_path: If given, the module is also JIT-compiled to
+            native code, and the resulting object file is written to this
+            path. This is useful for ahead-of-time linking of the kernels
+            with external tooling.
+        """
+        with open(path, "wb") as f:
+            artifact.operation.write_bytecode(f)
+        if object_file_path is not None:
+            invoker = RefBackendInvoker(
+                artifact,
+                enable_object_dump=True,
+                opt_level=_EXECUTION_ENGINE_OPT_LEVELS[self.optimization_level],
+                shared_libs=self.shared_libs)
+            # Code generation is lazy, so make sure that every entry point has
+            # been materialized before dumping the object file.
+            for func_name in get_entry_point_funcs(artifact):
+                invoker.ee.raw_lookup(func_name)
+            invoker.ee.dump_to_object_file(object_file_path)
+
+    def load_from_path(self, path: str) -> RefBackendInvoker:
+        """Loads a compiled artifact that was persisted with `save`."""
+        with open(path, "rb") as f:
+            module = Module.parse(f.read(), context=Context())
+        return self.load(module)
@@ -7,7 +7,7 @@ from typing import Callable
 
 import torch
 
-from .framework import Test
+from .framework import DEFAULT_ATOL, DEFAULT_RTOL, Test
 
 # The global registry of tests.
 GLOBAL_TEST_REGISTRY = []
@@ -15,13 +15,16 @@ GLOBAL_TEST_REGISTRY = []
 _SEEN_UNIQUE_NAMES = set()
 
 
-def register_test_case(module_factory: Callable[[], torch.nn.Module]):
+def register_test_case(module_factory: Callable[[], torch.nn.Module],
+                       rtol: float = DEFAULT_RTOL,
+                       atol: float = DEFAULT_ATOL):
     """Convenient decorator-based test registration.
 
     Adds a `framework.Test` to the global test registry based on the decorated
     function. The test's `unique_name` is taken from the function name, the
     test's `program_factory` is taken from `module_factory`, and the
-    `program_invoker` is the decorated function.
+    `program_invoker` is the decorated function. `rtol` and `atol` are the
+    tolerances used to compare output tensors against the golden trace.
     """
     def decorator(f):
         # Ensure that there are no duplicate names in the global test registry.
@@ -34,7 +37,9 @@ def register_test_case(module_factory: Callable[[], torch.nn.Module]):
         GLOBAL_TEST_REGISTRY.append(
             Test(unique_name=f.__name__,
                  program_factory=module_factory,
-                 program_invoker=f))
+                 program_invoker=f,
+                 rtol=rtol,
+                 atol=atol))
         return f
 
     return decorator
@@ -6,23 +6,35 @@
 Utilities for reporting the results of the test framework.
 """
 
-from typing import Any, List, Optional, Set
+from typing import Any, List, Optional, Set, Tuple
 
 import collections
 import io
+import math
 import textwrap
 
 import torch
 
-from .framework import TestResult, TraceItem
+from .framework import DEFAULT_ATOL, DEFAULT_RTOL, TestResult, TraceItem
+
+# The number of elements that `TensorComparison` processes at a time. This
+# bounds the memory of the float64 temporaries for large tensors.
+_COMPARISON_CHUNK_SIZE = 1 << 20
 
 
 class TensorSummary:
     """A summary of a tensor's contents."""
-    def __init__(self, tensor):
-        self.min = torch.min(tensor.type(torch.float64))
-        self.max = torch.max(tensor.type(torch.float64))
-        self.mean = torch.mean(tensor.type(torch.float64))
+    def __init__(self, tensor, min=None, max=None, mean=None):
+        """Summarize `tensor`.
+
+        `min`, `max` and `mean` can be passed if they were already computed
+        (e.g. by `TensorComparison`), to avoid another pass over the data.
+        """
+        if min is None or max is None or mean is None:
+            min, max, mean = _compute_stats(tensor)
+        self.min = min
+        self.max = max
+        self.mean = mean
         self.shape = list(tensor.shape)
         self.dtype = tensor.dtype
 
@@ -30,6 +42,126 @@ class TensorSummary:
         return f'Tensor with shape={self.shape}, dtype={self.dtype}, min={self.min:+0.4}, max={self.max:+0.4}, mean={self.mean:+0.4}'
 
 
+def _compute_stats(tensor: torch.Tensor) -> Tuple[float, float, float]:
+    flat = tensor.reshape(-1)
+    min, max, total = math.inf, -math.inf, 0.0
+    for start in range(0, flat.numel(), _COMPARISON_CHUNK_SIZE):
+        chunk = flat[start:start + _COMPARISON_CHUNK_SIZE].to(torch.float64)
+        min = _nan_aware_min(min, chunk.min().item())
+        max = _nan_aware_max(max, chunk.max().item())
+        total += chunk.sum().item()
+    mean = total / flat.numel() if flat.numel() else math.nan
+    return min, max, mean
+
+
+def _nan_aware_min(a: float, b: float) -> float:
+    # Like `torch.min`, propagate NaN's.
+    return math.nan if math.isnan(a) or math.isnan(b) else min(a, b)
+
+
+def _nan_aware_max(a: float, b: float) -> float:
+    return math.nan if math.isnan(a) or math.isnan(b) else max(a, b)
+
+
+class TensorComparison:
+    """An elementwise comparison of a tensor against a golden tensor.
+
+    Elements are considered close with the same criterion as
+    `torch.allclose(value, golden, rtol, atol, equal_nan=True)`. In the same
+    pass over the data, this computes the number of mismatching elements,
+    the maximum absolute and relative errors, the index of the first
+    mismatching element, and the min/max/mean of both tensors. The tensors
+    are processed in chunks, so that the float64 temporaries stay small for
+    large tensors.
+
+    Both tensors must have the same shape.
+    """
+    def __init__(self, value: torch.Tensor, golden: torch.Tensor,
+                 rtol: float, atol: float):
+        assert value.shape == golden.shape
+        if golden.is_complex():
+            # Compare the real and imaginary parts separately.
+            value = torch.view_as_real(value.resolve_conj())
+            golden = torch.view_as_real(golden.resolve_conj())
+        self.rtol = rtol
+        self.atol = atol
+        self.numel = golden.numel()
+        self.num_mismatches = 0
+        self.max_abs_error = 0.0
+        self.max_rel_error = 0.0
+        self.first_mismatch_index: Optional[Tuple[int, ...]] = None
+        value_min, value_max, value_total = math.inf, -math.inf, 0.0
+        golden_min, golden_max, golden_total = math.inf, -math.inf, 0.0
+
+        value_flat = value.reshape(-1)
+        golden_flat = golden.reshape(-1)
+        for start in range(0, self.numel, _COMPARISON_CHUNK_SIZE):
+            end = start + _COMPARISON_CHUNK_SIZE
+            v = value_flat[start:end].to(torch.float64)
+            g = golden_flat[start:end].to(torch.float64)
+
+            value_min = _nan_aware_min(value_min, v.min().item())
+            value_max = _nan_aware_max(value_max, v.max().item())
+            value_total += v.sum().item()
+            golden_min = _nan_aware_min(golden_min, g.min().item())
+            golden_max = _nan_aware_max(golden_max, g.max().item())
+            golden_total += g.sum().item()
+
+            # Equal infinities and NaN's have no error, even though their
+            # difference is NaN.
+            equal = (v == g) | (v.isnan() & g.isnan())
+            abs_error = (v - g).abs_().masked_fill_(equal, 0)
+            # Any remaining NaN comes from a NaN or infinity in only one of
+            # the tensors, which we report as an infinite error.
+            abs_error.nan_to_num_(nan=math.inf, posinf=math.inf)
+            abs_golden = g.abs()
+            # Like `torch.isclose`, an infinite error is never close.
+            close = equal | ((abs_error <= atol + rtol * abs_golden) &
+                             abs_error.isfinite())
+            # An infinite error against an infinite golden value is an
+            # infinite relative error too, rather than NaN.
+            rel_error = (abs_error / abs_golden).masked_fill_(
+                abs_error == 0, 0).nan_to_num_(nan=math.inf)
+            self.max_abs_error = max(self.max_abs_error,
+                                     abs_error.max().item())
+            self.max_rel_error = max(self.max_rel_error,
+                                     rel_error.max().item())
+            mismatches = ~close
+            num_mismatches = int(mismatches.sum().item())
+            if num_mismatches == 0:
+                continue
+            if self.first_mismatch_index is None:
+                flat_index = start + int(mismatches.nonzero()[0].item())
+                self.first_mismatch_index = _unravel_index(
+                    flat_index, golden.shape)
+            self.num_mismatches += num_mismatches
+
+        numel = self.numel if self.numel else math.nan
+        self.value_summary = TensorSummary(value, value_min, value_max,
+                                           value_total / numel)
+        self.golden_summary = TensorSummary(golden, golden_min, golden_max,
+                                            golden_total / numel)
+
+    @property
+    def failed(self):
+        return self.num_mismatches != 0
+
+    def error_str(self):
+        return (f'{self.num_mismatches} of {self.numel} elements are not '
+                f'close (rtol={self.rtol}, atol={self.atol}), '
+                f'max abs error={self.max_abs_error:0.4}, '
+                f'max rel error={self.max_rel_error:0.4}, '
+                f'first mismatch at index {list(self.first_mismatch_index)}')
+
+
+def _unravel_index(flat_index: int, shape) -> Tuple[int, ...]:
+    index = []
+    for size in reversed(shape):
+        index.append(flat_index % size)
+        flat_index //= size
+    return tuple(reversed(index))
+
+
 class ErrorContext:
     """A chained list of error contexts.
 
@@ -58,10 +190,17 @@ class ErrorContext:
 class ValueReport:
     """A report for a single value processed by the program.
     """
-    def __init__(self, value, golden_value, context: ErrorContext):
+    def __init__(self,
+                 value,
+                 golden_value,
+                 context: ErrorContext,
+                 rtol: float = DEFAULT_RTOL,
+                 atol: float = DEFAULT_ATOL):
         self.value = value
         self.golden_value = golden_value
         self.context = context
+        self.rtol = rtol
+        self.atol = atol
         self.failure_reasons = []
         self._evaluate_outcome()
 
@@ -106,7 +245,8 @@ class ValueReport:
                     f'value ({len(value)!r}) is not equal to golden value ({len(golden)!r})'
                 )
             reports = [
-                ValueReport(v, g, self.context.chain(f'tuple element {i}'))
+                ValueReport(v, g, self.context.chain(f'tuple element {i}'),
+                            self.rtol, self.atol)
                 for i, (v, g) in enumerate(zip(value, golden))
             ]
             for report in reports:
@@ -121,7 +261,8 @@ class ValueReport:
                     f'value ({len(value)!r}) is not equal to golden value ({len(golden)!r})'
                 )
             reports = [
-                ValueReport(v, g, self.context.chain(f'list element {i}'))
+                ValueReport(v, g, self.context.chain(f'list element {i}'),
+                            self.rtol, self.atol)
                 for i, (v, g) in enumerate(zip(value, golden))
             ]
             for report in reports:
@@ -139,7 +280,8 @@ class ValueReport:
                 )
             reports = [
                 ValueReport(value[k], golden[k],
-                            self.context.chain(f'dict element at key {k!r}'))
+                            self.context.chain(f'dict element at key {k!r}'),
+                            self.rtol, self.atol)
                 for k in gkeys
             ]
             for report in reports:
@@ -158,9 +300,11 @@ class ValueReport:
                 return self._record_failure(
                     f'dtype ({value.dtype}) is not equal to golden dtype ({golden.dtype})'
                 )
-            if not torch.allclose(value, golden, rtol=1e-03, atol=1e-07, equal_nan=True):
+            comparison = TensorComparison(value, golden, self.rtol, self.atol)
+            if comparison.failed:
                 return self._record_failure(
-                    f'value ({TensorSummary(value)}) is not close to golden value ({TensorSummary(golden)})'
+                    f'value ({comparison.value_summary}) is not close to golden value ({comparison.golden_summary})\n'
+                    f'{comparison.error_str()}'
                 )
             return
         return self._record_failure(
@@ -180,11 +324,17 @@ class TraceItemReport:
     """A report for a single trace item."""
     failure_reasons: List[str]
 
-    def __init__(self, item: TraceItem, golden_item: TraceItem,
-                 context: ErrorContext):
+    def __init__(self,
+                 item: TraceItem,
+                 golden_item: TraceItem,
+                 context: ErrorContext,
+                 rtol: float = DEFAULT_RTOL,
+                 atol: float = DEFAULT_ATOL):
         self.item = item
         self.golden_item = golden_item
         self.context = context
+        self.rtol = rtol
+        self.atol = atol
         self.failure_reasons = []
         self._evaluate_outcome()
 
@@ -211,12 +361,14 @@ class TraceItemReport:
             value_report = ValueReport(
                 input, golden_input,
                 self.context.chain(
-                    f'input #{i} of call to "{self.item.symbol}"'))
+                    f'input #{i} of call to "{self.item.symbol}"'),
+                self.rtol, self.atol)
             if value_report.failed:
                 self.failure_reasons.append(value_report.error_str())
         value_report = ValueReport(
             self.item.output, self.golden_item.output,
-            self.context.chain(f'output of call to "{self.item.symbol}"'))
+            self.context.chain(f'output of call to "{self.item.symbol}"'),
+            self.rtol, self.atol)
         if value_report.failed:
             self.failure_reasons.append(value_report.error_str())
 
@@ -237,7 +389,8 @@ class SingleTestReport:
                     TraceItemReport(
                         item, golden_item,
                         context.chain(
-                            f'trace item #{i} - call to "{item.symbol}"')))
+                            f'trace item #{i} - call to "{item.symbol}"'),
+                        result.rtol, result.atol))
 
     @property
     def failed(self):
@@ -0,0 +1,195 @@
+# Part of the LLVM Project, under the Apache License v2.0 with LLVM Exceptions.
+# See https://llvm.org/LICENSE.txt for license information.
+# SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+# Also available under a BSD-style license. See LICENSE.
+"""
+An on-disk format for traces.
+
+A trace is stored as a directory holding two files:
+- `manifest.json`: The format version, and the symbol, inputs and output of
+  each trace item. Tensors are described by their dtype, shape and the
+  offset of their data in `tensors.bin`.
+- `tensors.bin`: The raw, contiguous data of all tensors, each starting at a
+  multiple of 64 bytes.
+
+Loading a trace memory-maps `tensors.bin`, so tensor data is only read from
+disk when it is used. This allows replaying traces that are much larger than
+the available memory.
+
+Traces of real workloads can be captured with `record_trace`:
+```python
+with record_trace(model, "/tmp/my_trace") as traced_model:
+    for batch in dataset:
+        traced_model.forward(batch)
+```
+"""
+
+from contextlib import contextmanager
+from typing import Any, Dict
+
+import json
+import os
+
+import numpy as np
+import torch
+
+from .framework import Trace, TraceItem, TorchScriptValue, _Tracer
+
+# The format written by this module. Bump this when the format changes in a
+# way that older readers can't handle.
+TRACE_FORMAT_VERSION = 1
+
+_MANIFEST_FILE_NAME = "manifest.json"
+_TENSORS_FILE_NAME = "tensors.bin"
+_TENSOR_ALIGNMENT = 64
+
+
+def _dtype_to_str(dtype: torch.dtype) -> str:
+    return str(dtype).split(".")[1]
+
+
+def _str_to_dtype(s: str) -> torch.dtype:
+    dtype = getattr(torch, s, None)
+    if not isinstance(dtype, torch.dtype):
+        raise ValueError(f"Unknown tensor dtype in trace: '{s}'")
+    return dtype
+
+
+class TraceWriter:
+    """Writes a trace to a directory, one item at a time.
+
+    Tensor data is written out as items are appended, so only the manifest
+    is held in memory. The trace is complete once `close` is called.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._tensors_file = open(os.path.join(path, _TENSORS_FILE_NAME),
+                                  "wb")
+        self._items = []
+
+    def _encode(self, v: TorchScriptValue) -> Any:
+        if isinstance(v, torch.Tensor):
+            t = v.detach().cpu().contiguous()
+            offset = self._tensors_file.tell()
+            padding = -offset % _TENSOR_ALIGNMENT
+            self._tensors_file.write(b"\0" * padding)
+            offset += padding
+            # Viewing the data as bytes avoids any dtype-specific conversion
+            # (e.g. bfloat16 has no numpy equivalent).
+            self._tensors_file.write(
+                t.reshape(-1).view(torch.uint8).numpy().tobytes())
+            return {
+                "tensor": {
+                    "dtype": _dtype_to_str(t.dtype),
+                    "shape": list(t.shape),
+                    "offset": offset,
+                }
+            }
+        if isinstance(v, tuple):
+            return {"tuple": [self._encode(field) for field in v]}
+        if isinstance(v, list):
+            return {"list": [self._encode(item) for item in v]}
+        if isinstance(v, dict):
+            return {
+                "dict": [[self._encode(key), self._encode(val)]
+                         for key, val in v.items()]
+            }
+        if v is None or isinstance(v, (bool, int, float, str)):
+            return {"scalar": v}
+        raise TypeError(
+            f"Unsupported value of type `{v.__class__.__name__}` in trace")
+
+    def append(self, item: TraceItem):
+        """Appends `item` to the trace."""
+        self._items.append({
+            "symbol": item.symbol,
+            "inputs": [self._encode(input) for input in item.inputs],
+            "output": self._encode(item.output),
+        })
+
+    def close(self):
+        """Writes the manifest, completing the trace."""
+        self._tensors_file.close()
+        manifest = {
+            "version": TRACE_FORMAT_VERSION,
+            "items": self._items,
+        }
+        with open(os.path.join(self.path, _MANIFEST_FILE_NAME), "w") as f:
+            json.dump(manifest, f)
+
+
+def save_trace(trace: Trace, path: str):
+    """Saves `trace` to the directory `path`."""
+    writer = TraceWriter(path)
+    for item in trace:
+        writer.append(item)
+    writer.close()
+
+
+def load_trace(path: str) -> Trace:
+    """Loads the trace stored in the directory `path`.
+
+    The tensors of the trace are backed by a copy-on-write memory mapping of
+    the tensor data, so they are only read when used, and modifying them
+    doesn't modify the file.
+    """
+    with open(os.path.join(path, _MANIFEST_FILE_NAME)) as f:
+        manifest = json.load(f)
+    if manifest["version"] > TRACE_FORMAT_VERSION:
+        raise ValueError(
+            f"Trace '{path}' has format version {manifest['version']}, but "
+            f"only versions up to {TRACE_FORMAT_VERSION} are supported")
+    tensors_path = os.path.join(path, _TENSORS_FILE_NAME)
+    data = None
+    if os.path.getsize(tensors_path) > 0:
+        data = torch.from_numpy(np.memmap(tensors_path, dtype=np.uint8,
+                                          mode="c"))
+
+    def decode(v: Dict[str, Any]) -> TorchScriptValue:
+        kind, payload = next(iter(v.items()))
+        if kind == "tensor":
+            dtype = _str_to_dtype(payload["dtype"])
+            shape = payload["shape"]
+            numel = 1
+            for size in shape:
+                numel *= size
+            if numel == 0:
+                return torch.empty(shape, dtype=dtype)
+            element_size = torch.empty((), dtype=dtype).element_size()
+            offset = payload["offset"]
+            return data[offset:offset + numel * element_size].view(
+                dtype).reshape(shape)
+        if kind == "tuple":
+            return tuple(decode(field) for field in payload)
+        if kind == "list":
+            return [decode(item) for item in payload]
+        if kind == "dict":
+            return {decode(key): decode(val) for key, val in payload}
+        if kind == "scalar":
+            return payload
+        raise ValueError(f"Unknown value kind in trace: '{kind}'")
+
+    return [
+        TraceItem(symbol=item["symbol"],
+                  inputs=[decode(input) for input in item["inputs"]],
+                  output=decode(item["output"]))
+        for item in manifest["items"]
+    ]
+
+
+@contextmanager
+def record_trace(program: torch.nn.Module, path: str):
+    """Records the calls into `program` to a trace in the directory `path`.
+
+    Yields a wrapper around `program`. Calls to its methods (e.g.
+    `wrapper.forward(x)` or `wrapper.submodule.forward(x)`) run `program`
+    and are appended to the trace. The trace is written out when the context
+    exits.
+    """
+    writer = TraceWriter(path)
+    try:
+        yield _Tracer(program, [], writer)
+    finally:
+        writer.close()
@@ -115,6 +115,21 @@ func.func private @f(%arg0: i32 {torch.type_bound = i32})
 
 // -----
 
+// expected-error @+1 {{'torch.symbolic_shape' must be an array of strings}}
+func.func private @f(%arg0: !torch.vtensor<[?,4],f32> {torch.symbolic_shape = [1, 4]})
+
+// -----
+
+// expected-error @+1 {{'torch.symbolic_shape' must be attached to an argument of !torch.tensor/!torch.vtensor type of the same rank}}
+func.func private @f(%arg0: !torch.vtensor<[?,4],f32> {torch.symbolic_shape = ["s0"]})
+
+// -----
+
+// expected-error @+1 {{'torch.symbolic_value' must be attached to an argument of !torch.int type}}
+func.func private @f(%arg0: !torch.float {torch.symbolic_value = "s0"})
+
+// -----
+
 func.func @derefine(%arg0: !torch.optional<tensor>) -> !torch.tensor {
   // expected-error @+1 {{operand type '!torch.optional<tensor>' and result type '!torch.tensor' are cast incompatible}}
   %0 = torch.derefine %arg0 : !torch.optional<tensor> to !torch.tensor
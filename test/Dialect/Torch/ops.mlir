@@ -28,6 +28,9 @@ func.func private @tensor.some_sizes_known() -> !torch.tensor<[?,2,?,4],unk>
 // CHECK: @tensor.fully_determined() -> !torch.vtensor<[1,2,3,4],f32>
 func.func private @tensor.fully_determined() -> !torch.vtensor<[1,2,3,4],f32>
 
+// CHECK: @symbolic_shapes(!torch.vtensor<[?,4],f32> {torch.symbolic_shape = ["s0", "4"]}, !torch.int {torch.symbolic_value = "s0"})
+func.func private @symbolic_shapes(%arg0: !torch.vtensor<[?,4],f32> {torch.symbolic_shape = ["s0", "4"]}, %arg1: !torch.int {torch.symbolic_value = "s0"})
+
 // CHECK: @tuple.empty() -> !torch.tuple<>
 func.func private @tuple.empty() -> !torch.tuple<>
 // CHECK: @tuple.one_element() -> !torch.tuple<tensor>
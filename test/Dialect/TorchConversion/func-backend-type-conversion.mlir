@@ -115,3 +115,14 @@ func.func @identity$torch.float(%arg0: !torch.float) -> !torch.float {
 func.func @identity$torch.Generator(%arg0: !torch.Generator) -> !torch.Generator {
   return %arg0 : !torch.Generator
 }
+
+// The symbolic shape annotations are dropped with the torch types they
+// describe.
+// CHECK-LABEL:   func.func @symbolic_shapes(
+// CHECK-SAME:                          %[[ARG0:.*]]: tensor<?x4xf32>,
+// CHECK-SAME:                          %[[ARG1:.*]]: i64) -> tensor<?x4xf32> {
+// CHECK-NOT:       torch.symbol
+// CHECK:           return %[[ARG0]] : tensor<?x4xf32>
+func.func @symbolic_shapes(%arg0: !torch.vtensor<[?,4],f32> {torch.symbolic_shape = ["s0", "4"]}, %arg1: !torch.int {torch.symbolic_value = "s0"}) -> !torch.vtensor<[?,4],f32> attributes {torch.symbol_ranges = {s0 = {min = 2 : i64}}} {
+  return %arg0 : !torch.vtensor<[?,4],f32>
+}